@@ -4,32 +4,47 @@ Includes multiple chart types, correlation analysis, and time series visualizati
 """
 
 import dash
-from dash import dcc, html, Input, Output, callback, dash_table
+from dash import dcc, html, Input, Output, State, callback, dash_table
+from dash.exceptions import PreventUpdate
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
 import numpy as np
+import threading
 from datetime import datetime
 
-# Load and prepare data
-def load_data():
-    """Load and prepare the Walmart dataset"""
-    df = pd.read_csv('/Users/simonwang/Documents/Usage/MathAI/MscMinicourse/Data/Walmart2.csv')
-    # Convert date column to datetime (day-first format)
-    df['Date'] = pd.to_datetime(df['Date'], dayfirst=True)
-    return df
+from chart_stats import bar_figure, box_figure, histogram_figure
+from data_loader import Dataset
+from downsample import sample_note, sample_scatter, zoom_state, zoom_window
+from figure_cache import FigureCache, render_mode
+from figure_patch import STYLE_ARGS, hover_template, marker_patch, numeric_restyle, update_figure
+from query_backend import make_backend, probe_code
+from rasterize import (SURFACE_SHAPE, VOXEL_GRID, density_heatmap, density_mode, density_surface,
+                       voxel_figure, voxel_grid, voxel_mode)
+from rolling import ROLLING_STATS, RollingFrame
+from stats_index import top_pairs
 
 # Initialize the app
 app = dash.Dash(__name__, suppress_callback_exceptions=True)
 app.title = "Advanced Walmart Sales Data Explorer"
 
-# Load data
-df = load_data()
-
 # Get column names for dropdown options
 numerical_columns = ['Weekly_Sales', 'Temperature', 'Fuel_Price', 'CPI', 'Unemployment']
 categorical_columns = ['Store', 'Holiday_Flag', 'District']
 
+# Load data in the background, pruned to the columns the views use, and
+# answer the callbacks' queries through the configured backend
+dataset = Dataset(columns=['Date', 'Week'] + numerical_columns + categorical_columns)
+backend = make_backend(dataset)
+
+# Serialized figures of recent control combinations, shared by all users
+figures = FigureCache()
+
+# Rolling-statistics frames of the time series tab, keyed (variable, data version); callbacks
+# run on several threads, so the lock guards the dict and lets only one of them build a frame
+rolling_frames = {}
+rolling_lock = threading.Lock()
+
 # App layout
 app.layout = html.Div([
     # Header
@@ -110,17 +125,40 @@ app.layout = html.Div([
                             )
                         ], className="four columns"),
                     ], className="row", style={'marginBottom': '20px'}),
+                    
+                    html.Div([
+                        html.Div([
+                            html.Label("Rendering (Scatter and 3D):", style={'fontWeight': 'bold'}),
+                            dcc.Dropdown(
+                                id='render-dropdown',
+                                options=[
+                                    {'label': 'Auto (density or voxels for large views)', 'value': 'auto'},
+                                    {'label': 'Markers', 'value': 'points'},
+                                    {'label': 'Density (count, or mean of a numeric color)', 'value': 'density'},
+                                    {'label': 'Voxels (3D markers sized by count)', 'value': 'voxels'}
+                                ],
+                                value='auto',
+                                clearable=False
+                            )
+                        ], className="four columns"),
+                    ], className="row", style={'marginBottom': '20px'}),
                 ], style={'backgroundColor': '#f8f9fa', 'padding': '20px', 'borderRadius': '10px', 'marginBottom': '20px'}),
                 
                 # Chart display
                 html.Div([
-                    dcc.Graph(id='main-chart', style={'height': '600px'})
+                    dcc.Loading(dcc.Graph(id='main-chart', style={'height': '600px'})),
+                    # Visible scatter window, re-queried at full resolution on zoom
+                    dcc.Store(id='scatter-zoom'),
+                    # Voxels per axis for the 3D camera's zoom level
+                    dcc.Store(id='voxel-grid', data=VOXEL_GRID),
+                    # Arguments of the figure on screen, so restyling can send a patch
+                    dcc.Store(id='chart-args')
                 ], style={'marginBottom': '20px'}),
                 
                 # Data summary
                 html.Div([
                     html.H2("Variable Summary", style={'color': '#3498db', 'marginBottom': '15px'}),
-                    html.Div(id='data-summary')
+                    dcc.Loading(html.Div(id='data-summary'))
                 ], style={'backgroundColor': '#f8f9fa', 'padding': '20px', 'borderRadius': '10px'}),
             ], style={'padding': '20px'})
         ]),
@@ -129,7 +167,7 @@ app.layout = html.Div([
             html.Div([
                 html.H2("Correlation Matrix", style={'color': '#3498db', 'textAlign': 'center'}),
                 html.Div([
-                    dcc.Graph(id='correlation-heatmap', style={'height': '600px'})
+                    dcc.Loading(dcc.Graph(id='correlation-heatmap', style={'height': '600px'}))
                 ]),
                 html.Div(id='correlation-insights', 
                         style={'backgroundColor': '#f8f9fa', 'padding': '20px', 'borderRadius': '10px', 'marginTop': '20px'})
@@ -140,16 +178,49 @@ app.layout = html.Div([
             html.Div([
                 html.H2("Time Series Analysis", style={'color': '#3498db', 'textAlign': 'center'}),
                 html.Div([
-                    html.Label("Select Variable:", style={'fontWeight': 'bold'}),
-                    dcc.Dropdown(
-                        id='ts-variable-dropdown',
-                        options=[{'label': col, 'value': col} for col in numerical_columns],
-                        value='Weekly_Sales',
-                        clearable=False
-                    )
-                ], style={'marginBottom': '20px', 'width': '300px'}),
+                    html.Div([
+                        html.Label("Select Variable:", style={'fontWeight': 'bold'}),
+                        dcc.Dropdown(
+                            id='ts-variable-dropdown',
+                            options=[{'label': col, 'value': col} for col in numerical_columns],
+                            value='Weekly_Sales',
+                            clearable=False
+                        )
+                    ], className="three columns"),
+                    
+                    html.Div([
+                        html.Label("Store:", style={'fontWeight': 'bold'}),
+                        # Filled with the stores once the data is loaded
+                        dcc.Dropdown(
+                            id='ts-store-dropdown',
+                            options=[{'label': 'All Stores', 'value': 'All'}],
+                            value='All',
+                            clearable=False
+                        )
+                    ], className="three columns"),
+                    
+                    html.Div([
+                        html.Label("Window Statistic:", style={'fontWeight': 'bold'}),
+                        dcc.Dropdown(
+                            id='ts-stat-dropdown',
+                            options=[{'label': label, 'value': stat} for stat, label in ROLLING_STATS.items()],
+                            value='mean',
+                            clearable=False
+                        )
+                    ], className="three columns"),
+                    
+                    html.Div([
+                        html.Label("Windows (weeks):", style={'fontWeight': 'bold'}),
+                        dcc.Dropdown(
+                            id='ts-window-dropdown',
+                            options=[{'label': str(weeks), 'value': weeks} for weeks in range(2, 105)],
+                            value=[4, 12],
+                            multi=True
+                        )
+                    ], className="three columns"),
+                ], className="row", style={'marginBottom': '20px'}),
                 html.Div([
-                    dcc.Graph(id='time-series-chart', style={'height': '500px'})
+                    dcc.Loading(dcc.Graph(id='time-series-chart', style={'height': '500px'}))
                 ]),
                 html.Div([
                     dcc.Graph(id='seasonal-decomposition', style={'height': '400px'})
@@ -157,103 +228,311 @@ app.layout = html.Div([
             ], style={'padding': '20px'})
         ]),
         
-        dcc.Tab(label='Data Overview', value='data', children=[
+        dcc.Tab(label='Group Sensitivity', value='groups', children=[
             html.Div([
-                html.H2("Dataset Information", style={'color': '#3498db'}),
+                html.H2("Correlation and Regression by Group", style={'color': '#3498db', 'textAlign': 'center'}),
                 html.Div([
-                    html.H3("Dataset Shape"),
-                    html.P(f"Rows: {len(df)}, Columns: {len(df.columns)}"),
-                    html.H3("Column Names"),
-                    html.Ul([html.Li(col) for col in df.columns]),
-                    html.H3("Data Types"),
-                    html.Ul([html.Li(f"{col}: {dtype}") for col, dtype in df.dtypes.items()]),
-                ], style={'backgroundColor': '#f8f9fa', 'padding': '20px', 'borderRadius': '10px', 'marginBottom': '20px'}),
-                
-                html.H2("Sample Data", style={'color': '#3498db'}),
-                dash_table.DataTable(
-                    id='data-table',
-                    columns=[{"name": i, "id": i} for i in df.columns],
-                    data=df.head(15).to_dict('records'),
-                    style_table={'overflowX': 'auto'},
-                    style_cell={
-                        'height': 'auto',
-                        'minWidth': '100px', 'width': '100px', 'maxWidth': '180px',
-                        'whiteSpace': 'normal'
-                    },
-                    page_size=15,
-                )
+                    html.Div([
+                        html.Label("Group By:", style={'fontWeight': 'bold'}),
+                        dcc.Dropdown(
+                            id='group-by-dropdown',
+                            options=[{'label': col, 'value': col} for col in ['Store', 'District']],
+                            value='Store',
+                            clearable=False
+                        )
+                    ], className="three columns"),
+                    
+                    html.Div([
+                        html.Label("Response (Y):", style={'fontWeight': 'bold'}),
+                        dcc.Dropdown(
+                            id='group-y-dropdown',
+                            options=[{'label': col, 'value': col} for col in numerical_columns],
+                            value='Weekly_Sales',
+                            clearable=False
+                        )
+                    ], className="three columns"),
+                    
+                    html.Div([
+                        html.Label("Driver (X):", style={'fontWeight': 'bold'}),
+                        dcc.Dropdown(
+                            id='group-x-dropdown',
+                            options=[{'label': col, 'value': col} for col in numerical_columns],
+                            value='Fuel_Price',
+                            clearable=False
+                        )
+                    ], className="three columns"),
+                    
+                    html.Div([
+                        html.Label("Statistic:", style={'fontWeight': 'bold'}),
+                        dcc.Dropdown(
+                            id='group-stat-dropdown',
+                            options=[
+                                {'label': 'Regression Slope', 'value': 'slope'},
+                                {'label': 'Correlation', 'value': 'corr'}
+                            ],
+                            value='slope',
+                            clearable=False
+                        )
+                    ], className="three columns"),
+                ], className="row", style={'marginBottom': '20px'}),
+                html.Div([
+                    dcc.Loading(dcc.Graph(id='group-chart', style={'height': '500px'}))
+                ]),
+                html.Div(id='group-table', 
+                        style={'backgroundColor': '#f8f9fa', 'padding': '20px', 'borderRadius': '10px', 'marginTop': '20px'})
+            ], style={'padding': '20px'})
+        ]),
+        
+        dcc.Tab(label='Data Overview', value='data', children=[
+            html.Div([
+                dcc.Loading(html.Div(id='data-overview'))
             ], style={'padding': '20px'})
         ]),
     ]),
 ])
 
+# Health probe: answers as soon as the server is up, before the data is loaded
+@app.server.route('/health')
+def health():
+    """Report server liveness and data readiness (503 once the data failed to load)"""
+    status = backend.health()
+    return dict(status, figures=figures.stats()), probe_code(status)
+
+@app.server.route('/ready')
+def ready():
+    """Readiness probe: 503 until the data is loaded"""
+    status = backend.health()
+    return status, probe_code(status, ready=True)
+
+# Callback to update the data overview tab
+@callback(
+    Output('data-overview', 'children'),
+    Input('tabs', 'value')
+)
+def update_data_overview(tab):
+    """Update the data overview tab"""
+    if tab != 'data':
+        return ""
+    
+    row_count, dtypes = backend.info()
+    df = backend.head(15)
+    
+    return html.Div([
+        html.H2("Dataset Information", style={'color': '#3498db'}),
+        html.Div([
+            html.H3("Dataset Shape"),
+            html.P(f"Rows: {row_count}, Columns: {len(dtypes)}"),
+            html.H3("Column Names"),
+            html.Ul([html.Li(col) for col in dtypes]),
+            html.H3("Data Types"),
+            html.Ul([html.Li(f"{col}: {dtype}") for col, dtype in dtypes.items()]),
+        ], style={'backgroundColor': '#f8f9fa', 'padding': '20px', 'borderRadius': '10px', 'marginBottom': '20px'}),
+        
+        html.H2("Sample Data", style={'color': '#3498db'}),
+        dash_table.DataTable(
+            id='data-table',
+            columns=[{"name": i, "id": i} for i in df.columns],
+            data=df.to_dict('records'),
+            style_table={'overflowX': 'auto'},
+            style_cell={
+                'height': 'auto',
+                'minWidth': '100px', 'width': '100px', 'maxWidth': '180px',
+                'whiteSpace': 'normal'
+            },
+            page_size=15,
+        )
+    ])
+
+# Callback to remember the scatter zoom together with the axes it was made on
+@callback(
+    Output('scatter-zoom', 'data'),
+    Input('main-chart', 'relayoutData'),
+    [State('x-axis-dropdown', 'value'),
+     State('y-axis-dropdown', 'value'),
+     State('chart-type-dropdown', 'value'),
+     State('scatter-zoom', 'data')]
+)
+def update_zoom(relayout_data, x_axis, y_axis, chart_type, zoom):
+    """Store the visible scatter window after a zoom, pan or reset"""
+    zoom = zoom_state(relayout_data, x_axis, y_axis, zoom) if chart_type == 'scatter' else None
+    if zoom is None:
+        raise PreventUpdate
+    return zoom
+
+# Callback to refine or coarsen the 3D voxel grid as the camera moves
+@callback(
+    Output('voxel-grid', 'data'),
+    Input('main-chart', 'relayoutData'),
+    [State('chart-type-dropdown', 'value'),
+     State('voxel-grid', 'data')]
+)
+def update_voxel_grid(relayout_data, chart_type, grid):
+    """Store the voxel grid for the camera after a 3D rotate or zoom"""
+    camera = (relayout_data or {}).get('scene.camera')
+    if chart_type != '3d_scatter' or camera is None or voxel_grid(camera) == grid:
+        raise PreventUpdate
+    return voxel_grid(camera)
+
 # Callback to update the main chart based on user selections
 @callback(
-    Output('main-chart', 'figure'),
+    [Output('main-chart', 'figure'),
+     Output('chart-args', 'data')],
     [Input('x-axis-dropdown', 'value'),
      Input('y-axis-dropdown', 'value'),
      Input('chart-type-dropdown', 'value'),
      Input('color-dropdown', 'value'),
-     Input('size-dropdown', 'value')]
+     Input('size-dropdown', 'value'),
+     Input('scatter-zoom', 'data'),
+     Input('render-dropdown', 'value'),
+     Input('voxel-grid', 'data')],
+    State('chart-args', 'data')
 )
-def update_main_chart(x_axis, y_axis, chart_type, color_by, size_by):
-    """Update the main chart based on user selections"""
+def update_main_chart(x_axis, y_axis, chart_type, color_by, size_by, zoom, render, grid, shown):
+    """Update the main chart; a colour or size change only sends what it restyles"""
+    args = dict(x_axis=x_axis, y_axis=y_axis, chart_type=chart_type, color_by=color_by,
+                size_by=size_by, zoom=zoom, render=render, grid=grid)
+    version = backend.version
+    return (update_figure(build_main_chart, args, shown, version, restyle_chart),
+            dict(args, version=version))
+
+def restyle_chart(args, shown):
+    """Patch a scatter's numeric colour or size from a fetch of the new column, or return None"""
+    changed = numeric_restyle(args, shown, numerical_columns)
+    if args['chart_type'] != 'scatter' or changed is None:
+        return None
+    x_axis, y_axis = args['x_axis'], args['y_axis']
+    color_col, size_col = (None if args[key] == 'None' else args[key] for key in STYLE_ARGS)
+    drawn = [x_axis, y_axis] + [col for col in (color_col, size_col) if col]
+    if len(set(drawn)) < len(drawn):
+        # A column drawn twice gets one hover label; leave that to the full figure
+        return None
+    if density_mode(args['render'], backend.count(zoom_window(args['zoom'], x_axis, y_axis)), True):
+        return None
+    # Same window and strata as the figure on screen, so the same rows in the same order
+    columns = [column for column in changed.values() if column]
+    df, _ = sample_scatter(backend, [x_axis, y_axis] + columns, x_axis, y_axis, args['zoom'])
+    values = {key: column and (column, df[column].to_numpy()) for key, column in changed.items()}
+    return marker_patch(values, hover_template(x_axis, y_axis, size_col, ('Date', 'Store'), color_col))
+
+@figures.cached(version=lambda: backend.version, decode=True)
+def build_main_chart(x_axis, y_axis, chart_type, color_by, size_by, zoom=None, render='auto',
+                     grid=VOXEL_GRID):
+    """Build the main chart for the user's selections"""
     # Handle the case where color_by or size_by is 'None'
     color_col = None if color_by == 'None' else color_by
     size_col = None if size_by == 'None' else size_by
     
+    if chart_type == '3d_scatter':
+        z_axis = 'Weekly_Sales'  # Default Z axis
+        if x_axis != 'Weekly_Sales' and y_axis != 'Weekly_Sales':
+            z_axis = 'Weekly_Sales'
+        elif x_axis != 'Temperature' and y_axis != 'Temperature':
+            z_axis = 'Temperature'
+    
+    # Large scatter views are binned into a pixel grid on the server instead of sent as
+    # markers, and large 3D views into voxels
+    density = None
+    voxels = False
+    if chart_type in ['scatter', '3d_scatter']:
+        window = zoom_window(zoom, x_axis, y_axis) if chart_type == 'scatter' else {}
+        rows = backend.count(window)
+        voxels = chart_type == '3d_scatter' and voxel_mode(render, rows)
+        if not voxels:
+            density = density_mode(render, rows, color_col in numerical_columns)
+    
+    # Fetch only the columns the chart draws; the line, bar, histogram and box charts query
+    # their own aggregates and the scatter a capped sample of the zoomed window
+    if voxels:
+        by = color_col if color_col in categorical_columns else None
+        shade = color_col if color_col in numerical_columns else None
+        cells = backend.voxels(x_axis, y_axis, z_axis, grid or VOXEL_GRID, [shade] if shade else [], by)
+    elif density:
+        means = [z_axis] if chart_type == '3d_scatter' else []
+        if density == 'mean':
+            means.append(color_col)
+        if chart_type == '3d_scatter':
+            raster = backend.raster(x_axis, y_axis, SURFACE_SHAPE, means=means)
+        else:
+            raster = backend.raster(x_axis, y_axis, window=window, means=means)
+    elif chart_type == 'scatter':
+        df, total = sample_scatter(backend, [x_axis, y_axis, color_col, size_col, 'Date', 'Store'],
+                                   x_axis, y_axis, zoom,
+                                   strata=color_col if color_col in categorical_columns else None)
+    elif chart_type == '3d_scatter':
+        df, total = backend.sample([x_axis, y_axis, z_axis, color_col], x_axis, y_axis,
+                                   strata=color_col if color_col in categorical_columns else None)
+    elif chart_type not in ['line', 'bar', 'histogram', 'box']:
+        df = backend.rows([x_axis, y_axis, color_col])
+    
     # Create different chart types based on selection
-    if chart_type == 'scatter':
+    if chart_type == 'scatter' and density:
+        fig = density_heatmap(raster, x_axis, y_axis, color_col if density == 'mean' else None,
+                              title=f'{y_axis} vs {x_axis} (density of {raster.total:,} points)')
+        # Keep the user's zoom while the raster for it is swapped in
+        fig.update_layout(uirevision=f'{x_axis}|{y_axis}')
+    
+    elif chart_type == 'scatter':
+        title = f'{y_axis} vs {x_axis}' + sample_note(len(df), total)
         if size_col:
             fig = px.scatter(df, x=x_axis, y=y_axis, color=color_col, size=size_col,
-                           title=f'{y_axis} vs {x_axis}',
+                           title=title, render_mode=render_mode(len(df)),
                            hover_data=['Date', 'Store'])
         else:
             fig = px.scatter(df, x=x_axis, y=y_axis, color=color_col,
-                           title=f'{y_axis} vs {x_axis}',
+                           title=title, render_mode=render_mode(len(df)),
                            hover_data=['Date', 'Store'])
+        # Keep the user's zoom while the sample for it is swapped in
+        fig.update_layout(uirevision=f'{x_axis}|{y_axis}')
     
     elif chart_type == 'line':
         # For line chart, we'll aggregate data by date
         if color_col:
-            agg_data = df.groupby([df['Date'].dt.date, color_col]).agg({x_axis: 'mean', y_axis: 'mean'}).reset_index()
+            agg_data = backend.mean_by_date([x_axis, y_axis], by=color_col)
             fig = px.line(agg_data, x=x_axis, y=y_axis, color=color_col,
-                         title=f'{y_axis} vs {x_axis} (Aggregated by Date)')
+                         title=f'{y_axis} vs {x_axis} (Aggregated by Date)',
+                         render_mode=render_mode(len(agg_data)))
         else:
-            agg_data = df.groupby(df['Date'].dt.date).agg({x_axis: 'mean', y_axis: 'mean'}).reset_index()
+            agg_data = backend.mean_by_date([x_axis, y_axis])
             fig = px.line(agg_data, x=x_axis, y=y_axis,
-                         title=f'{y_axis} vs {x_axis} (Aggregated by Date)')
+                         title=f'{y_axis} vs {x_axis} (Aggregated by Date)',
+                         render_mode=render_mode(len(agg_data)))
     
     elif chart_type == 'bar':
-        # For bar chart, we'll group by the x-axis variable if it's categorical or discretized
-        if color_col:
-            fig = px.bar(df, x=x_axis, y=y_axis, color=color_col,
-                        title=f'Average {y_axis} by {x_axis}')
-        else:
-            fig = px.bar(df, x=x_axis, y=y_axis,
-                        title=f'Average {y_axis} by {x_axis}')
+        # One bar per x bin (or x value) and colour group, averaged on the server;
+        # a numeric colour shades each bar by its mean instead of splitting it
+        by = color_col if color_col in categorical_columns else None
+        shade = color_col if color_col in numerical_columns else None
+        bars, width = backend.bars(x_axis, y_axis, by=by, shade=shade)
+        fig = bar_figure(bars, width, x_axis, y_axis, by, shade)
     
     elif chart_type == 'histogram':
-        fig = px.histogram(df, x=x_axis, color=color_col,
-                          title=f'Distribution of {x_axis}')
+        # Bin counts per colour group, counted on the server
+        by = color_col if color_col in categorical_columns else None
+        counts, width = backend.histogram(x_axis, by)
+        fig = histogram_figure(counts, width, x_axis, by)
     
     elif chart_type == 'box':
-        fig = px.box(df, x=x_axis, y=y_axis, color=color_col,
-                    title=f'Distribution of {y_axis} by {x_axis}')
+        # Quartiles, whiskers and a capped set of outliers per box, computed on the server
+        by = color_col if color_col in categorical_columns else None
+        stats, outliers = backend.box(x_axis, y_axis, by)
+        fig = box_figure(stats, outliers, x_axis, y_axis, by)
+    
+    elif chart_type == '3d_scatter' and voxels:
+        fig = voxel_figure(cells, x_axis, y_axis, z_axis, shade, by,
+                           title=f'3D View: {x_axis} vs {y_axis} vs {z_axis} '
+                                 f'({cells.total:,} points in {len(cells.counts):,} voxels)')
+    
+    elif chart_type == '3d_scatter' and density:
+        fig = density_surface(raster, x_axis, y_axis, z_axis, color_col if density == 'mean' else None,
+                              title=f'3D View: mean {z_axis} over {x_axis} x {y_axis} '
+                                    f'({raster.total:,} points)')
     
     elif chart_type == '3d_scatter':
-        z_axis = 'Weekly_Sales'  # Default Z axis
-        if x_axis != 'Weekly_Sales' and y_axis != 'Weekly_Sales':
-            z_axis = 'Weekly_Sales'
-        elif x_axis != 'Temperature' and y_axis != 'Temperature':
-            z_axis = 'Temperature'
-        
+        title = f'3D View: {x_axis} vs {y_axis} vs {z_axis}' + sample_note(len(df), total)
         if color_col:
-            fig = px.scatter_3d(df, x=x_axis, y=y_axis, z=z_axis, color=color_col,
-                               title=f'3D View: {x_axis} vs {y_axis} vs {z_axis}')
+            fig = px.scatter_3d(df, x=x_axis, y=y_axis, z=z_axis, color=color_col, title=title)
         else:
-            fig = px.scatter_3d(df, x=x_axis, y=y_axis, z=z_axis,
-                               title=f'3D View: {x_axis} vs {y_axis} vs {z_axis}')
+            fig = px.scatter_3d(df, x=x_axis, y=y_axis, z=z_axis, title=title)
     
     # Update layout
     fig.update_layout(
@@ -262,6 +541,9 @@ def update_main_chart(x_axis, y_axis, chart_type, color_by, size_by):
         font=dict(size=14),
         title_font=dict(size=18, family="Arial Black")
     )
+    if chart_type == '3d_scatter':
+        # Keep the camera while the voxels for a new zoom level are swapped in
+        fig.update_layout(uirevision=f'{x_axis}|{y_axis}|{z_axis}')
     
     return fig
 
@@ -274,15 +556,15 @@ def update_main_chart(x_axis, y_axis, chart_type, color_by, size_by):
 def update_summary(x_axis, y_axis):
     """Update the data summary section"""
     # Get basic statistics for both selected columns
-    x_stats = df[x_axis].describe()
-    y_stats = df[y_axis].describe()
+    x_stats = backend.describe(x_axis)
+    y_stats = backend.describe(y_axis)
     
     # Get correlation between the two variables
-    correlation = df[x_axis].corr(df[y_axis])
+    correlation = backend.correlation(x_axis, y_axis)
     
     # Get additional insights
-    x_missing = df[x_axis].isnull().sum()
-    y_missing = df[y_axis].isnull().sum()
+    x_missing = x_stats['missing']
+    y_missing = y_stats['missing']
     
     summary_html = html.Div([
         html.H3("Variable Statistics", style={'color': '#2c3e50'}),
@@ -357,7 +639,7 @@ def update_correlation_analysis(tab):
         return {}, ""
     
     # Calculate correlation matrix
-    corr_data = df[numerical_columns].corr()
+    corr_data = backend.corr(numerical_columns)
     
     # Create heatmap
     fig = px.imshow(corr_data, 
@@ -387,20 +669,10 @@ def generate_correlation_insights(corr_data):
     """Generate insights from correlation data"""
     insights = []
     
-    # Find strongest correlations
-    corr_pairs = []
-    for i in range(len(corr_data.columns)):
-        for j in range(i+1, len(corr_data.columns)):
-            corr_val = corr_data.iloc[i, j]
-            corr_pairs.append((corr_data.columns[i], corr_data.columns[j], abs(corr_val), corr_val))
-    
-    # Sort by absolute correlation
-    corr_pairs.sort(key=lambda x: x[2], reverse=True)
-    
-    # Report top correlations
-    for i, (var1, var2, abs_corr, corr) in enumerate(corr_pairs[:5]):
+    # Report the strongest pairs, ranked by absolute correlation over the upper triangle
+    for var1, var2, corr in top_pairs(corr_data, 5).itertuples(index=False):
         direction = "positive" if corr > 0 else "negative"
-        strength = get_relationship_strength(abs_corr).lower()
+        strength = get_relationship_strength(abs(corr)).lower()
         insights.append(f"{var1} and {var2} have a {strength} {direction} correlation ({corr:.3f})")
     
     # Check for any strong correlations with Weekly_Sales
@@ -416,25 +688,111 @@ def generate_correlation_insights(corr_data):
     
     return insights
 
+# Callback to update the per-group sensitivity tab
+@callback(
+    [Output('group-chart', 'figure'),
+     Output('group-table', 'children')],
+    [Input('group-by-dropdown', 'value'),
+     Input('group-y-dropdown', 'value'),
+     Input('group-x-dropdown', 'value'),
+     Input('group-stat-dropdown', 'value'),
+     Input('tabs', 'value')]
+)
+def update_group_sensitivity(by, y_axis, x_axis, stat, tab):
+    """Update the per-group correlation and regression tab"""
+    if tab != 'groups':
+        return {}, ""
+    
+    # Every driver's fit against the response for every group, from one grouped pass
+    # (cached per data version, so switching the driver or statistic is free)
+    fits = backend.regressions(by, numerical_columns, [y_axis])
+    fits = fits.assign(**{by: fits[by].astype(str)})
+    
+    label = 'Slope' if stat == 'slope' else 'Correlation'
+    if x_axis == y_axis:
+        fig = go.Figure()
+        fig.update_layout(title=f'Choose a driver other than {y_axis}')
+    else:
+        part = fits[fits['x'] == x_axis].sort_values(stat)
+        fig = px.bar(part, x=by, y=stat, hover_data=['count', 'corr', 'slope', 'intercept'],
+                     title=f'{label} of {y_axis} on {x_axis} by {by}')
+        fig.update_xaxes(type='category')
+    fig.update_layout(
+        plot_bgcolor='#ffffff',
+        paper_bgcolor='#ffffff',
+        font=dict(size=14),
+        title_font=dict(size=18, family="Arial Black")
+    )
+    
+    # One row per group and driver
+    table = fits.drop(columns='y').round({'corr': 3, 'slope': 3, 'intercept': 2})
+    table_html = html.Div([
+        html.H3(f"Fits of {y_axis} by {by}", style={'color': '#2c3e50'}),
+        dash_table.DataTable(
+            id='group-fits-table',
+            columns=[{"name": i, "id": i} for i in table.columns],
+            data=table.to_dict('records'),
+            sort_action='native',
+            filter_action='native',
+            style_table={'overflowX': 'auto'},
+            page_size=15,
+        )
+    ])
+    
+    return fig, table_html
+
+def rolling_series(variable, version):
+    """Weekly means of a variable, overall and per store, with their rolling prefix sums"""
+    key = (variable, version)
+    with rolling_lock:
+        if key not in rolling_frames:
+            overall = backend.mean_by_date([variable]).set_index('Date')[variable]
+            stores = backend.mean_by_date([variable], by='Store').pivot(index='Date', columns='Store', values=variable)
+            stores.columns = stores.columns.astype(str)
+            wide = pd.concat([overall.rename('All'), stores], axis=1).sort_index()
+            # One data version's frames at a time, replaced together after an ingest
+            if any(cached_version != version for _, cached_version in rolling_frames):
+                rolling_frames.clear()
+            rolling_frames[key] = RollingFrame(wide)
+        return rolling_frames[key]
+
+# Callback to list the stores once the data is loaded
+@callback(
+    Output('ts-store-dropdown', 'options'),
+    Input('tabs', 'value')
+)
+def update_store_options(tab):
+    """Offer each store's series in the time series tab"""
+    if tab != 'timeseries':
+        raise PreventUpdate
+    series = rolling_series('Weekly_Sales', backend.version)
+    return [{'label': 'All Stores' if col == 'All' else f'Store {col}', 'value': col} for col in series.columns]
+
 # Callback to update time series chart
 @callback(
     [Output('time-series-chart', 'figure'),
      Output('seasonal-decomposition', 'figure')],
     [Input('ts-variable-dropdown', 'value'),
+     Input('ts-store-dropdown', 'value'),
+     Input('ts-stat-dropdown', 'value'),
+     Input('ts-window-dropdown', 'value'),
      Input('tabs', 'value')]
 )
-def update_time_series(variable, tab):
+def update_time_series(variable, store, stat, windows, tab):
     """Update the time series analysis tab"""
     if tab != 'timeseries':
         # Return empty figures if not on timeseries tab
         return {}, {}
     
-    # Aggregate data by date
-    ts_data = df.groupby(df['Date'].dt.date)[variable].mean().reset_index()
-    ts_data.columns = ['Date', variable]
+    # Per-date means with prefix sums, computed once per variable and data version
+    series = rolling_series(variable, backend.version)
+    if store not in series.columns:
+        store = 'All'
+    name = 'All Stores' if store == 'All' else f'Store {store}'
+    ts_data = pd.DataFrame({'Date': series.index, variable: series.values[:, series.columns.get_loc(store)]})
     
     # Create time series line chart
-    fig_ts = px.line(ts_data, x='Date', y=variable, title=f'Time Series: {variable}')
+    fig_ts = px.line(ts_data, x='Date', y=variable, title=f'Time Series: {variable} ({name})')
     fig_ts.update_layout(
         plot_bgcolor='#ffffff',
         paper_bgcolor='#ffffff',
@@ -442,18 +800,17 @@ def update_time_series(variable, tab):
         title_font=dict(size=18, family="Arial Black")
     )
     
-    # Create a simple trend visualization
-    # Add moving average
-    ts_data['MA_4'] = ts_data[variable].rolling(window=4).mean()
-    ts_data['MA_12'] = ts_data[variable].rolling(window=12).mean()
-    
+    # Overlay the chosen statistic over each selected window; sums and spreads
+    # are on another scale than the series, so they are drawn on their own
     fig_trend = go.Figure()
-    fig_trend.add_trace(go.Scatter(x=ts_data['Date'], y=ts_data[variable], mode='lines', name=variable, opacity=0.7))
-    fig_trend.add_trace(go.Scatter(x=ts_data['Date'], y=ts_data['MA_4'], mode='lines', name='4-week MA'))
-    fig_trend.add_trace(go.Scatter(x=ts_data['Date'], y=ts_data['MA_12'], mode='lines', name='12-week MA'))
+    if stat in ['mean', 'ewma']:
+        fig_trend.add_trace(go.Scatter(x=ts_data['Date'], y=ts_data[variable], mode='lines', name=variable, opacity=0.7))
+    for window in sorted(windows or []):
+        values = series.stat(stat, window)[store]
+        fig_trend.add_trace(go.Scatter(x=ts_data['Date'], y=values, mode='lines', name=f'{window}-week'))
     
     fig_trend.update_layout(
-        title=f'{variable} with Moving Averages',
+        title=f'{variable} {ROLLING_STATS[stat]} ({name})',
         plot_bgcolor='#ffffff',
         paper_bgcolor='#ffffff',
         font=dict(size=14),
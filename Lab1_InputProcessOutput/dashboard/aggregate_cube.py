@@ -0,0 +1,229 @@
+"""
+Pre-aggregated sales cube for the Walmart dashboards
+Holds the sum, count, min and max (and so the mean) of every numeric column at
+the Date x Store x District x Holiday_Flag grain, plus roll-ups to Date alone
+and to Date x each dimension. Line charts and time series read their per-date
+aggregates from here instead of re-grouping the raw rows on every callback.
+
+The cube is built once when the data loads. Appended rows are aggregated on
+their own and merged in, regrouping only the dates they touch. Queries the
+cube cannot answer fall back to date_aggregate, which groups on the integer
+Week codes with np.bincount.
+"""
+
+import threading
+
+import numpy as np
+import pandas as pd
+
+from data_loader import week_index
+
+MEASURES = ['Weekly_Sales', 'Temperature', 'Fuel_Price', 'CPI', 'Unemployment']
+DIMENSIONS = ['Store', 'District', 'Holiday_Flag']
+STATS = ['sum', 'count', 'min', 'max']
+
+# How partial aggregates of each statistic combine
+MERGE = {'sum': 'sum', 'count': 'sum', 'min': 'min', 'max': 'max'}
+
+# Dense integer code spaces (label ranges, week x group cells) are used up to
+# this many slots per row; sparser ones are compacted to the values present
+DENSE_RATIO = 4
+
+
+def partial_aggregate(df, keys, measures):
+    """Return sum/count/min/max of the measures per key, columns keyed (measure, stat)"""
+    return df.groupby(keys, observed=True, sort=False)[measures].agg(STATS)
+
+
+def combine(aggregate, keys):
+    """Regroup an aggregate on some of its index levels, merging each statistic"""
+    grouped = aggregate.groupby(level=keys, observed=True, sort=False)
+    parts = []
+    for how in ['sum', 'min', 'max']:
+        columns = [col for col in aggregate.columns if MERGE[col[1]] == how]
+        parts.append(getattr(grouped[columns], how)())
+    return pd.concat(parts, axis=1)[aggregate.columns]
+
+
+def merge_aggregates(old, new):
+    """Fold a partial aggregate into an existing one, regrouping only the dates it touches"""
+    touched = old.index.get_level_values('Date').isin(new.index.unique('Date'))
+    merged = combine(pd.concat([old[touched], new]), list(old.index.names))
+    return pd.concat([old[~touched], merged])
+
+
+def week_codes(df):
+    """Return each row's integer week code, from the Week column when the frame has one"""
+    if 'Week' in df.columns:
+        return df['Week'].to_numpy(dtype=np.int64)
+    return week_index(df['Date']).astype(np.int64)
+
+
+def group_codes(values):
+    """Return (codes, labels) for a grouping column, -1 marking missing values
+
+    Categoricals reuse their codes and integer or boolean columns are offset
+    by their minimum, which avoids hashing every row; other columns, and
+    integers spread over a range much wider than the frame, are factorized.
+    """
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        return values.cat.codes.to_numpy(dtype=np.int64), values.cat.categories.to_numpy()
+    if values.dtype.kind in 'biu' and len(values):
+        numbers = values.to_numpy()
+        low, high = int(numbers.min()), int(numbers.max())
+        if high - low < DENSE_RATIO * len(numbers):
+            codes = numbers.astype(np.int64) - low
+            labels = np.arange(low, high + 1)
+            return codes, labels.astype(bool) if values.dtype.kind == 'b' else labels
+    codes, labels = pd.factorize(values, sort=True)
+    return codes.astype(np.int64), np.asarray(labels)
+
+
+def date_aggregate(df, columns, by=None, stat='mean'):
+    """Return Date, ``by`` and the per-date mean (or sum) of each column, sorted by date
+
+    Rows are keyed by one flat integer cell, week offset times the number of
+    groups plus the ``by`` code, so each statistic is a single np.bincount
+    over the rows instead of a group-by on dates. When the weeks x groups
+    space is much larger than the frame, the occupied cells are renumbered
+    first so the bincounts stay the size of the result. Missing values are
+    skipped as pandas does.
+    """
+    weeks = week_codes(df)
+    groups, labels = np.zeros(len(df), dtype=np.int64), None
+    if by is not None:
+        groups, labels = group_codes(df[by])
+    valid = (weeks >= 0) & (groups >= 0)
+    if not valid.any():
+        return pd.DataFrame(columns=['Date'] + ([by] if by else []) + list(columns))
+    everything = valid.all()
+    first = weeks.min() if everything else weeks[valid].min()
+    span = (weeks.max() if everything else weeks[valid].max()) - first + 1
+    count = 1 if labels is None else len(labels)
+    cells = (weeks - first) * count + groups
+    if not everything:
+        cells = cells[valid]
+    size = span * count
+    if size > DENSE_RATIO * len(cells):
+        ids, cells = np.unique(cells, return_inverse=True)
+        size = len(ids)
+        occupied = np.arange(size)
+    else:
+        occupied = np.flatnonzero(np.bincount(cells, minlength=size))
+        ids = occupied
+
+    # Every row of a week carries the same date; any one of them labels the cell
+    dates = df['Date'].to_numpy()
+    labelled = np.empty(size, dtype=dates.dtype)
+    labelled[cells] = dates if everything else dates[valid]
+    result = {'Date': labelled[occupied]}
+    if labels is not None:
+        result[by] = labels[ids % count]
+    for col in columns:
+        values = df[col].to_numpy(dtype=float)
+        keys = cells
+        if not everything:
+            values = values[valid]
+        missing = np.isnan(values)
+        if missing.any():
+            keys, values = cells[~missing], values[~missing]
+        sums = np.bincount(keys, weights=values, minlength=size)[occupied]
+        if stat == 'sum':
+            result[col] = sums
+        else:
+            numbers = np.bincount(keys, minlength=size)[occupied]
+            with np.errstate(invalid='ignore', divide='ignore'):
+                result[col] = sums / numbers
+    return pd.DataFrame(result)
+
+
+class Cube:
+    """Date-level aggregates of the sales measures with dimension roll-ups
+
+    ``build`` and ``update`` have the warmer and subscriber signatures of
+    data_loader.Dataset, so a cube can be attached to a dataset directly.
+    ``version`` is called after each (re)build or merge to stamp the cube with
+    the data version it aggregates.
+    """
+
+    def __init__(self, measures=MEASURES, dimensions=DIMENSIONS, version=lambda: 0):
+        self.all_measures = measures
+        self.all_dimensions = dimensions
+        self.get_version = version
+        self.measures = []
+        self.dimensions = []
+        self.lock = threading.Lock()
+        self.levels = {}
+        self.views = {}
+        self.version = None
+
+    def build(self, df):
+        """Aggregate a whole frame into the cube"""
+        self.measures = [col for col in self.all_measures if col in df.columns]
+        self.dimensions = [col for col in self.all_dimensions if col in df.columns]
+        self.set_base(partial_aggregate(df, ['Date'] + self.dimensions, self.measures))
+
+    def set_base(self, base):
+        """Install a base-grain aggregate and derive the standard roll-ups from it"""
+        self.measures = list(base.columns.unique(0))
+        self.dimensions = list(base.index.names[1:])
+        levels = {tuple(self.dimensions): base, (): combine(base, ['Date'])}
+        for dim in self.dimensions:
+            levels[(dim,)] = combine(base, ['Date', dim])
+        with self.lock:
+            self.levels = levels
+            self.views = {}
+            self.version = self.get_version()
+
+    def update(self, df, new_rows):
+        """Merge appended rows into every level; rebuild after a full reload"""
+        if new_rows is None:
+            return self.build(df)
+        base_key = tuple(self.dimensions)
+        partial = partial_aggregate(new_rows, ['Date'] + self.dimensions, self.measures)
+        levels = {}
+        for by, level in self.levels.items():
+            delta = partial if by == base_key else combine(partial, ['Date'] + list(by))
+            levels[by] = merge_aggregates(level, delta)
+        with self.lock:
+            self.levels = levels
+            self.views = {}
+            self.version = self.get_version()
+
+    def covers(self, columns, by=(), version=None):
+        """Return True if the cube can answer for these measures and dimensions (and, if given, is at this version)
+
+        Between an ingest and the cube's merge of its rows the versions differ,
+        so callers fall back to the raw frame instead of reading the old cube.
+        """
+        if not self.levels or (version is not None and self.version != version):
+            return False
+        return (all(col in self.measures for col in columns)
+                and all(dim in self.dimensions for dim in by))
+
+    def level(self, by):
+        """Return the aggregate at Date x ``by``, rolling it up on first use"""
+        levels = self.levels
+        if by not in levels:
+            order = tuple(dim for dim in self.dimensions if dim in by)
+            if order not in levels:
+                levels[order] = combine(levels[tuple(self.dimensions)], ['Date'] + list(order))
+            levels[by] = levels[order].reorder_levels(['Date'] + list(by))
+        return levels[by]
+
+    def query(self, columns, stat='mean', by=None):
+        """Return Date, the ``by`` dimensions and one statistic per column, sorted by date"""
+        by = () if by is None else (by,) if isinstance(by, str) else tuple(by)
+        key = (by, stat, tuple(columns))
+        views = self.views
+        view = views.get(key)
+        if view is None:
+            level = self.level(by)
+            if stat == 'mean':
+                values = (level.xs('sum', axis=1, level=1)
+                          / level.xs('count', axis=1, level=1))
+            else:
+                values = level.xs(stat, axis=1, level=1)
+            view = views[key] = values[list(columns)].sort_index().reset_index()
+        # Callers may add columns (e.g. moving averages); keep the cached view intact
+        return view.copy(deep=False)
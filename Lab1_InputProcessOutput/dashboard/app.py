@@ -4,32 +4,36 @@ Allows users to explore relationships among different factors using various char
 """
 
 import dash
-from dash import dcc, html, Input, Output, callback, dash_table
-import pandas as pd
+from dash import dcc, html, Input, Output, State, callback, dash_table
+from dash.exceptions import PreventUpdate
 import plotly.express as px
 import plotly.graph_objects as go
 import numpy as np
 from datetime import datetime
 
-# Load and prepare data
-def load_data():
-    """Load and prepare the Walmart dataset"""
-    df = pd.read_csv('/Users/simonwang/Documents/Usage/MathAI/MscMinicourse/Data/Walmart2.csv')
-    # Convert date column to datetime (day-first format)
-    df['Date'] = pd.to_datetime(df['Date'], dayfirst=True)
-    return df
+from chart_stats import bar_figure, box_figure, histogram_figure
+from data_loader import Dataset
+from downsample import sample_note, sample_scatter, zoom_state
+from figure_cache import FigureCache, render_mode
+from figure_patch import STYLE_ARGS, hover_template, marker_patch, numeric_restyle, update_figure
+from query_backend import make_backend, probe_code
 
 # Initialize the app
 app = dash.Dash(__name__)
 app.title = "Walmart Sales Data Explorer"
 
-# Load data
-df = load_data()
-
 # Get column names for dropdown options
 numerical_columns = ['Weekly_Sales', 'Temperature', 'Fuel_Price', 'CPI', 'Unemployment']
 categorical_columns = ['Store', 'Holiday_Flag', 'District']
 
+# Load data in the background, pruned to the columns the views use, and
+# answer the callbacks' queries through the configured backend
+dataset = Dataset(columns=['Date', 'Week'] + numerical_columns + categorical_columns)
+backend = make_backend(dataset)
+
+# Serialized figures of recent control combinations, shared by all users
+figures = FigureCache()
+
 # App layout
 app.layout = html.Div([
     # Header
@@ -109,13 +113,17 @@ app.layout = html.Div([
     
     # Chart display
     html.Div([
-        dcc.Graph(id='main-chart', style={'height': '600px'})
+        dcc.Loading(dcc.Graph(id='main-chart', style={'height': '600px'})),
+        # Visible scatter window, re-queried at full resolution on zoom
+        dcc.Store(id='scatter-zoom'),
+        # Arguments of the figure on screen, so restyling can send a patch
+        dcc.Store(id='chart-args')
     ], style={'marginBottom': '20px'}),
     
     # Data summary
     html.Div([
         html.H2("Dataset Summary", style={'color': '#3498db', 'marginBottom': '15px'}),
-        html.Div(id='data-summary')
+        dcc.Loading(html.Div(id='data-summary'))
     ], style={'backgroundColor': '#f8f9fa', 'padding': '20px', 'borderRadius': '10px', 'marginBottom': '20px'}),
     
     # Data table
@@ -123,8 +131,6 @@ app.layout = html.Div([
         html.H2("Sample Data", style={'color': '#3498db', 'marginBottom': '15px'}),
         dash_table.DataTable(
             id='data-table',
-            columns=[{"name": i, "id": i} for i in df.columns],
-            data=df.head(10).to_dict('records'),
             style_table={'overflowX': 'auto'},
             style_cell={
                 'height': 'auto',
@@ -136,57 +142,143 @@ app.layout = html.Div([
     ], style={'backgroundColor': '#f8f9fa', 'padding': '20px', 'borderRadius': '10px'})
 ])
 
+# Health probe: answers as soon as the server is up, before the data is loaded
+@app.server.route('/health')
+def health():
+    """Report server liveness and data readiness (503 once the data failed to load)"""
+    status = backend.health()
+    return dict(status, figures=figures.stats()), probe_code(status)
+
+@app.server.route('/ready')
+def ready():
+    """Readiness probe: 503 until the data is loaded"""
+    status = backend.health()
+    return status, probe_code(status, ready=True)
+
+# Callback to fill the sample data table once the data is loaded
+@callback(
+    [Output('data-table', 'columns'),
+     Output('data-table', 'data')],
+    Input('data-table', 'id')
+)
+def update_table(_):
+    """Fill the sample data table"""
+    df = backend.head(10)
+    return [{"name": i, "id": i} for i in df.columns], df.to_dict('records')
+
+# Callback to remember the scatter zoom together with the axes it was made on
+@callback(
+    Output('scatter-zoom', 'data'),
+    Input('main-chart', 'relayoutData'),
+    [State('x-axis-dropdown', 'value'),
+     State('y-axis-dropdown', 'value'),
+     State('chart-type-dropdown', 'value'),
+     State('scatter-zoom', 'data')]
+)
+def update_zoom(relayout_data, x_axis, y_axis, chart_type, zoom):
+    """Store the visible scatter window after a zoom, pan or reset"""
+    zoom = zoom_state(relayout_data, x_axis, y_axis, zoom) if chart_type == 'scatter' else None
+    if zoom is None:
+        raise PreventUpdate
+    return zoom
+
 # Callback to update the chart based on user selections
 @callback(
-    Output('main-chart', 'figure'),
+    [Output('main-chart', 'figure'),
+     Output('chart-args', 'data')],
     [Input('x-axis-dropdown', 'value'),
      Input('y-axis-dropdown', 'value'),
      Input('chart-type-dropdown', 'value'),
      Input('color-dropdown', 'value'),
-     Input('size-dropdown', 'value')]
+     Input('size-dropdown', 'value'),
+     Input('scatter-zoom', 'data')],
+    State('chart-args', 'data')
 )
-def update_chart(x_axis, y_axis, chart_type, color_by, size_by):
-    """Update the chart based on user selections"""
+def update_chart(x_axis, y_axis, chart_type, color_by, size_by, zoom, shown):
+    """Update the chart; a colour or size change only sends what it restyles"""
+    args = dict(x_axis=x_axis, y_axis=y_axis, chart_type=chart_type, color_by=color_by,
+                size_by=size_by, zoom=zoom)
+    version = backend.version
+    return (update_figure(build_chart, args, shown, version, restyle_chart),
+            dict(args, version=version))
+
+def restyle_chart(args, shown):
+    """Patch a scatter's numeric colour or size from a fetch of the new column, or return None"""
+    changed = numeric_restyle(args, shown, numerical_columns)
+    if args['chart_type'] != 'scatter' or changed is None:
+        return None
+    x_axis, y_axis = args['x_axis'], args['y_axis']
+    color_col, size_col = (None if args[key] == 'None' else args[key] for key in STYLE_ARGS)
+    drawn = [x_axis, y_axis] + [col for col in (color_col, size_col) if col]
+    if len(set(drawn)) < len(drawn):
+        # A column drawn twice gets one hover label; leave that to the full figure
+        return None
+    # Same window and strata as the figure on screen, so the same rows in the same order
+    columns = [column for column in changed.values() if column]
+    df, _ = sample_scatter(backend, [x_axis, y_axis] + columns, x_axis, y_axis, args['zoom'])
+    values = {key: column and (column, df[column].to_numpy()) for key, column in changed.items()}
+    return marker_patch(values, hover_template(x_axis, y_axis, size_col, (), color_col))
+
+@figures.cached(version=lambda: backend.version, decode=True)
+def build_chart(x_axis, y_axis, chart_type, color_by, size_by, zoom=None):
+    """Build the chart for the user's selections"""
     # Handle the case where color_by or size_by is 'None'
     color_col = None if color_by == 'None' else color_by
     size_col = None if size_by == 'None' else size_by
     
+    # Fetch only the columns the chart draws; the line, bar, histogram and box charts query
+    # their own aggregates and the scatter a capped sample of the zoomed window
+    if chart_type == 'scatter':
+        df, total = sample_scatter(backend, [x_axis, y_axis, color_col, size_col],
+                                   x_axis, y_axis, zoom,
+                                   strata=color_col if color_col in categorical_columns else None)
+    elif chart_type not in ['line', 'bar', 'histogram', 'box']:
+        df = backend.rows([x_axis, y_axis, color_col, size_col])
+    
     # Create different chart types based on selection
     if chart_type == 'scatter':
+        title = f'{y_axis} vs {x_axis}' + sample_note(len(df), total)
         if size_col:
             fig = px.scatter(df, x=x_axis, y=y_axis, color=color_col, size=size_col,
-                           title=f'{y_axis} vs {x_axis}')
+                           title=title, render_mode=render_mode(len(df)))
         else:
             fig = px.scatter(df, x=x_axis, y=y_axis, color=color_col,
-                           title=f'{y_axis} vs {x_axis}')
+                           title=title, render_mode=render_mode(len(df)))
+        # Keep the user's zoom while the sample for it is swapped in
+        fig.update_layout(uirevision=f'{x_axis}|{y_axis}')
     
     elif chart_type == 'line':
         # For line chart, we'll aggregate data by date
         if color_col:
-            agg_data = df.groupby([df['Date'].dt.date, color_col]).agg({x_axis: 'mean', y_axis: 'mean'}).reset_index()
+            agg_data = backend.mean_by_date([x_axis, y_axis], by=color_col)
             fig = px.line(agg_data, x=x_axis, y=y_axis, color=color_col,
-                         title=f'{y_axis} vs {x_axis} (Time Series)')
+                         title=f'{y_axis} vs {x_axis} (Time Series)',
+                         render_mode=render_mode(len(agg_data)))
         else:
-            agg_data = df.groupby(df['Date'].dt.date).agg({x_axis: 'mean', y_axis: 'mean'}).reset_index()
+            agg_data = backend.mean_by_date([x_axis, y_axis])
             fig = px.line(agg_data, x=x_axis, y=y_axis,
-                         title=f'{y_axis} vs {x_axis} (Time Series)')
+                         title=f'{y_axis} vs {x_axis} (Time Series)',
+                         render_mode=render_mode(len(agg_data)))
     
     elif chart_type == 'bar':
-        # For bar chart, we'll group by the x-axis variable if it's categorical or discretized
-        if color_col:
-            fig = px.bar(df, x=x_axis, y=y_axis, color=color_col,
-                        title=f'Average {y_axis} by {x_axis}')
-        else:
-            fig = px.bar(df, x=x_axis, y=y_axis,
-                        title=f'Average {y_axis} by {x_axis}')
+        # One bar per x bin (or x value) and colour group, averaged on the server;
+        # a numeric colour shades each bar by its mean instead of splitting it
+        by = color_col if color_col in categorical_columns else None
+        shade = color_col if color_col in numerical_columns else None
+        bars, width = backend.bars(x_axis, y_axis, by=by, shade=shade)
+        fig = bar_figure(bars, width, x_axis, y_axis, by, shade)
     
     elif chart_type == 'histogram':
-        fig = px.histogram(df, x=x_axis, color=color_col,
-                          title=f'Distribution of {x_axis}')
+        # Bin counts per colour group, counted on the server
+        by = color_col if color_col in categorical_columns else None
+        counts, width = backend.histogram(x_axis, by)
+        fig = histogram_figure(counts, width, x_axis, by)
     
     elif chart_type == 'box':
-        fig = px.box(df, x=x_axis, y=y_axis, color=color_col,
-                    title=f'Distribution of {y_axis} by {x_axis}')
+        # Quartiles, whiskers and a capped set of outliers per box, computed on the server
+        by = color_col if color_col in categorical_columns else None
+        stats, outliers = backend.box(x_axis, y_axis, by)
+        fig = box_figure(stats, outliers, x_axis, y_axis, by)
     
     # Update layout
     fig.update_layout(
@@ -208,10 +300,10 @@ def update_chart(x_axis, y_axis, chart_type, color_by, size_by):
 def update_summary(selected_column):
     """Update the data summary section"""
     # Get basic statistics for the selected column
-    col_stats = df[selected_column].describe()
+    col_stats = backend.describe(selected_column)
     
     # Get correlation with Weekly_Sales
-    correlation = df[selected_column].corr(df['Weekly_Sales'])
+    correlation = backend.correlation(selected_column, 'Weekly_Sales')
     
     summary_html = html.Div([
         html.H3(f"Summary for {selected_column}", style={'color': '#2c3e50'}),
@@ -0,0 +1,218 @@
+"""
+Server-side summaries behind the bar, histogram and box charts
+The figures are built from a few aggregated rows instead of one mark per data
+row, so the browser never receives (or bins) the raw columns:
+
+- bar: a continuous x is binned (or kept as is when it has few distinct
+  values) and each bin and colour group gets one bar
+- histogram: counts per bin and colour group
+- box: quartiles, whiskers, mean and a capped set of outliers of y per x bin
+  and colour group, computed for every group in one sorted pass
+"""
+
+import numpy as np
+import pandas as pd
+import plotly.express as px
+import plotly.graph_objects as go
+
+# Bars for a continuous x axis
+BAR_BINS = 30
+
+# Histogram bins
+HIST_BINS = 40
+
+# Boxes along a continuous x axis (enough to keep one per Store)
+BOX_BINS = 50
+
+# Outliers drawn per box, split between the low and the high end
+MAX_OUTLIERS = 50
+
+# Aggregates a bar can show, with their DuckDB function names
+AGGREGATES = {'mean': 'avg', 'median': 'median', 'sum': 'sum', 'count': 'count',
+              'min': 'min', 'max': 'max'}
+
+AGGREGATE_LABELS = {'mean': 'Average', 'median': 'Median', 'sum': 'Total', 'count': 'Count',
+                    'min': 'Minimum', 'max': 'Maximum'}
+
+
+def bar_width(low, high, distinct, bins=BAR_BINS):
+    """Return the bin width for a continuous x, or None to keep x values as they are"""
+    if distinct <= bins or not high > low:
+        return None
+    return float(high - low) / bins
+
+
+def bin_centres(values, low, width, bins=BAR_BINS):
+    """Map each value to the centre of its equal-width bin"""
+    codes = np.minimum(np.floor((values - low) / width), bins - 1)
+    return low + width * (codes + 0.5)
+
+
+def bar_value(x, y, agg='mean'):
+    """Return the name of the bars' aggregated y column (y itself unless that is also the x key)"""
+    return y if y != x else f'{agg}({y})'
+
+
+def bar_aggregate(df, x, y, by=None, shade=None, agg='mean', bins=BAR_BINS):
+    """Return (bars, width): one row per x bin (and ``by`` group) with ``agg`` of y
+
+    ``shade`` is a numeric colour column; each bar carries its mean. ``width``
+    is the bin width, or None when x has few enough distinct values to keep.
+    The aggregate is named by bar_value, so y may be the x column itself.
+    """
+    values = df[x].to_numpy(dtype=float)
+    finite = values[np.isfinite(values)]
+    width = None
+    if len(finite):
+        width = bar_width(finite.min(), finite.max(), len(np.unique(finite)), bins)
+    if width is not None:
+        values = bin_centres(values, finite.min(), width, bins)
+    keys = [pd.Series(values, index=df.index, name=x)] + ([df[by]] if by else [])
+    aggregations = {bar_value(x, y, agg): (y, agg)}
+    if shade is not None and shade not in (x, y):
+        aggregations[shade] = (shade, 'mean')
+    bars = df.groupby(keys, observed=True).agg(**aggregations)
+    return bars.reset_index(), width
+
+
+def bar_figure(bars, width, x, y, by=None, shade=None, agg='mean'):
+    """Draw aggregated bars; colour groups are placed side by side"""
+    color = by or shade
+    if by is not None:
+        # Discrete colours even for integer groups such as Store
+        bars = bars.assign(**{by: bars[by].astype(str)})
+    value = bar_value(x, y, agg)
+    fig = px.bar(bars, x=x, y=value, color=color, barmode='group', labels={value: y},
+                 title=f'{AGGREGATE_LABELS[agg]} {y} by {x}')
+    if width is not None and by is None:
+        fig.update_traces(width=width)
+    return fig
+
+
+def histogram_edges(low, high, bins=HIST_BINS):
+    """Return ``bins + 1`` equal-width edges over [low, high]"""
+    low, high = float(low), float(high)
+    if not high > low:
+        low, high = low - 0.5, high + 0.5
+    return np.linspace(low, high, bins + 1)
+
+
+def histogram_table(df, x, by=None, bins=HIST_BINS):
+    """Return (counts, width): the non-empty bins of x per ``by`` group"""
+    values = df[x].to_numpy(dtype=float)
+    finite = np.isfinite(values)
+    if not finite.any():
+        return pd.DataFrame(columns=([by] if by else []) + [x, 'count']), 1.0
+    edges = histogram_edges(values[finite].min(), values[finite].max(), bins)
+    width = edges[1] - edges[0]
+    codes = np.minimum(((values[finite] - edges[0]) / width).astype(np.int64), bins - 1)
+    if by is None:
+        groups, labels = np.zeros(len(codes), dtype=np.int64), None
+    else:
+        groups, labels = pd.factorize(df[by].to_numpy()[finite], sort=True)
+    count = 1 if labels is None else len(labels)
+    counts = np.bincount(groups * bins + codes, minlength=count * bins)
+    table = pd.DataFrame({x: np.tile(edges[:-1] + width / 2, count), 'count': counts})
+    if by is not None:
+        table.insert(0, by, np.repeat(labels, bins))
+    return table[table['count'] > 0].reset_index(drop=True), width
+
+
+def box_kernel(values, groups, count, max_outliers=MAX_OUTLIERS):
+    """Return (stats, outlier rows) for ``values`` split into ``count`` groups
+
+    One lexicographic sort orders every group at once; quartiles are read by
+    linear interpolation at fractional positions (numpy's default method),
+    whiskers are the most extreme values within 1.5 IQR of the box, and up to
+    ``max_outliers`` of the values beyond them are kept per group.
+    """
+    keep = np.isfinite(values) & (groups >= 0)
+    values, groups = values[keep], groups[keep]
+    order = np.lexsort((values, groups))
+    values, groups = values[order], groups[order]
+    sizes = np.bincount(groups, minlength=count)
+    starts = np.concatenate([[0], np.cumsum(sizes)[:-1]])
+    filled = sizes > 0
+
+    def quantile(q):
+        result = np.full(count, np.nan)
+        position = starts[filled] + q * (sizes[filled] - 1)
+        below = np.floor(position).astype(np.int64)
+        above = np.ceil(position).astype(np.int64)
+        result[filled] = values[below] + (values[above] - values[below]) * (position - below)
+        return result
+
+    q1, median, q3 = quantile(0.25), quantile(0.5), quantile(0.75)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = np.bincount(groups, weights=values, minlength=count) / sizes
+    low_limit = (q1 - 1.5 * (q3 - q1))[groups]
+    high_limit = (q3 + 1.5 * (q3 - q1))[groups]
+    inside = (values >= low_limit) & (values <= high_limit)
+    lowerfence, upperfence = np.full(count, np.nan), np.full(count, np.nan)
+    lowerfence[filled] = np.fmin.reduceat(np.where(inside, values, np.nan), starts[filled])
+    upperfence[filled] = np.fmax.reduceat(np.where(inside, values, np.nan), starts[filled])
+
+    # Low outliers sit at the start of each sorted group, high ones at the end
+    index = np.arange(len(values))
+    from_start = index - starts[groups]
+    from_end = starts[groups] + sizes[groups] - 1 - index
+    outlier = (((values < low_limit) & (from_start < max_outliers // 2))
+               | ((values > high_limit) & (from_end < max_outliers - max_outliers // 2)))
+    stats = {'q1': q1, 'median': median, 'q3': q3, 'mean': mean,
+             'lowerfence': lowerfence, 'upperfence': upperfence, 'count': sizes}
+    return stats, (groups[outlier], values[outlier])
+
+
+def box_table(df, x, y, by=None, bins=BOX_BINS, max_outliers=MAX_OUTLIERS):
+    """Return (stats, outliers): box statistics of y per x bin and ``by`` group"""
+    values = df[x].to_numpy(dtype=float)
+    finite = values[np.isfinite(values)]
+    if len(finite):
+        width = bar_width(finite.min(), finite.max(), len(np.unique(finite)), bins)
+        if width is not None:
+            values = bin_centres(values, finite.min(), width, bins)
+    keys = [x] + ([by] if by else [])
+    grouped = df.assign(**{x: values}).groupby(keys, observed=True, sort=True)
+    groups = grouped.ngroup().to_numpy()
+    stats, (outlier_groups, outlier_values) = box_kernel(
+        df[y].to_numpy(dtype=float), groups, grouped.ngroups, max_outliers)
+    table = grouped.size().reset_index()[keys]
+    for name, column in stats.items():
+        table[name] = column
+    outliers = table[keys].iloc[outlier_groups].reset_index(drop=True)
+    outliers[y] = outlier_values
+    return table[table['count'] > 0].reset_index(drop=True), outliers
+
+
+def histogram_figure(table, width, x, by=None):
+    """Draw precomputed histogram counts, stacking colour groups"""
+    if by is not None:
+        table = table.assign(**{by: table[by].astype(str)})
+    fig = px.bar(table, x=x, y='count', color=by, title=f'Distribution of {x}')
+    fig.update_traces(width=width)
+    fig.update_layout(barmode='relative', bargap=0)
+    return fig
+
+
+def box_figure(stats, outliers, x, y, by=None):
+    """Draw precomputed box statistics, with the capped outliers as markers"""
+    fig = go.Figure()
+    colors = px.colors.qualitative.Plotly
+    groups = [None] if by is None else list(stats[by].unique())
+    for i, group in enumerate(groups):
+        part = stats if by is None else stats[stats[by] == group]
+        points = outliers if by is None else outliers[outliers[by] == group]
+        name = y if by is None else str(group)
+        color = colors[i % len(colors)]
+        fig.add_trace(go.Box(
+            name=name, legendgroup=name, x=part[x], q1=part['q1'], median=part['median'],
+            q3=part['q3'], mean=part['mean'], lowerfence=part['lowerfence'],
+            upperfence=part['upperfence'], marker_color=color, boxpoints=False
+        ))
+        fig.add_trace(go.Scatter(
+            name=name, legendgroup=name, x=points[x], y=points[y], mode='markers',
+            marker=dict(color=color, size=4), showlegend=False
+        ))
+    fig.update_layout(title=f'Distribution of {y} by {x}', boxmode='group',
+                      legend_title_text=by or '')
+    return fig
@@ -0,0 +1,707 @@
+"""
+Shared data loading for the Walmart dashboards
+Parses Walmart2.csv once into a compact typed frame and keeps an Arrow IPC
+cache next to it, so later process starts read the cache instead of re-parsing.
+
+The cache is rebuilt when the CSV's size or content hash changes; a changed
+mtime alone only triggers a hash check. When the CSV only grew, just the
+appended bytes are parsed and written to a tail file next to the cache, which
+is folded into the main file once it holds TAIL_FRACTION of the rows.
+
+The frame uses a compact schema (int16 Store, bool Holiday_Flag, categorical
+District, optionally float32 measures). Dates are read as a categorical, and
+each distinct string (about 143 weekly dates) is parsed once with an explicit
+day-first format; the derived int16 Week column counts whole weeks since
+WEEK_ORIGIN, so aggregations can group on integers instead of dates.
+
+In shared mode every worker memory-maps the same cache read-only (see
+attach_shared). Dataset loads the frame on a background thread and folds rows
+appended to the CSV into spare capacity at the end of its columns
+(FrameBuffer), so an ingest costs the new rows rather than the whole history.
+"""
+
+import io
+import os
+import json
+import hashlib
+import tempfile
+import threading
+import time
+from concurrent.futures import Future
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# Configuration
+BASE_DIR = Path(__file__).resolve().parent      # Lab1_InputProcessOutput/dashboard/
+WORKSPACE_ROOT = BASE_DIR.parent.parent          # math19Dec/
+DATA_DIR = WORKSPACE_ROOT / "Data"               # math19Dec/Data/
+DATA_PATH = Path(os.environ.get('WALMART_DATA', DATA_DIR / "Walmart2.csv"))
+CACHE_DIR = Path(os.environ.get('WALMART_CACHE_DIR', DATA_DIR / ".cache"))
+FLOAT32 = os.environ.get('WALMART_FLOAT32', '0') == '1'
+SHARED = os.environ.get('WALMART_SHARED', '0') == '1'
+WATCH_INTERVAL = float(os.environ.get('WALMART_WATCH', '0'))  # seconds, 0 disables
+
+# Bump when the parsing logic changes so stale caches are rebuilt
+CACHE_VERSION = 4
+
+# Column order of the loaded frame: the source columns plus the derived Week
+COLUMNS = ['Store', 'Date', 'Week', 'Weekly_Sales', 'Holiday_Flag', 'Temperature',
+           'Fuel_Price', 'CPI', 'Unemployment', 'District']
+
+# Dates in the source are day-first, e.g. 5/2/2010 and 12/2/2010
+DATE_FORMAT = '%d/%m/%Y'
+
+# Week is the number of whole weeks since this fixed origin, so codes stay
+# stable across appends and partitions
+WEEK_ORIGIN = pd.Timestamp('1970-01-01')
+
+# Compact in-memory schema (Date is handled separately as datetime64)
+SCHEMA = {
+    'Store': 'int16',
+    'Week': 'int16',
+    'Weekly_Sales': 'float64',
+    'Holiday_Flag': 'bool',
+    'Temperature': 'float64',
+    'Fuel_Price': 'float64',
+    'CPI': 'float64',
+    'Unemployment': 'float64',
+    'District': 'category',
+}
+
+# Cache files get the permissions of a plain open(): shared-mode workers may run
+# under other accounts. The umask can only be read by setting it, so read it once here
+UMASK = os.umask(0)
+os.umask(UMASK)
+
+# Fold the cache's tail file into the main file once it holds this share of the rows
+TAIL_FRACTION = 0.25
+
+# Rows of the CSV read to measure the plain-pandas footprint the compact schema is compared with
+BASELINE_ROWS = 100_000
+
+# Measures that tolerate single precision in float32 mode
+FLOAT32_COLUMNS = ['Temperature', 'Fuel_Price', 'CPI', 'Unemployment']
+
+
+def file_hash(path, size=None):
+    """Return the SHA-256 hex digest of a file, or of its first ``size`` bytes"""
+    digest = hashlib.sha256()
+    remaining = size
+    with open(path, 'rb') as f:
+        while remaining is None or remaining > 0:
+            chunk = f.read(1 << 20 if remaining is None else min(1 << 20, remaining))
+            if not chunk:
+                break
+            digest.update(chunk)
+            if remaining is not None:
+                remaining -= len(chunk)
+    return digest.hexdigest()
+
+
+def cache_paths(path, float32=False):
+    """Return the (cache file, metadata file) pair for a source CSV
+
+    The names carry a short hash of the resolved path, so CSVs with the same
+    name in different directories get separate caches.
+    """
+    path = Path(path)
+    stem = f"{path.stem}-{hashlib.sha256(str(path.resolve()).encode()).hexdigest()[:8]}"
+    if float32:
+        stem += '.f32'
+    return CACHE_DIR / f"{stem}.arrow", CACHE_DIR / f"{stem}.meta.json"
+
+
+def bytes_per_row(df):
+    """Return the in-memory footprint of a frame in bytes per row"""
+    if len(df) == 0:
+        return 0.0
+    return df.memory_usage(deep=True, index=False).sum() / len(df)
+
+
+def baseline_bytes_per_row(path, rows=BASELINE_ROWS):
+    """Return the bytes per row of a plain ``pd.read_csv`` of the CSV with its dates parsed
+
+    That is how the dashboards held the data before the compact schema. The
+    first ``rows`` rows are enough for a per-row figure.
+    """
+    df = pd.read_csv(path, nrows=rows)
+    df['Date'] = pd.to_datetime(df['Date'], dayfirst=True)
+    return bytes_per_row(df)
+
+
+def fit_integer(values, dtype):
+    """Return ``dtype``, widened to int32 if the values do not fit in it"""
+    info = np.iinfo(dtype)
+    if len(values) and (values.min() < info.min or values.max() > info.max):
+        return 'int32'
+    return dtype
+
+
+def apply_schema(df, float32=False):
+    """Cast a parsed frame to the compact dashboard schema"""
+    dtypes = {col: dtype for col, dtype in SCHEMA.items() if col in df.columns}
+    # Store stays int16 for hundreds of stores but widens for synthetic scale data
+    if 'Store' in dtypes:
+        dtypes['Store'] = fit_integer(df['Store'], dtypes['Store'])
+    if float32:
+        dtypes.update({col: 'float32' for col in FLOAT32_COLUMNS if col in df.columns})
+    return df.astype(dtypes)
+
+
+def report_memory(before, after, float32=False):
+    """Print the bytes per row before and after the compact schema"""
+    mode = "float32" if float32 else "float64"
+    print(f"[INFO] Sales frame: {before:.1f} -> {after:.1f} bytes/row "
+          f"with compact schema ({mode} measures)")
+
+
+def week_index(dates):
+    """Return the integer week index (weeks since WEEK_ORIGIN, -1 for missing dates)"""
+    dates = pd.DatetimeIndex(dates)
+    weeks = (dates - WEEK_ORIGIN).days.to_numpy(dtype='float64') // 7
+    return np.where(np.isnan(weeks), -1, weeks).astype('int16')
+
+
+def decode_dates(dates):
+    """Decode a categorical column of day-first date strings
+
+    Only ~143 distinct weekly dates repeat across every store, so each distinct
+    string is parsed once with an explicit format and the result is broadcast
+    through the integer category codes. Returns (datetimes, week index).
+    """
+    dates = pd.Categorical(dates)
+    try:
+        parsed = pd.to_datetime(dates.categories, format=DATE_FORMAT)
+    except ValueError:
+        # Mixed or unexpected formats: fall back to inference, still once per value
+        parsed = pd.to_datetime(dates.categories, format='mixed', dayfirst=True)
+    # A trailing NaT/-1 sentinel makes code -1 (missing) index the last slot
+    values = np.append(parsed.to_numpy(), np.array(['NaT'], dtype=parsed.dtype))
+    weeks = np.append(week_index(parsed), np.int16(-1))
+    return values[dates.codes], weeks[dates.codes]
+
+
+def parse_bytes(data):
+    """Parse raw CSV bytes (header included) into a DataFrame"""
+    # Reading Date as a category factorizes the strings during the parse
+    df = pd.read_csv(io.BytesIO(data), dtype={'Date': 'category'})
+    dates, weeks = decode_dates(df['Date'])
+    df['Date'] = dates
+    df.insert(df.columns.get_loc('Date') + 1, 'Week', weeks)
+    return df
+
+
+def complete_lines(data):
+    """Cut bytes after the last newline, i.e. a row that is still being written"""
+    end = data.rfind(b'\n') + 1
+    return data[:end] if end else data
+
+
+def parse_csv(path):
+    """Parse the complete rows of the raw CSV, returning the frame and the number of bytes parsed
+
+    A half-written last row is left for the next ingest, as with read_appended.
+    """
+    with open(path, 'rb') as f:
+        data = f.read()
+    complete = complete_lines(data)
+    if len(complete) < len(data):
+        print(f"[INFO] Leaving {len(data) - len(complete)} bytes after the last newline of {path} "
+              f"for the next ingest")
+    return parse_bytes(complete), len(complete)
+
+
+def read_appended(path, offset):
+    """Parse the complete rows appended to a CSV after byte ``offset``
+
+    Returns the new rows (or None) and the offset just past the last complete
+    line, so a row that is still being written is picked up on the next call.
+    """
+    with open(path, 'rb') as f:
+        header = f.readline()
+        f.seek(offset)
+        chunk = f.read()
+    chunk = chunk[:chunk.rfind(b'\n') + 1]
+    if not chunk.strip():
+        return None, offset
+    return parse_bytes(header + chunk), offset + len(chunk)
+
+
+def append_rows(df, new_rows):
+    """Append typed rows to a frame, widening categoricals instead of dropping to object
+
+    This copies the whole frame; use it for one-off merges such as loading
+    the cache's tail, and a FrameBuffer for repeated appends.
+    """
+    new_rows = new_rows[df.columns]
+    for col in df.columns:
+        if isinstance(df[col].dtype, pd.CategoricalDtype):
+            categories = df[col].cat.categories.union(new_rows[col].dropna().unique())
+            df = df.assign(**{col: df[col].cat.set_categories(categories)})
+            new_rows = new_rows.assign(**{col: pd.Categorical(new_rows[col], categories=categories)})
+    return pd.concat([df, new_rows], ignore_index=True)
+
+
+class FrameBuffer:
+    """Column arrays with spare capacity, so appending rows copies only the new rows
+
+    Capacity doubles whenever it runs out, making appends O(new rows)
+    amortized. ``frame()`` wraps views of the filled rows. Frames handed out
+    earlier are unaffected by later appends, which only write past their rows
+    (or into a larger allocation).
+    """
+
+    def __init__(self, df):
+        self.columns = list(df.columns)
+        self.size = len(df)
+        self.categories = {}
+        self.arrays = {}
+        capacity = max(2 * self.size, 1024)
+        for col in self.columns:
+            values = df[col]
+            if isinstance(values.dtype, pd.CategoricalDtype):
+                self.categories[col] = values.cat.categories
+                values = values.cat.codes
+            values = values.to_numpy()
+            self.arrays[col] = np.empty(capacity, dtype=values.dtype)
+            self.arrays[col][:self.size] = values
+
+    def codes(self, col, values):
+        """Return the category codes of new values, adding any new categories to the column"""
+        categories = self.categories[col]
+        new = pd.Index(values.dropna().unique()).difference(categories)
+        if len(new):
+            # Rare: keep the categories sorted by recoding the filled rows once, into a
+            # new array so frames handed out earlier keep their own codes
+            merged = categories.union(new)
+            codes = self.arrays[col][:self.size]
+            recoded = np.where(codes < 0, -1, merged.get_indexer(categories)[codes])
+            array = np.empty(len(self.arrays[col]), dtype=np.min_scalar_type(-len(merged)))
+            array[:self.size] = recoded
+            self.arrays[col], self.categories[col] = array, merged
+        return pd.Categorical(values, categories=self.categories[col]).codes
+
+    def append(self, new_rows):
+        """Copy new rows in after the filled ones and return the updated frame"""
+        end = self.size + len(new_rows)
+        columns = {}
+        for col in self.columns:
+            values = new_rows[col]
+            values = self.codes(col, values) if col in self.categories else values.to_numpy()
+            columns[col] = values
+            array = self.arrays[col]
+            dtype = array.dtype if col in self.categories else np.result_type(array.dtype, values.dtype)
+            if end > len(array) or dtype != array.dtype:
+                grown = np.empty(max(2 * end, len(array)), dtype=dtype)
+                grown[:self.size] = array[:self.size]
+                self.arrays[col] = grown
+        for col, values in columns.items():
+            self.arrays[col][self.size:end] = values
+        self.size = end
+        return self.frame()
+
+    def frame(self):
+        """Return a DataFrame viewing the filled rows"""
+        columns = {}
+        for col in self.columns:
+            values = self.arrays[col][:self.size]
+            if col in self.categories:
+                values = pd.Categorical.from_codes(values, categories=self.categories[col])
+            columns[col] = values
+        return pd.DataFrame(columns, copy=False)
+
+
+def cache_status(path, float32=False):
+    """Return (meta, status) for a CSV's cache
+
+    ``status`` is 'fresh' when the cache matches the CSV, 'appended' when the
+    CSV only grew since the cache was written, and None when it must be rebuilt.
+    """
+    cache_file, meta_file = cache_paths(path, float32)
+    if not cache_file.exists() or not meta_file.exists():
+        return None, None
+    try:
+        meta = json.loads(meta_file.read_text())
+    except (OSError, ValueError):
+        return None, None
+    if meta.get('version') != CACHE_VERSION:
+        return None, None
+
+    stat = os.stat(path)
+    if (meta.get('size'), meta.get('mtime_ns')) == (stat.st_size, stat.st_mtime_ns):
+        return meta, 'fresh'
+    # mtime changed (e.g. a fresh checkout or an append): compare content
+    size = meta.get('size', -1)
+    if size > stat.st_size or meta.get('sha256') != file_hash(path, size):
+        return None, None
+    if size < stat.st_size:
+        return meta, 'appended'
+    meta['mtime_ns'] = stat.st_mtime_ns
+    write_atomic(meta_file, json.dumps(meta).encode())
+    return meta, 'fresh'
+
+
+def tail_path(cache_file):
+    """Return the file holding the rows appended to the CSV after the main cache file was written"""
+    return cache_file.with_name(cache_file.name.replace('.arrow', '.tail.arrow'))
+
+
+def has_tail(meta):
+    """Return True if the cache's metadata covers bytes held in the tail file"""
+    return meta.get('base_size', meta['size']) < meta['size']
+
+
+def cache_files(path, float32=False):
+    """Return the Arrow files that make up a fresh cache: the main file and any tail"""
+    cache_file, meta_file = cache_paths(path, float32)
+    meta = json.loads(meta_file.read_text())
+    return [cache_file] + ([tail_path(cache_file)] if has_tail(meta) else [])
+
+
+def read_cache(path, float32=False, meta=None):
+    """Return the cached frame for a CSV (with its tail, per ``meta``), or None if unreadable"""
+    cache_file, _ = cache_paths(path, float32)
+    try:
+        df = pd.read_feather(cache_file)
+        if meta is not None and has_tail(meta):
+            df = append_rows(df, pd.read_feather(tail_path(cache_file)))
+        return df
+    except Exception as e:
+        print(f"[ERROR] Failed to read data cache {cache_file}: {e}")
+        return None
+
+
+def write_cache(path, df, size, raw_bytes_per_row=0.0, float32=False):
+    """Write the Arrow IPC cache and its metadata for the first ``size`` bytes of a CSV"""
+    cache_file, meta_file = cache_paths(path, float32)
+    meta = {
+        'version': CACHE_VERSION,
+        'raw_bytes_per_row': raw_bytes_per_row,
+        'source': str(Path(path).resolve()),
+        'size': size,
+        'base_size': size,
+        'mtime_ns': os.stat(path).st_mtime_ns,
+        'sha256': file_hash(path, size),
+    }
+    try:
+        CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        write_feather(cache_file, df)
+        write_atomic(meta_file, json.dumps(meta).encode())
+        tail_path(cache_file).unlink(missing_ok=True)
+    except ImportError:
+        print("[INFO] pyarrow is not installed; skipping the data cache")
+    except OSError as e:
+        print(f"[ERROR] Failed to write data cache {cache_file}: {e}")
+
+
+def write_tail(path, tail, size, meta, float32=False):
+    """Write the rows appended since the main cache file and extend the metadata to ``size`` bytes
+
+    Only the tail is rewritten, so bringing the cache up to date after an
+    append costs the appended rows rather than the whole history.
+    """
+    cache_file, meta_file = cache_paths(path, float32)
+    meta = dict(meta, size=size, mtime_ns=os.stat(path).st_mtime_ns, sha256=file_hash(path, size))
+    try:
+        write_feather(tail_path(cache_file), tail)
+        write_atomic(meta_file, json.dumps(meta).encode())
+    except OSError as e:
+        print(f"[ERROR] Failed to write data cache {tail_path(cache_file)}: {e}")
+
+
+def write_feather(target, df):
+    """Write a frame as an uncompressed Arrow IPC file (so it can be memory-mapped), atomically"""
+    tmp_file = temp_path(target)
+    try:
+        df.to_feather(tmp_file, compression='uncompressed')
+        os.replace(tmp_file, target)
+    finally:
+        tmp_file.unlink(missing_ok=True)
+
+
+def temp_path(target):
+    """Create an empty temporary file next to ``target`` and return its path
+
+    Each call gets its own name, so loaders in different threads or
+    processes never write over each other's temporary files. The file is
+    created private (0600), and the mode survives the rename, so it is
+    widened to what open() would have given.
+    """
+    with tempfile.NamedTemporaryFile(dir=target.parent, prefix=f"{target.name}.", suffix='.tmp',
+                                     delete=False) as f:
+        os.chmod(f.name, 0o666 & ~UMASK)
+        return Path(f.name)
+
+
+def write_atomic(target, payload):
+    """Write bytes to a file via a temporary file and rename"""
+    tmp = temp_path(target)
+    try:
+        tmp.write_bytes(payload)
+        os.replace(tmp, target)
+    finally:
+        tmp.unlink(missing_ok=True)
+
+
+def refresh_cache(path, use_cache=True, float32=False, compact=False):
+    """Bring the cache up to date with a CSV and return (frame, bytes parsed)
+
+    A fresh cache is read as is. When the CSV only had rows appended, just the
+    new byte range is parsed and written to the cache's tail file; the tail is
+    folded into the main file once it passes TAIL_FRACTION of the rows, or
+    whenever ``compact`` is set. Anything else triggers a full parse.
+    """
+    meta, status = cache_status(path, float32) if use_cache else (None, None)
+    df = read_cache(path, float32, meta) if status else None
+    if df is not None and status == 'fresh' and not (compact and has_tail(meta)):
+        report_memory(meta.get('raw_bytes_per_row', 0.0), bytes_per_row(df), float32)
+        return df, meta['size']
+    if df is not None and status in ['fresh', 'appended']:
+        offset, new_rows = meta['size'], None
+        if status == 'appended':
+            new_rows, offset = read_appended(path, meta['size'])
+        if new_rows is not None:
+            print(f"[INFO] Parsed {len(new_rows)} appended rows from {path}")
+            new_rows = apply_schema(new_rows, float32)
+            df = append_rows(df, new_rows)
+        cache_file, _ = cache_paths(path, float32)
+        tail = pd.read_feather(tail_path(cache_file)) if has_tail(meta) else None
+        if new_rows is not None:
+            tail = new_rows if tail is None else append_rows(tail, new_rows)
+        if tail is not None and (compact or len(tail) > TAIL_FRACTION * (len(df) - len(tail))):
+            write_cache(path, df, offset, meta.get('raw_bytes_per_row', 0.0), float32)
+        elif new_rows is not None:
+            write_tail(path, tail, offset, meta, float32)
+        return df, offset
+
+    raw, size = parse_csv(path)
+    before = baseline_bytes_per_row(path)
+    df = apply_schema(raw, float32)
+    report_memory(before, bytes_per_row(df), float32)
+    if use_cache:
+        write_cache(path, df, size, before, float32)
+    return df, size
+
+
+def attach_shared(path=DATA_PATH, float32=FLOAT32):
+    """Attach read-only to the memory-mapped cache, building it once if needed
+
+    The first process to take the lock parses the CSV and writes the cache;
+    every other worker waits on the lock and then maps the same file, so the
+    numeric and date columns are shared through the page cache instead of
+    being copied into each worker. Returns the frame and the bytes parsed.
+    Rows ingested later make the frame a private copy in that worker until
+    the next restart. Shared mode needs POSIX file locks (fcntl), so it is not
+    available on Windows.
+    """
+    import fcntl
+
+    import pyarrow as pa
+
+    cache_file, _ = cache_paths(path, float32)
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    # Read-only is enough for flock, so workers can share a lock file another account created
+    with os.fdopen(os.open(cache_file.with_suffix('.lock'), os.O_RDONLY | os.O_CREAT, 0o666)) as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            meta, status = cache_status(path, float32)
+            if status != 'fresh' or has_tail(meta):
+                # Workers map one file, so any tail is folded into it first
+                _, size = refresh_cache(path, True, float32, compact=True)
+            else:
+                size = meta['size']
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+    # The mapping stays alive as long as the frame references its buffers
+    table = pa.ipc.open_file(pa.memory_map(str(cache_file), 'r')).read_all()
+    # One block per column keeps numeric columns as zero-copy views of the map
+    df = table.to_pandas(split_blocks=True)
+    print(f"[INFO] Attached to shared dataset {cache_file} ({len(df)} rows)")
+    return df, size
+
+
+def select(df, columns=None, stores=None, districts=None, start=None, end=None):
+    """Restrict an in-memory frame to a store/district/date selection and columns"""
+    mask = pd.Series(True, index=df.index)
+    if stores is not None:
+        mask &= df['Store'].isin(stores)
+    if districts is not None:
+        mask &= df['District'].isin(districts)
+    if start is not None:
+        mask &= df['Date'] >= pd.Timestamp(start)
+    if end is not None:
+        mask &= df['Date'] <= pd.Timestamp(end)
+    if not mask.all():
+        df = df[mask].reset_index(drop=True)
+    if columns is not None:
+        keep = [col for col in df.columns if col in columns]
+        # Without Copy-on-Write (pandas < 3) a column selection copies every
+        # column, so a shared frame is only projected when that drops columns
+        if len(keep) < len(df.columns):
+            df = df[keep]
+    return df
+
+
+def load_source(path=DATA_PATH, use_cache=True, float32=FLOAT32, shared=SHARED):
+    """Load a CSV source, returning the frame and the number of bytes parsed"""
+    if shared:
+        return attach_shared(path, float32)
+    return refresh_cache(path, use_cache, float32)
+
+
+def load_data(path=DATA_PATH, use_cache=True, float32=FLOAT32, shared=SHARED,
+              columns=None, stores=None, districts=None, start=None, end=None):
+    """Load and prepare the Walmart dataset
+
+    ``path`` may be a single CSV or a partitioned store directory (see
+    partitioned_store.py). ``columns`` prunes columns and ``stores``,
+    ``districts``, ``start`` and ``end`` select rows; on a partitioned store
+    they are pushed down so only the matching files and columns are read.
+    """
+    path = Path(path)
+    if path.is_dir():
+        from partitioned_store import read_partitioned
+        return read_partitioned(path, columns, stores, districts, start, end, float32)
+
+    df, _ = load_source(path, use_cache, float32, shared)
+    return select(df, columns, stores, districts, start, end)
+
+
+class Dataset:
+    """Sales frame loaded and warmed on a background thread
+
+    The dashboards create one of these at import time and call ``start()``, so
+    the server binds its port immediately. Callbacks call ``frame()``, which
+    waits on the readiness future until the load and the warmers have run.
+
+    With ``watch`` set (or WALMART_WATCH, in seconds), a second thread polls a
+    CSV source and folds appended rows into the frame by parsing only the new
+    byte range. Subscribers are then called with ``(frame, new_rows)`` so they
+    can update or invalidate just the derived results the new dates touch;
+    ``new_rows`` is None after a full reload (the source was rewritten).
+    """
+
+    def __init__(self, path=DATA_PATH, columns=None, warmers=None, watch=WATCH_INTERVAL,
+                 **load_kwargs):
+        self.path = Path(path)
+        self.columns = columns
+        self.load_kwargs = load_kwargs
+        self.warmers = list(warmers or [])
+        self.listeners = []
+        self.watch = watch
+        self.future = Future()
+        self.thread = None
+        self.lock = threading.Lock()
+        self.df = None
+        self.buffer = None
+        self.offset = None
+        self.version = 0
+
+    def start(self):
+        """Start the background load (idempotent)"""
+        with self.lock:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._load, name='dataset-loader',
+                                               daemon=True)
+                self.thread.start()
+        return self
+
+    def subscribe(self, listener):
+        """Register ``listener(frame, new_rows)`` to run after each ingest"""
+        self.listeners.append(listener)
+        return listener
+
+    def _read(self):
+        """Read the whole source, returning the frame and the CSV bytes parsed"""
+        if self.path.is_dir():
+            return load_data(self.path, columns=self.columns, **self.load_kwargs), None
+        df, offset = load_source(self.path, **self.load_kwargs)
+        return select(df, self.columns), offset
+
+    def _load(self):
+        """Load the frame, run the warmers and resolve the readiness future"""
+        try:
+            self.df, self.offset = self._read()
+            for warm in self.warmers:
+                warm(self.df)
+        except Exception as e:
+            print(f"[ERROR] Failed to load dataset: {e}")
+            self.future.set_exception(e)
+            return
+        print(f"[INFO] Dataset ready ({len(self.df)} rows)")
+        self.future.set_result(self.df)
+        if self.watch and self.offset is not None:
+            threading.Thread(target=self._watch, name='dataset-watcher', daemon=True).start()
+
+    def _watch(self):
+        """Poll the source CSV and ingest whatever was appended"""
+        while True:
+            time.sleep(self.watch)
+            try:
+                if os.stat(self.path).st_size != self.offset:
+                    self.ingest()
+            except Exception as e:
+                print(f"[ERROR] Failed to ingest new rows from {self.path}: {e}")
+
+    def ingest(self):
+        """Fold rows appended to the source CSV into the frame and notify subscribers"""
+        size = os.stat(self.path).st_size
+        if size < self.offset:
+            # Truncated or rewritten: nothing to append to
+            return self.reload()
+        new_rows, offset = read_appended(self.path, self.offset)
+        if new_rows is None:
+            return None
+        new_rows = select(apply_schema(new_rows, self.load_kwargs.get('float32', FLOAT32)),
+                          self.columns)
+        with self.lock:
+            # The buffer copies only the new rows (the first ingest copies the frame into it once)
+            if self.buffer is None:
+                self.buffer = FrameBuffer(self.df)
+            self.df = self.buffer.append(new_rows)
+            self.offset = offset
+            self.version += 1
+        print(f"[INFO] Ingested {len(new_rows)} appended rows "
+              f"({new_rows['Date'].min():%Y-%m-%d} to {new_rows['Date'].max():%Y-%m-%d})")
+        for listener in self.listeners:
+            listener(self.df, new_rows)
+        return new_rows
+
+    def reload(self):
+        """Re-read the whole source and invalidate every subscriber"""
+        df, offset = self._read()
+        with self.lock:
+            self.df, self.offset, self.buffer = df, offset, None
+            self.version += 1
+        print(f"[INFO] Reloaded dataset ({len(df)} rows)")
+        for listener in self.listeners:
+            listener(self.df, None)
+        return None
+
+    def ready(self):
+        """Return True once the frame is loaded and warmed"""
+        return self.future.done() and self.future.exception() is None
+
+    def frame(self, timeout=None):
+        """Return the current frame, waiting for the background load if needed"""
+        self.start().future.result(timeout)
+        return self.df
+
+    def health(self):
+        """Return a small status payload for health probes"""
+        if not self.future.done():
+            status = 'loading'
+        elif self.future.exception() is not None:
+            status = 'error'
+        else:
+            status = 'ready'
+        return {'status': 'error' if status == 'error' else 'ok', 'data': status, 'version': self.version}
+
+
+if __name__ == '__main__':
+    # Materialize the cache once, e.g. before starting the dashboard workers
+    df = load_data()
+    print(f"[INFO] Loaded {len(df)} rows from {DATA_PATH}")
@@ -0,0 +1,144 @@
+"""
+Zoom-aware downsampling for the scatter charts
+Caps the number of points sent to the browser. The sample is stratified over a
+grid of cells covering the visible x/y window, and over the colour groups when
+colouring by a category. Every non-empty cell keeps up to the same quota of
+points, so sparse regions and outliers survive while dense clouds are thinned.
+
+When the user zooms, the chart re-queries the backend for the visible window
+only, so detail returns at full resolution once few enough points are in view.
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+
+# Most points sent for one scatter chart
+MAX_POINTS = int(os.environ.get('WALMART_MAX_POINTS', 5000))
+
+# Cells per axis of the sampling grid
+GRID_SIZE = 64
+
+# Colour columns with more distinct values than this are not used as strata
+MAX_STRATA = 64
+
+# Fixed seed: the same view always shows the same sample
+SEED = 0
+
+
+def axis_range(relayout_data, axis):
+    """Return the (low, high) range a relayout event sets on an axis
+
+    Returns None when the event resets the axis to autorange and False when
+    it does not touch the axis at all.
+    """
+    if relayout_data.get(f'{axis}.autorange'):
+        return None
+    low, high = relayout_data.get(f'{axis}.range[0]'), relayout_data.get(f'{axis}.range[1]')
+    if low is None or high is None:
+        low, high = (relayout_data.get(f'{axis}.range') or [None, None])[:2]
+    try:
+        low, high = float(low), float(high)
+    except (TypeError, ValueError):
+        return False
+    return min(low, high), max(low, high)
+
+
+def zoom_state(relayout_data, x, y, previous=None):
+    """Fold a relayout event into the stored zoom for the x/y axes
+
+    The state records the axes it belongs to, so a zoom made on one pair of
+    columns is never applied to another. Returns None when the event neither
+    zooms, pans nor resets (e.g. an autosize).
+    """
+    if not relayout_data:
+        return None
+    state = {'x': x, 'y': y, 'x_range': None, 'y_range': None}
+    if previous and previous.get('x') == x and previous.get('y') == y:
+        state.update(x_range=previous.get('x_range'), y_range=previous.get('y_range'))
+    changed = False
+    for axis, key in [('xaxis', 'x_range'), ('yaxis', 'y_range')]:
+        value = axis_range(relayout_data, axis)
+        if value is not False:
+            state[key] = value
+            changed = True
+    return state if changed else None
+
+
+def zoom_window(zoom, x, y):
+    """Return the {column: (low, high)} window a stored zoom puts on the x/y columns"""
+    if not zoom or zoom.get('x') != x or zoom.get('y') != y:
+        return {}
+    window = {}
+    if zoom.get('x_range'):
+        window[x] = tuple(zoom['x_range'])
+    if zoom.get('y_range'):
+        window[y] = tuple(zoom['y_range'])
+    return window
+
+
+def grid_cells(values, grid):
+    """Bin values into ``grid`` equal-width cells; missing values get their own cell"""
+    finite = np.isfinite(values)
+    if not finite.any():
+        return np.full(len(values), grid)
+    low, high = values[finite].min(), values[finite].max()
+    scale = grid / (high - low) if high > low else 0.0
+    with np.errstate(invalid='ignore'):
+        cells = np.clip((values - low) * scale, 0, grid - 1)
+    return np.where(finite, cells, grid).astype(np.int64)
+
+
+def cell_quota(counts, budget):
+    """Return the largest per-cell quota q with sum(min(counts, q)) <= budget"""
+    counts = np.sort(counts)
+    taken = np.concatenate([[0], np.cumsum(counts)[:-1]])
+    remaining = len(counts) - np.arange(len(counts))
+    # Quota if every smaller cell is taken whole and the rest share what is left
+    quotas = (budget - taken) // remaining
+    short = np.flatnonzero(quotas < counts)
+    return int(counts[-1] if len(short) == 0 else max(quotas[short[0]], 0))
+
+
+def stratified_sample(df, x, y, max_points=MAX_POINTS, strata=None, grid=GRID_SIZE, seed=SEED):
+    """Return at most ``max_points`` rows, spread evenly over x/y cells (and strata)"""
+    n = len(df)
+    if n <= max_points:
+        return df
+    cells = (grid_cells(df[x].to_numpy(dtype=float), grid) * (grid + 1)
+             + grid_cells(df[y].to_numpy(dtype=float), grid))
+    if strata is not None and df[strata].nunique() <= MAX_STRATA:
+        codes, uniques = pd.factorize(df[strata])
+        cells = cells * (len(uniques) + 1) + codes + 1
+    _, cells = np.unique(cells, return_inverse=True)
+    counts = np.bincount(cells)
+    quota = cell_quota(counts, max_points)
+
+    # Shuffle, then group by cell; each row's rank within its cell decides if it stays
+    rng = np.random.default_rng(seed)
+    order = rng.permutation(n)
+    order = order[np.argsort(cells[order], kind='stable')]
+    starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+    rank = np.arange(n) - np.repeat(starts, counts)
+    keep = rank < quota
+    # Spend what the even quota leaves over on one more row from some of the fuller cells
+    spare = max_points - int(keep.sum())
+    extra = np.flatnonzero(rank == quota)
+    if spare > 0 and len(extra):
+        keep[rng.choice(extra, min(spare, len(extra)), replace=False)] = True
+    return df.iloc[np.sort(order[keep])]
+
+
+def sample_scatter(backend, columns, x, y, zoom=None, strata=None, max_points=MAX_POINTS):
+    """Fetch a capped sample of the scatter rows in the zoomed window
+
+    Returns the sampled frame and the number of rows in the window. The
+    backend samples where the data lives (DuckDB fetches only the sample).
+    """
+    return backend.sample(columns, x, y, zoom_window(zoom, x, y), strata, max_points)
+
+
+def sample_note(shown, total):
+    """Return a title suffix saying how many points are shown, if not all"""
+    return "" if shown == total else f" ({shown:,} of {total:,} points)"
@@ -0,0 +1,231 @@
+"""
+Shared LRU cache of serialized chart figures
+Chart callbacks are pure functions of their control values over a given
+version of the data, so a rebuilt figure is wasted work whenever a user goes
+back to a combination they (or anyone else) already viewed. The cache keeps
+the serialized JSON of recent figures, keyed by the callback, its arguments
+and the dataset version, and evicts the least recently used ones once their
+total size passes a byte budget.
+
+Numeric trace arrays are serialized as base64 typed arrays (plotly.js's
+``{"dtype", "bdata"}`` form, decoded natively since plotly.js 2.28) instead
+of decimal text, whatever the installed plotly version does by default, and
+charts draw large marker and line traces with WebGL (``render_mode``).
+When orjson is installed it writes the JSON, encoding NumPy arrays natively;
+otherwise the standard library encoder with PlotlyJSONEncoder is used.
+"""
+
+import base64
+import functools
+import json
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+import plotly
+from plotly.basedatatypes import BaseFigure
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Total size of the cached figure JSON
+FIGURE_CACHE_BYTES = int(float(os.environ.get('WALMART_FIGURE_CACHE_MB', 64)) * 2 ** 20)
+
+# Above this many points, marker and line traces are drawn with WebGL instead of SVG
+WEBGL_ROWS = int(os.environ.get('WALMART_WEBGL_ROWS', 1000))
+
+# NumPy dtypes with a plotly.js typed-array code
+TYPED_ARRAYS = {'int8': 'i1', 'uint8': 'u1', 'int16': 'i2', 'uint16': 'u2', 'int32': 'i4',
+                'uint32': 'u4', 'float32': 'f4', 'float64': 'f8'}
+
+
+def render_mode(rows):
+    """Return the plotly.express render_mode for a trace of this many points"""
+    return 'webgl' if rows > WEBGL_ROWS else 'svg'
+
+
+def typed_array(values):
+    """Return a numeric array as a plotly.js typed-array spec, or None if it has no typed form"""
+    if values.dtype.kind == 'b':
+        values = values.astype(np.uint8)
+    elif values.dtype.kind in 'iu' and values.dtype.itemsize == 8:
+        # plotly.js has no 64-bit integers: narrow them when they fit, else send floats
+        bounds = np.iinfo(np.int32)
+        fits = values.size == 0 or (values.min() >= bounds.min and values.max() <= bounds.max)
+        values = values.astype(np.int32 if fits else np.float64)
+    code = TYPED_ARRAYS.get(values.dtype.name)
+    if code is None or values.ndim not in (1, 2):
+        return None
+    data = np.ascontiguousarray(values, dtype=values.dtype.newbyteorder('<')).tobytes()
+    spec = {'dtype': code, 'bdata': base64.b64encode(data).decode('ascii')}
+    if values.ndim == 2:
+        spec['shape'] = f'{values.shape[0]}, {values.shape[1]}'
+    return spec
+
+
+def iso_dates(values):
+    """Return an object array of naive datetimes as ISO strings, or None if it holds anything else"""
+    if pd.api.types.infer_dtype(values, skipna=True) not in ('datetime', 'datetime64'):
+        return None
+    dates = pd.Series(values).infer_objects()
+    if dates.dtype.kind != 'M':
+        return None
+    stamps = dates.to_numpy().astype('datetime64[ns]')
+    whole = not (stamps[~np.isnat(stamps)].astype(np.int64) % 10 ** 9).any()
+    text = np.datetime_as_string(stamps, unit='s' if whole else 'us').astype(object)
+    text[np.isnat(stamps)] = None
+    return text
+
+
+def object_array(values):
+    """Return an object array as nested lists, writing datetime columns in one vectorized pass
+
+    Left as Timestamps, hover data such as Date goes through the encoder's
+    fallback one element at a time, which dominates large scatter payloads.
+    """
+    if values.ndim == 1:
+        dates = iso_dates(values)
+        return (values if dates is None else dates).tolist()
+    if values.ndim != 2:
+        return values
+    columns = [iso_dates(column) for column in values.T]
+    if all(dates is None for dates in columns):
+        return values.tolist()
+    return np.column_stack([values[:, i] if dates is None else dates
+                            for i, dates in enumerate(columns)]).tolist()
+
+
+def encode_arrays(value):
+    """Replace the numeric arrays in a figure dict with typed-array specs"""
+    if isinstance(value, np.ndarray):
+        if value.dtype == object:
+            return object_array(value)
+        spec = typed_array(value)
+        return value if spec is None else spec
+    if isinstance(value, dict):
+        return {key: encode_arrays(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [encode_arrays(item) for item in value]
+    return value
+
+
+def figure_dict(fig):
+    """Return a figure's data and layout as dicts
+
+    The public ``Figure.to_plotly_json`` deep-copies every trace, which costs
+    more than writing the JSON for typical figures. The serializer only reads
+    the dicts (encode_arrays builds new containers), so it takes the figure's
+    own ``_data``/``_layout``: plotly's internal trace and layout dicts, the
+    same ones ``to_dict`` copies, on the versions pinned in requirements.txt.
+    Should a plotly release drop them, the public copy is used instead.
+    """
+    if not isinstance(fig, BaseFigure):
+        return fig
+    data, layout = getattr(fig, '_data', None), getattr(fig, '_layout', None)
+    if not isinstance(data, list) or not isinstance(layout, dict):
+        return fig.to_plotly_json()
+    return {'data': data, 'layout': layout}
+
+
+def dumps(value):
+    """Write JSON text with orjson when available, else with PlotlyJSONEncoder"""
+    if orjson is None:
+        return json.dumps(value, cls=plotly.utils.PlotlyJSONEncoder)
+    # Types orjson does not know (Timestamps, object arrays, ...) fall back to plotly's encoder
+    return orjson.dumps(value, default=plotly.utils.PlotlyJSONEncoder().default,
+                        option=orjson.OPT_SERIALIZE_NUMPY).decode()
+
+
+def loads(text):
+    """Parse JSON text, with orjson when available"""
+    return json.loads(text) if orjson is None else orjson.loads(text)
+
+
+def serialize(fig):
+    """Serialize a figure to JSON text, with numeric arrays as base64 typed arrays"""
+    return dumps(encode_arrays(figure_dict(fig)))
+
+
+def cache_key(name, version, args, kwargs):
+    """Return a hashable key for a call; dict arguments (e.g. a zoom) are frozen as JSON"""
+    return name, version, json.dumps([args, kwargs], sort_keys=True, default=str)
+
+
+class FigureCache:
+    """Bounded LRU of serialized figures with hit/miss counters"""
+
+    def __init__(self, max_bytes=FIGURE_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        """Return the cached JSON for key (marking it recently used), or None"""
+        with self.lock:
+            text = self.entries.get(key)
+            if text is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return text
+
+    def put(self, key, text):
+        """Store JSON for key, evicting the least recently used entries past the budget"""
+        if len(text) > self.max_bytes:
+            return
+        with self.lock:
+            if key in self.entries:
+                self.size -= len(self.entries.pop(key))
+            self.entries[key] = text
+            self.size += len(text)
+            while self.size > self.max_bytes:
+                _, evicted = self.entries.popitem(last=False)
+                self.size -= len(evicted)
+                self.evictions += 1
+
+    def figure(self, key, build):
+        """Return the serialized figure for key, building and caching it on a miss"""
+        text = self.get(key)
+        if text is None:
+            text = serialize(build())
+            self.put(key, text)
+        return text
+
+    def cached(self, version, decode=False):
+        """Decorate a figure-building function so its results are cached
+
+        ``version`` is called on every lookup, so a data reload or ingest
+        changes the keys. With ``decode`` the wrapper returns the figure as a
+        dict (what Dash callbacks return); otherwise it returns the JSON text.
+        """
+        def decorator(build):
+            @functools.wraps(build)
+            def wrapper(*args, **kwargs):
+                key = cache_key(build.__name__, version(), args, kwargs)
+                text = self.figure(key, lambda: build(*args, **kwargs))
+                return loads(text) if decode else text
+            return wrapper
+        return decorator
+
+    def clear(self):
+        """Drop every entry"""
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+
+    def stats(self):
+        """Return entry count, size and hit/miss counters"""
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {'entries': len(self.entries), 'bytes': self.size, 'max_bytes': self.max_bytes,
+                    'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions,
+                    'hit_rate': round(self.hits / lookups, 3) if lookups else None}
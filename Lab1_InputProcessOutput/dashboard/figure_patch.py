@@ -0,0 +1,138 @@
+"""
+Incremental figure updates for the Dash charts
+Changing only the colour or size control leaves most of a figure as it was:
+the x/y arrays, the axes and the template. The chart callbacks remember the
+arguments of the figure on screen, build the new figure as usual (usually a
+figure cache hit) and, when only styling arguments changed, send a Dash
+Patch holding just the parts that differ instead of the whole figure.
+A scatter whose colour and size stay numeric (or unset) skips even that: its
+patch sets the marker arrays from a fetch of the new column alone. The
+stored arguments carry the data version, so a figure drawn from older data is
+always replaced whole.
+"""
+
+import numpy as np
+import plotly.express as px
+import plotly.io as pio
+from dash import Patch
+
+# Chart callback arguments that restyle a figure without changing its view
+STYLE_ARGS = ('color_by', 'size_by')
+
+# Marker property each style argument sets when it names a numeric column
+MARKER_PROPS = {'color_by': 'color', 'size_by': 'size'}
+
+# Largest marker size plotly express gives a size column (its ``size_max``)
+SIZE_MAX = 20
+
+
+def patch_dict(patch, old, new):
+    """Record in ``patch`` the edits that turn dict ``old`` into ``new``, recursing into dicts"""
+    for key in old.keys() - new.keys():
+        del patch[key]
+    for key, value in new.items():
+        if key not in old:
+            patch[key] = value
+        elif isinstance(value, dict) and isinstance(old[key], dict):
+            patch_dict(patch[key], old[key], value)
+        elif old[key] != value:
+            patch[key] = value
+
+
+def figure_patch(old, new):
+    """Return a Patch that turns figure dict ``old`` into ``new``
+
+    Traces are patched key by key when both figures have the same trace
+    types in the same order (e.g. a new marker colour array); otherwise, as
+    when colouring by a category regroups the points, the trace list is
+    replaced whole. The layout is always patched key by key.
+    """
+    patch = Patch()
+    old_data, new_data = old.get('data', []), new.get('data', [])
+    if [trace.get('type') for trace in old_data] == [trace.get('type') for trace in new_data]:
+        for i, (before, after) in enumerate(zip(old_data, new_data)):
+            patch_dict(patch['data'][i], before, after)
+    else:
+        patch['data'] = new_data
+    patch_dict(patch['layout'], old.get('layout', {}), new.get('layout', {}))
+    return patch
+
+
+def numeric_restyle(args, shown, numeric, style=STYLE_ARGS):
+    """Return {argument: column or None} for the style changes a marker patch can make, or None
+
+    That is when the colour and size are numeric columns (or unset) both
+    before and after, so the scatter keeps its single trace and the same
+    sampled rows.
+    """
+    changed = {key: args[key] for key in style if args[key] != shown.get(key)}
+    values = [args[key] for key in style] + [shown.get(key) for key in style]
+    if not changed or any(value not in numeric and value != 'None' for value in values):
+        return None
+    return {key: None if column == 'None' else column for key, column in changed.items()}
+
+
+def hover_template(x, y, size=None, hover=(), color=None):
+    """Return the hover template plotly express gives a single-trace scatter"""
+    labels = [f'{x}=%{{x}}', f'{y}=%{{y}}']
+    if size:
+        labels.append(f'{size}=%{{marker.size}}')
+    labels += [f'{column}=%{{customdata[{i}]}}' for i, column in enumerate(hover)]
+    if color:
+        labels.append(f'{color}=%{{marker.color}}')
+    return '<br>'.join(labels) + '<extra></extra>'
+
+
+def marker_patch(values, hovertemplate):
+    """Return a Patch setting (or clearing) a single-trace scatter's marker colour and size
+
+    ``values`` maps each changed style argument to its (column, values) for
+    the rows on screen, in the same order, or to None when it is unset. The
+    colour scale and default colour are plotly express's, from its template.
+    """
+    template = pio.templates[px.defaults.template or pio.templates.default].layout
+    patch = Patch()
+    marker = patch['data'][0]['marker']
+    for key, value in values.items():
+        if key == 'color_by' and value is None:
+            marker['color'] = template.colorway[0]
+            del marker['coloraxis']
+            del patch['layout']['coloraxis']
+        elif key == 'color_by':
+            column, marker['color'] = value
+            marker['coloraxis'] = 'coloraxis'
+            patch['layout']['coloraxis'] = {
+                'colorbar': {'title': {'text': column}},
+                'colorscale': [list(stop) for stop in template.colorscale.sequential]}
+        elif value is None:
+            for prop in ('size', 'sizemode', 'sizeref'):
+                del marker[prop]
+            del patch['layout']['legend']['itemsizing']
+        else:
+            _, marker['size'] = value
+            marker['sizemode'] = 'area'
+            marker['sizeref'] = float(np.nanmax(value[1])) / SIZE_MAX ** 2
+            patch['layout']['legend']['itemsizing'] = 'constant'
+    patch['data'][0]['hovertemplate'] = hovertemplate
+    return patch
+
+
+def update_figure(build, args, shown, version=None, restyle=None, style=STYLE_ARGS):
+    """Return the figure for ``args``, or a Patch if it only restyles the figure on screen
+
+    ``build`` is the (cached) figure builder, called with ``args`` as
+    keywords; ``shown`` holds the arguments and data ``version`` of the
+    figure on screen, or None. ``restyle(args, shown)`` may return a Patch
+    made without building either figure, or None to diff the two instead.
+    """
+    if not shown or shown.get('version') != version:
+        return build(**args)
+    shown = {key: value for key, value in shown.items() if key != 'version'}
+    view = {key: value for key, value in args.items() if key not in style}
+    shown_view = {key: value for key, value in shown.items() if key not in style}
+    if view != shown_view:
+        return build(**args)
+    patch = restyle(args, shown) if restyle else None
+    if patch is not None:
+        return patch
+    return figure_patch(build(**shown), build(**args))
@@ -0,0 +1,249 @@
+"""
+Synthetic Walmart-shaped data generator for scale testing
+Produces datasets with the Walmart2.csv schema at any size (1e5 to 1e9 rows),
+with per-store sales levels, yearly seasonality, a holiday-week lift and
+slowly drifting economic indicators. Rows are generated and written in
+chunks of whole stores from one district, so memory stays bounded at any
+size and each chunk adds few files to the partitioned store.
+
+Usage:
+    python generate_data.py --rows 1000000
+    python generate_data.py --rows 100000000 --weeks 520 --format parquet
+"""
+
+import argparse
+import math
+import string
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from data_loader import DATA_DIR, apply_schema, week_index
+
+SYNTHETIC_DIR = DATA_DIR / "synthetic"
+
+# First week in the real dataset (weeks end on a Friday)
+START_DATE = pd.Timestamp('2010-02-05')
+
+# Week keeps int16 codes, which run out in 2598
+MAX_WEEKS = 30000
+
+# Target number of rows generated per chunk
+CHUNK_ROWS = 2_000_000
+
+# Above this many stores the Parquet output drops the Store directory level
+MAX_STORE_PARTITIONS = 500
+
+
+def district_names(count):
+    """Return spreadsheet-style district names: A..Z, AA, AB, ..."""
+    names = []
+    for i in range(count):
+        name = ''
+        i += 1
+        while i:
+            i, r = divmod(i - 1, 26)
+            name = string.ascii_uppercase[r] + name
+        names.append(name)
+    return names
+
+
+def holiday_weeks(dates):
+    """Flag the weeks (ending on each date) that contain a US retail holiday
+
+    Matches the Walmart data: Super Bowl (first Sunday of February), Labor Day
+    (first Monday of September), Thanksgiving (fourth Thursday of November)
+    and Christmas.
+    """
+    holidays = []
+    for year in range(dates.min().year, dates.max().year + 1):
+        feb = pd.date_range(f'{year}-02-01', periods=7)
+        sep = pd.date_range(f'{year}-09-01', periods=7)
+        nov = pd.date_range(f'{year}-11-22', periods=7)
+        holidays += [feb[feb.dayofweek == 6][0], sep[sep.dayofweek == 0][0],
+                     nov[nov.dayofweek == 3][0], pd.Timestamp(f'{year}-12-25')]
+    holidays = pd.DatetimeIndex(holidays).to_numpy()
+    # A week ending on date d covers d-6 .. d
+    ends = dates.to_numpy()[:, None]
+    return ((holidays >= ends - np.timedelta64(6, 'D')) & (holidays <= ends)).any(axis=1)
+
+
+def write_csv(chunk, path, header):
+    """Write (or append) a raw chunk in the source CSV layout"""
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+
+    table = pa.Table.from_pandas(chunk.astype({'Date': str}), preserve_index=False)
+    options = pa_csv.WriteOptions(include_header=False, quoting_style='none')
+    with open(path, 'wb' if header else 'ab') as f:
+        if header:
+            # Written by hand: pyarrow always quotes header names
+            f.write((','.join(chunk.columns) + '\n').encode())
+        pa_csv.write_csv(table, f, options)
+
+
+class Generator:
+    """Random store profiles plus week-level series shared by every chunk"""
+
+    def __init__(self, stores, weeks, seed=0):
+        self.stores = stores
+        self.weeks = weeks
+        self.rng = np.random.default_rng(seed)
+        rng = self.rng
+
+        # Week-level calendar
+        self.dates = pd.date_range(START_DATE, periods=weeks, freq='7D', unit='us')
+        self.date_strings = np.array([f"{d.day}/{d.month}/{d.year}" for d in self.dates])
+        self.week_codes = week_index(self.dates)
+        self.holiday = holiday_weeks(self.dates)
+        day_of_year = self.dates.dayofyear.to_numpy()
+        years = (self.dates - START_DATE).days.to_numpy() / 365.25
+        self.phase = 2 * np.pi * day_of_year / 365.25
+        self.years = years
+
+        # Sales seasonality: a gentle summer bump plus the Nov/Dec peak
+        december = np.exp(-0.5 * ((day_of_year - 355) / 12.0) ** 2)
+        november = np.exp(-0.5 * ((day_of_year - 330) / 4.0) ** 2)
+        self.season = 0.04 * np.sin(self.phase - np.pi / 2) + 0.35 * december + 0.12 * november
+
+        # National fuel price: a mean-reverting walk around $3.35
+        fuel = np.empty(weeks)
+        level = 2.6
+        for i in range(weeks):
+            level += 0.03 * (3.35 - level) + rng.normal(0, 0.04)
+            fuel[i] = level
+        self.fuel = fuel
+
+        # Store profiles
+        district_count = max(3, math.isqrt(stores) // 2)
+        self.district_labels = district_names(district_count)
+        # Districts own contiguous ranges of stores (of random sizes), so chunks of
+        # consecutive stores each write into as few District partitions as possible
+        self.store_district = np.sort(rng.integers(0, district_count, stores))
+        self.base_sales = rng.lognormal(np.log(9.5e5), 0.5, stores)
+        self.season_scale = rng.uniform(0.6, 1.4, stores)
+        self.holiday_lift = rng.normal(0.08, 0.03, stores)
+        self.growth = rng.normal(0.0, 0.03, stores)
+        self.temp_mean = rng.normal(60, 10, stores)
+        self.temp_amplitude = rng.uniform(8, 25, stores)
+        self.fuel_offset = rng.normal(0, 0.15, district_count)[self.store_district]
+        self.cpi_base = rng.choice([130.0, 210.0], stores) + rng.normal(0, 3, stores)
+        self.cpi_inflation = rng.normal(0.02, 0.004, stores)
+        self.unemployment_base = np.clip(rng.normal(8, 1.8, stores), 3.5, 15)
+        self.unemployment_trend = rng.normal(-0.25, 0.15, stores)
+
+    def chunk(self, first, last):
+        """Generate the rows for stores first..last-1 (0-based), all weeks"""
+        rng = self.rng
+        n_stores = last - first
+        stores = np.arange(first, last)
+        shape = (n_stores, self.weeks)
+
+        def per_store(values):
+            return values[stores][:, None]
+
+        trend = 1 + per_store(self.growth) * self.years
+        lift = 1 + per_store(self.holiday_lift) * self.holiday
+        season = 1 + per_store(self.season_scale) * self.season
+        noise = rng.normal(1, 0.05, shape)
+        sales = per_store(self.base_sales) * trend * season * lift * noise
+
+        temperature = (per_store(self.temp_mean)
+                       - per_store(self.temp_amplitude) * np.cos(self.phase - 0.35)
+                       + rng.normal(0, 4, shape))
+        fuel = self.fuel + per_store(self.fuel_offset) + rng.normal(0, 0.01, shape)
+        cpi = per_store(self.cpi_base) * (1 + per_store(self.cpi_inflation)) ** self.years
+        unemployment = np.clip(per_store(self.unemployment_base)
+                               + per_store(self.unemployment_trend) * self.years, 3, 16)
+        # Unemployment is published quarterly, so hold it for 13-week blocks
+        quarter = np.arange(self.weeks) // 13 * 13
+        unemployment = unemployment[:, quarter]
+
+        week_positions = np.tile(np.arange(self.weeks), n_stores)
+        districts = np.array(self.district_labels)[self.store_district[stores]]
+        return pd.DataFrame({
+            'Store': np.repeat(stores + 1, self.weeks),
+            'Date': pd.Categorical.from_codes(week_positions, categories=self.date_strings),
+            'Weekly_Sales': np.round(sales.ravel(), 2),
+            'Holiday_Flag': np.tile(self.holiday.astype('int8'), n_stores),
+            'Temperature': np.round(temperature.ravel(), 2),
+            'Fuel_Price': np.round(fuel.ravel(), 3),
+            'CPI': np.round(cpi.ravel(), 7),
+            'Unemployment': np.round(unemployment.ravel(), 3),
+            'District': np.repeat(districts, self.weeks),
+        })
+
+    def typed(self, chunk):
+        """Convert a raw chunk to the loader's typed frame (Date decoded, Week added)"""
+        codes = chunk['Date'].cat.codes.to_numpy()
+        frame = chunk.assign(Date=self.dates.to_numpy()[codes])
+        frame.insert(2, 'Week', self.week_codes[codes])
+        return apply_schema(frame)
+
+
+def store_chunks(store_district, stores_per_chunk):
+    """Yield (first, last) store ranges of at most ``stores_per_chunk`` stores within one district
+
+    Each chunk then writes one Parquet file per year of its district instead
+    of one into every District partition.
+    """
+    edges = [0, *(np.flatnonzero(np.diff(store_district)) + 1), len(store_district)]
+    for start, end in zip(edges[:-1], edges[1:]):
+        for first in range(start, end, stores_per_chunk):
+            yield first, min(end, first + stores_per_chunk)
+
+
+def generate(rows, weeks=520, out_dir=SYNTHETIC_DIR, formats=('csv', 'parquet'), seed=0,
+             partition_by=None):
+    """Generate about ``rows`` rows and write them in the requested formats"""
+    from partitioned_store import PARTITION_COLUMNS, write_partitioned
+
+    if weeks > MAX_WEEKS:
+        raise ValueError(f"weeks must be at most {MAX_WEEKS}")
+    weeks = min(weeks, rows)
+    stores = math.ceil(rows / weeks)
+    if partition_by is None:
+        partition_by = PARTITION_COLUMNS if stores <= MAX_STORE_PARTITIONS else ['District', 'year']
+    generator = Generator(stores, weeks, seed)
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    name = f"walmart_{stores * weeks}"
+    csv_path = out_dir / f"{name}.csv"
+    store_dir = out_dir / name
+
+    print(f"[INFO] Generating {stores * weeks} rows ({stores} stores x {weeks} weeks, "
+          f"{len(generator.district_labels)} districts)")
+    start = time.time()
+    stores_per_chunk = max(1, CHUNK_ROWS // weeks)
+    chunks = store_chunks(generator.store_district, stores_per_chunk)
+    for index, (first, last) in enumerate(chunks):
+        chunk = generator.chunk(first, last)
+        if 'csv' in formats:
+            write_csv(chunk, csv_path, header=index == 0)
+        if 'parquet' in formats:
+            write_partitioned(generator.typed(chunk), store_dir,
+                              basename=f"part-{index}-{{i}}.parquet", partition_by=partition_by)
+    print(f"[INFO] Done in {time.time() - start:.1f}s")
+    if 'csv' in formats:
+        print(f"[INFO] CSV: {csv_path}")
+    if 'parquet' in formats:
+        print(f"[INFO] Partitioned store: {store_dir} ({'/'.join(partition_by)})")
+    return csv_path, store_dir
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Generate synthetic Walmart-shaped sales data")
+    parser.add_argument('--rows', type=float, default=1e5,
+                        help="approximate number of rows (rounded up to whole stores)")
+    parser.add_argument('--weeks', type=int, default=520, help="weeks per store")
+    parser.add_argument('--out', type=Path, default=SYNTHETIC_DIR, help="output directory")
+    parser.add_argument('--format', nargs='+', choices=['csv', 'parquet'],
+                        default=['csv', 'parquet'], help="output formats")
+    parser.add_argument('--partition-by', nargs='+', choices=['District', 'Store', 'year'],
+                        help="Parquet directory levels (default: District Store year, "
+                             f"or District year above {MAX_STORE_PARTITIONS} stores)")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    generate(int(args.rows), args.weeks, args.out, args.format, args.seed, args.partition_by)
@@ -0,0 +1,76 @@
+"""
+Per-group correlation and regression for the Walmart dashboards
+The dashboards' summary statistics are global; analysts also want them per
+store or district, e.g. how Weekly_Sales responds to Fuel_Price in each
+store. Instead of one groupby().apply(corr) per group and pair, the rows are
+sorted by group once and every (group, x, y) combination is reduced together
+with segment sums over the sorted rows: counts and means first, then the
+centred sums of squares and cross products, from which the correlation and
+the OLS slope and intercept of y on x follow.
+"""
+
+import numpy as np
+import pandas as pd
+
+# Columns of the per-group regression table after the group key
+REGRESSION_COLUMNS = ['x', 'y', 'count', 'corr', 'slope', 'intercept']
+
+
+def regression_pairs(xs, ys):
+    """Return every (x, y) combination of distinct columns"""
+    return [(x, y) for y in ys for x in xs if x != y]
+
+
+def regression_table(groups, pairs, stats, by):
+    """Lay out per-group statistics (arrays of groups x pairs) as one row per (group, x, y)"""
+    size = len(groups)
+    table = pd.DataFrame({
+        by: np.tile(np.asarray(groups), len(pairs)),
+        'x': np.repeat([x for x, _ in pairs], size),
+        'y': np.repeat([y for _, y in pairs], size),
+    })
+    for name in REGRESSION_COLUMNS[2:]:
+        table[name] = np.asarray(stats[name], dtype=float).T.ravel()
+    table['count'] = table['count'].astype(np.int64)
+    return table
+
+
+def group_regressions(df, by, pairs):
+    """Return the correlation and OLS fit of y on x per ``by`` group for each (x, y) pair
+
+    Each pair uses the rows where both columns are present, as ``corr`` does.
+    Groups with fewer than two such rows get NaN statistics.
+    """
+    codes, groups = pd.factorize(df[by], sort=True)
+    order = np.argsort(codes, kind='stable')
+    codes = codes[order]
+    valid = codes >= 0
+    order, codes = order[valid], codes[valid]
+    starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]]) if len(codes) else np.array([], dtype=np.int64)
+    groups = groups[codes[starts]]
+    if not len(starts) or not pairs:
+        return pd.DataFrame(columns=[by] + REGRESSION_COLUMNS)
+
+    x = df[[x for x, _ in pairs]].to_numpy(dtype=float)[order]
+    y = df[[y for _, y in pairs]].to_numpy(dtype=float)[order]
+    present = ~np.isnan(x) & ~np.isnan(y)
+    sizes = np.diff(np.r_[starts, len(codes)])
+
+    # Segment sums: one row per group, one column per pair
+    count = np.add.reduceat(present.astype(float), starts, axis=0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean_x = np.add.reduceat(np.where(present, x, 0), starts, axis=0) / count
+        mean_y = np.add.reduceat(np.where(present, y, 0), starts, axis=0) / count
+    # Centring on the group means before squaring avoids cancellation at sales magnitudes
+    dx = np.where(present, x - np.repeat(mean_x, sizes, axis=0), 0)
+    dy = np.where(present, y - np.repeat(mean_y, sizes, axis=0), 0)
+    sxx = np.add.reduceat(dx * dx, starts, axis=0)
+    syy = np.add.reduceat(dy * dy, starts, axis=0)
+    sxy = np.add.reduceat(dx * dy, starts, axis=0)
+    single = count < 2
+    sxx[single], syy[single], sxy[single] = np.nan, np.nan, np.nan
+    with np.errstate(invalid='ignore', divide='ignore'):
+        slope = sxy / sxx
+        corr = sxy / np.sqrt(sxx * syy)
+    stats = {'count': count, 'corr': corr, 'slope': slope, 'intercept': mean_y - slope * mean_x}
+    return regression_table(groups, pairs, stats, by)
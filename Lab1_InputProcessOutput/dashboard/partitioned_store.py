@@ -0,0 +1,111 @@
+"""
+Partitioned Parquet store for the Walmart sales data
+Lays the data out as District=<d>/Store=<s>/year=<y>/ directories so a query
+filtered by store, district or date range only opens the matching partitions
+and only reads the columns it asks for.
+
+Usage:
+    python partitioned_store.py [source.csv] [output_dir]
+"""
+
+import sys
+from pathlib import Path
+
+import pandas as pd
+
+from data_loader import COLUMNS, DATA_DIR, DATA_PATH, apply_schema, load_data, week_index
+
+PARTITIONED_DIR = DATA_DIR / "walmart_partitioned"
+
+# Directory levels, outermost first. Stores with many thousands of stores can
+# drop the Store level (District/year) to avoid a flood of tiny files; readers
+# discover whichever levels are present.
+PARTITION_COLUMNS = ['District', 'Store', 'year']
+
+
+def partitioning(levels=PARTITION_COLUMNS):
+    """Return the hive partitioning for the given directory levels"""
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+
+    types = {'District': pa.string(), 'Store': pa.int32(), 'year': pa.int16()}
+    return ds.partitioning(pa.schema([(level, types[level]) for level in levels]),
+                           flavor='hive')
+
+
+def write_partitioned(df, root=PARTITIONED_DIR, basename='part-{i}.parquet',
+                      partition_by=PARTITION_COLUMNS):
+    """Write a sales frame as a partitioned Parquet store (District/Store/year by default)
+
+    Pass a distinct ``basename`` per call to add files to an existing store
+    chunk by chunk instead of replacing them.
+    """
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+
+    frame = df.assign(year=df['Date'].dt.year.astype('int16'),
+                      District=df['District'].astype(str))
+    # Contiguous partitions let the writer stream each file instead of scattering rows
+    frame = frame.sort_values(partition_by, kind='stable')
+    table = pa.Table.from_pandas(frame, preserve_index=False)
+    ds.write_dataset(table, str(root), format='parquet', partitioning=partitioning(partition_by),
+                     existing_data_behavior='overwrite_or_ignore',
+                     basename_template=basename, max_partitions=1 << 20)
+    print(f"[INFO] Wrote {len(df)} rows to partitioned store {root}")
+
+
+def build_filter(dataset, stores=None, districts=None, start=None, end=None):
+    """Build the pyarrow filter expression for a store/district/date selection"""
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+
+    conditions = []
+    if stores is not None:
+        conditions.append(ds.field('Store').isin([int(s) for s in stores]))
+    if districts is not None:
+        conditions.append(ds.field('District').isin([str(d) for d in districts]))
+
+    # The year bounds prune whole directories; the Date bounds use row-group stats
+    date_type = dataset.schema.field('Date').type
+    by_year = 'year' in dataset.schema.names
+    if start is not None:
+        start = pd.Timestamp(start)
+        if by_year:
+            conditions.append(ds.field('year') >= start.year)
+        conditions.append(ds.field('Date') >= pa.scalar(start.to_pydatetime(), type=date_type))
+    if end is not None:
+        end = pd.Timestamp(end)
+        if by_year:
+            conditions.append(ds.field('year') <= end.year)
+        conditions.append(ds.field('Date') <= pa.scalar(end.to_pydatetime(), type=date_type))
+
+    expression = None
+    for condition in conditions:
+        expression = condition if expression is None else expression & condition
+    return expression
+
+
+def read_partitioned(root=PARTITIONED_DIR, columns=None, stores=None, districts=None,
+                     start=None, end=None, float32=False):
+    """Read only the partitions and columns matching a selection"""
+    import pyarrow.dataset as ds
+
+    # Discover the partition levels from the key=value directory names
+    dataset = ds.dataset(str(root), format='parquet', partitioning='hive')
+    # Source column order; the synthetic year column is never returned
+    requested = COLUMNS if columns is None else columns
+    columns = [col for col in COLUMNS if col in dataset.schema.names and col in requested]
+
+    expression = build_filter(dataset, stores, districts, start, end)
+    table = dataset.to_table(columns=columns, filter=expression)
+    df = table.to_pandas()
+    if 'Week' in requested and 'Week' not in df.columns and 'Date' in df.columns:
+        # Stores written before the Week column existed
+        df.insert(df.columns.get_loc('Date') + 1, 'Week', week_index(df['Date']))
+    return apply_schema(df, float32)
+
+
+if __name__ == '__main__':
+    source = Path(sys.argv[1]) if len(sys.argv) > 1 else DATA_PATH
+    target = Path(sys.argv[2]) if len(sys.argv) > 2 else PARTITIONED_DIR
+    write_partitioned(load_data(source), target)
@@ -0,0 +1,620 @@
+"""
+Query backends for the Walmart dashboards
+The callbacks ask a backend for exactly what they display (the columns a chart
+needs, per-date means, column statistics, a correlation matrix) instead of
+working on a full in-memory frame. Two backends answer the same questions:
+
+- PandasBackend: the in-memory frame loaded by data_loader.Dataset (default)
+- DuckDBBackend: an embedded DuckDB engine scanning the Arrow cache or a
+  partitioned Parquet store, so group-bys, filters and statistics run out of
+  core and only the small result is materialized in pandas
+
+Both keep an aggregate_cube.Cube, built once at load, and answer per-date
+means from it whenever the requested columns and grouping are in the cube.
+Column names coming from the controls are checked against the dataset's
+columns before they are placed in SQL.
+
+Select one with WALMART_BACKEND=pandas|duckdb.
+"""
+
+import functools
+import os
+import threading
+from concurrent.futures import Future
+
+import numpy as np
+import pandas as pd
+
+from aggregate_cube import DIMENSIONS, MEASURES, STATS, Cube, date_aggregate
+from chart_stats import (AGGREGATES, BAR_BINS, BOX_BINS, HIST_BINS, MAX_OUTLIERS, bar_aggregate,
+                         bar_value, bar_width, box_table, histogram_edges, histogram_table)
+from data_loader import (COLUMNS, FLOAT32, SCHEMA, apply_schema, cache_files, cache_status, fit_integer,
+                         refresh_cache)
+from downsample import GRID_SIZE, MAX_POINTS, MAX_STRATA, SEED, cell_quota, stratified_sample
+from group_stats import REGRESSION_COLUMNS, group_regressions, regression_pairs, regression_table
+from rasterize import (RASTER_SHAPE, VOXEL_GRID, Raster, axis_bounds, raster_bounds, rasterize,
+                       voxelize, voxels_from_cells)
+from stats_index import SKETCH_PROBS, StatsIndex, correlation_matrix
+
+BACKEND = os.environ.get('WALMART_BACKEND', 'pandas')
+
+
+def quote_identifier(name):
+    """Quote a column name as an SQL identifier"""
+    return '"' + name.replace('"', '""') + '"'
+
+
+def per_version(method):
+    """Cache a backend method's result per argument tuple, dropping it when the data version changes"""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        cache = self.__dict__.setdefault('summaries', {})
+        if cache.get('version') != self.version:
+            cache.clear()
+            cache['version'] = self.version
+        # Column lists are keyed as tuples
+        key = (method.__name__, tuple(tuple(arg) if isinstance(arg, list) else arg for arg in args),
+               tuple(sorted(kwargs.items())))
+        if key not in cache:
+            cache[key] = method(self, *args, **kwargs)
+        return cache[key]
+    return wrapper
+
+
+def grid_code(column, bounds, bins):
+    """Return SQL for the bin of a column over [low, high] in ``bins`` equal cells"""
+    low, high = bounds
+    return f"least(CAST(floor(({column} - {low!r}) * {bins / (high - low)!r}) AS BIGINT), {bins - 1})"
+
+
+def cell_code(column, low, high, bins):
+    """Return SQL for a column's equal-width cell over [low, high], clipped to the grid
+
+    Missing values get a cell of their own (``bins``), as downsample.grid_cells does.
+    The test is explicit because DuckDB's least() and greatest() skip NULLs.
+    """
+    if not high > low:
+        return f"CASE WHEN {column} IS NULL THEN {bins} ELSE 0 END"
+    code = grid_code(column, (float(low), float(high)), bins)
+    return f"CASE WHEN {column} IS NULL THEN {bins} ELSE greatest({code}, 0) END"
+
+
+def probe_code(health, ready=False):
+    """Return the HTTP status for a health payload
+
+    Liveness (``ready=False``) fails only once the data failed to load;
+    readiness also fails while the data is still loading.
+    """
+    if health['data'] == 'error' or (ready and health['data'] != 'ready'):
+        return 503
+    return 200
+
+
+def unique_columns(columns):
+    """Drop None entries and duplicates while keeping order"""
+    return [col for col in dict.fromkeys(columns) if col is not None]
+
+
+class PandasBackend:
+    """Answers dashboard queries from the in-memory frame"""
+
+    name = 'pandas'
+
+    def __init__(self, dataset):
+        # The cube and the statistics index are built before the dataset reports
+        # ready and follow its ingests
+        self.cube = Cube(version=lambda: dataset.version)
+        self.stats = StatsIndex(version=lambda: dataset.version)
+        dataset.warmers += [self.cube.build, self.stats.build]
+        dataset.subscribe(self.cube.update)
+        dataset.subscribe(self.stats.update)
+        self.dataset = dataset.start()
+
+    @property
+    def version(self):
+        """Data version, bumped on every ingest or reload"""
+        return self.dataset.version
+
+    def health(self):
+        """Return a small status payload for health probes"""
+        return self.dataset.health()
+
+    def _window(self, window):
+        """Return the frame, restricted to rows within {column: (low, high)}"""
+        df = self.dataset.frame()
+        if window:
+            mask = np.ones(len(df), dtype=bool)
+            for col, (low, high) in window.items():
+                mask &= df[col].between(low, high).to_numpy()
+            df = df[mask]
+        return df
+
+    def rows(self, columns, window=None):
+        """Return the rows of the given columns, optionally within {column: (low, high)}"""
+        return self._window(window)[unique_columns(columns)]
+
+    def count(self, window=None):
+        """Return the number of rows, optionally within {column: (low, high)}"""
+        return len(self._window(window))
+
+    def sample(self, columns, x, y, window=None, strata=None, max_points=MAX_POINTS):
+        """Return (rows, total): at most ``max_points`` rows of the window, stratified over x/y cells"""
+        df = self.rows(columns, window)
+        return stratified_sample(df, x, y, max_points, strata), len(df)
+
+    def raster(self, x, y, shape=RASTER_SHAPE, window=None, means=()):
+        """Bin x/y into a pixel grid with counts and the mean of each ``means`` column"""
+        df = self.rows([x, y, *means], window)
+        return rasterize(df, x, y, raster_bounds(df, x, y, window), shape, unique_columns(means))
+
+    def voxels(self, x, y, z, grid=VOXEL_GRID, means=(), by=None):
+        """Bin x/y/z into occupied voxels with counts and the mean of each ``means`` column"""
+        means = unique_columns(means)
+        df = self.rows([x, y, z, *means, by])
+        return voxelize(df, x, y, z, raster_bounds(df, x, y, z=z), grid, means, by)
+
+    def bars(self, x, y, by=None, shade=None, agg='mean', bins=BAR_BINS):
+        """Return (bars, width): ``agg`` of y per x bin and ``by`` group"""
+        return bar_aggregate(self.rows([x, y, by, shade]), x, y, by, shade, agg, bins)
+
+    @per_version
+    def histogram(self, x, by=None, bins=HIST_BINS):
+        """Return (counts, width): the non-empty bins of x per ``by`` group"""
+        return histogram_table(self.rows([x, by]), x, by, bins)
+
+    @per_version
+    def box(self, x, y, by=None, bins=BOX_BINS):
+        """Return (stats, outliers): box statistics of y per x bin and ``by`` group"""
+        return box_table(self.rows([x, y, by]), x, y, by, bins)
+
+    def head(self, n):
+        """Return the first n rows"""
+        return self.dataset.frame().head(n)
+
+    def info(self):
+        """Return (row count, {column: dtype name})"""
+        df = self.dataset.frame()
+        return len(df), {col: str(dtype) for col, dtype in df.dtypes.items()}
+
+    def mean_by_date(self, columns, by=None):
+        """Return the mean of each column per date (and per ``by`` group)"""
+        # The version is read before the frame, so the result is never older than it
+        version = self.version
+        df = self.dataset.frame()
+        columns = unique_columns(columns)
+        if self.cube.covers(columns, [by] if by else [], version):
+            return self.cube.query(columns, 'mean', by)
+        return date_aggregate(df, [col for col in columns if col != by], by)
+
+    def describe(self, column):
+        """Return count/mean/std/min/max/missing and the quartiles of one column"""
+        if self.stats.covers([column], self.version):
+            return self.stats.describe(column)
+        values = self.dataset.frame()[column]
+        stats = values.describe()
+        return {key: stats[key] for key in ['count', 'mean', 'std', 'min', 'max', '25%', '50%', '75%']} | \
+            {'missing': int(values.isnull().sum())}
+
+    def correlation(self, x, y):
+        """Return the Pearson correlation of two columns"""
+        if self.stats.covers([x, y], self.version):
+            return self.stats.correlation(x, y)
+        df = self.dataset.frame()
+        return df[x].corr(df[y])
+
+    @per_version
+    def corr(self, columns):
+        """Return the pairwise correlation matrix of the given columns"""
+        columns = unique_columns(columns)
+        if self.stats.covers(columns, self.version):
+            return self.stats.corr(columns)
+        return correlation_matrix(self.dataset.frame()[columns])
+
+    @per_version
+    def regressions(self, by, xs, ys):
+        """Return the correlation and OLS fit of each y on each x per ``by`` group"""
+        pairs = regression_pairs(xs, ys)
+        df = self.dataset.frame()
+        return group_regressions(df[unique_columns([by] + list(xs) + list(ys))], by, pairs)
+
+
+class DuckDBBackend:
+    """Answers dashboard queries with an embedded DuckDB engine
+
+    A CSV source is scanned through its Arrow IPC cache (built once if
+    needed); a partitioned store is scanned directly. DuckDB pushes column
+    projections and filters into the scan, so memory use depends on the
+    result size, not on the table size.
+    """
+
+    name = 'duckdb'
+
+    def __init__(self, dataset):
+        self.path = dataset.path
+        self.columns = dataset.columns
+        self.float32 = dataset.load_kwargs.get('float32', FLOAT32)
+        self.names = []
+        # The scanned files do not change while the server runs
+        self.version = 0
+        self.connection = None
+        self.local = threading.local()
+        self.cube = Cube()
+        self.stats = StatsIndex()
+        self.future = Future()
+        threading.Thread(target=self._connect, name='duckdb-connect', daemon=True).start()
+
+    def _connect(self):
+        """Open the connection and register the source as the ``sales`` view"""
+        try:
+            import duckdb
+            import pyarrow.dataset as ds
+
+            if self.path.is_dir():
+                source = ds.dataset(str(self.path), format='parquet', partitioning='hive')
+            else:
+                _, status = cache_status(self.path, self.float32)
+                if status != 'fresh':
+                    refresh_cache(self.path, True, self.float32)
+                # The main cache file plus the tail of rows appended since it was written
+                source = ds.dataset([str(file) for file in cache_files(self.path, self.float32)],
+                                    format='ipc')
+            self.names = [col for col in source.schema.names
+                          if col != 'year' and (self.columns is None or col in self.columns)]
+            self.source = source
+            self.connection = duckdb.connect()
+            self.connection.register('sales', source)
+            self._build_cube()
+            self._build_stats()
+        except Exception as e:
+            print(f"[ERROR] Failed to open DuckDB backend: {e}")
+            self.future.set_exception(e)
+        else:
+            print(f"[INFO] DuckDB backend ready ({self.path})")
+            self.future.set_result(self.connection)
+
+    def _build_cube(self):
+        """Aggregate the base grain of the cube in one DuckDB scan"""
+        keys = ['Date'] + [dim for dim in DIMENSIONS if dim in self.names]
+        measures = [col for col in MEASURES if col in self.names]
+        select = [quote_identifier(key) for key in keys]
+        select += [f"{stat}({quote_identifier(col)}) AS {quote_identifier(col + '|' + stat)}"
+                   for col in measures for stat in STATS]
+        base = self.connection.execute(
+            f"SELECT {', '.join(select)} FROM sales GROUP BY ALL").df().set_index(keys)
+        base.columns = pd.MultiIndex.from_tuples([tuple(col.split('|')) for col in base.columns])
+        self.cube.set_base(base)
+
+    def _build_stats(self):
+        """Compute the statistics index in one DuckDB scan
+
+        The regr_* aggregates are taken over the rows where both arguments
+        are present, which is what the index's pair arrays hold.
+        """
+        columns = [col for col in MEASURES if col in self.names]
+        quoted = [quote_identifier(col) for col in columns]
+        probs = ', '.join(repr(float(p)) for p in SKETCH_PROBS)
+        select = ["count(*) AS rows"]
+        for i, c in enumerate(quoted):
+            select += [f"min({c}) AS low{i}", f"max({c}) AS high{i}",
+                       f"quantile_cont({c}, [{probs}]) AS sketch{i}"]
+            for j, d in enumerate(quoted):
+                select += [f"regr_count({d}, {c}) AS pn{i}_{j}", f"regr_avgx({d}, {c}) AS pm{i}_{j}",
+                           f"regr_sxx({d}, {c}) AS pv{i}_{j}", f"regr_sxy({d}, {c}) AS pc{i}_{j}"]
+        stats = self.connection.execute(f"SELECT {', '.join(select)} FROM sales").df().iloc[0]
+        size = range(len(columns))
+
+        def pairs(prefix):
+            return np.array([[stats[f'{prefix}{i}_{j}'] for j in size] for i in size], dtype=float)
+
+        def column(prefix):
+            return np.array([stats[f'{prefix}{i}'] for i in size], dtype=float)
+
+        sketch = np.full((len(SKETCH_PROBS), len(columns)), np.nan)
+        for i in size:
+            if stats[f'sketch{i}'] is not None:
+                sketch[:, i] = np.asarray(stats[f'sketch{i}'], dtype=float)
+        moments = {'rows': int(stats['rows']), 'pair_count': pairs('pn'),
+                   'pair_mean': np.nan_to_num(pairs('pm')), 'pair_m2': np.nan_to_num(pairs('pv')),
+                   'comoment': np.nan_to_num(pairs('pc')), 'low': column('low'), 'high': column('high')}
+        self.stats.install(columns, moments, sketch)
+
+    def health(self):
+        """Return a small status payload for health probes"""
+        if not self.future.done():
+            status = 'loading'
+        elif self.future.exception() is not None:
+            status = 'error'
+        else:
+            status = 'ready'
+        return {'status': 'error' if status == 'error' else 'ok', 'data': status, 'version': self.version}
+
+    def quote(self, column):
+        """Quote a known column name for SQL"""
+        self.future.result()
+        if column not in self.names:
+            raise ValueError(f"Unknown column: {column}")
+        return quote_identifier(column)
+
+    def query(self, sql, params=None):
+        """Run a query on this thread's cursor and return a pandas frame"""
+        cursor = getattr(self.local, 'cursor', None)
+        if cursor is None:
+            # Cursors share the database but not registrations, so each one
+            # registers the source; the Arrow dataset itself is shared
+            cursor = self.future.result().cursor()
+            cursor.register('sales', self.source)
+            self.local.cursor = cursor
+        return cursor.execute(sql, params).df()
+
+    def where(self, window):
+        """Return a WHERE clause and its parameters for {column: (low, high)}"""
+        conditions = [f"{self.quote(col)} BETWEEN ? AND ?" for col in window or {}]
+        params = [float(bound) for bounds in (window or {}).values() for bound in bounds]
+        return (f" WHERE {' AND '.join(conditions)}" if conditions else ""), params
+
+    def rows(self, columns, window=None):
+        """Return the rows of the given columns, optionally within {column: (low, high)}"""
+        select = ', '.join(self.quote(col) for col in unique_columns(columns))
+        where, params = self.where(window)
+        return self.query(f"SELECT {select} FROM sales{where}", params)
+
+    def count(self, window=None):
+        """Return the number of rows, optionally within {column: (low, high)}"""
+        where, params = self.where(window)
+        return int(self.query(f"SELECT count(*) AS n FROM sales{where}", params)['n'].iloc[0])
+
+    def sample(self, columns, x, y, window=None, strata=None, max_points=MAX_POINTS, grid=GRID_SIZE):
+        """Return (rows, total): at most ``max_points`` rows of the window, stratified over x/y cells
+
+        Same quota scheme as downsample.stratified_sample, but the rows are
+        ranked within their cells (in a fixed pseudo-random order) and cut in
+        DuckDB, so only the sample is fetched. The order hashes whole rows, so
+        the same window gives the same rows, in the same order, whichever
+        columns are fetched.
+        """
+        columns = unique_columns(columns)
+        qx, qy = self.quote(x), self.quote(y)
+        where, params = self.where(window)
+        distinct = f", count(DISTINCT {self.quote(strata)}) AS k" if strata else ""
+        extent = self.query(f"SELECT count(*) AS n, min({qx}) AS x0, max({qx}) AS x1, min({qy}) AS y0, "
+                            f"max({qy}) AS y1{distinct} FROM sales{where}", params).iloc[0]
+        total = int(extent['n'])
+        if total <= max_points:
+            return self.rows(columns, window), total
+        keys = [cell_code(qx, extent['x0'], extent['x1'], grid), cell_code(qy, extent['y0'], extent['y1'], grid)]
+        if strata and extent['k'] <= MAX_STRATA:
+            keys.append(self.quote(strata))
+        key = ', '.join(keys)
+        counts = self.query(f"SELECT count(*) AS n FROM sales{where} GROUP BY {key}", params)['n'].to_numpy()
+        quota = cell_quota(counts, max_points)
+        spare = max_points - int(np.minimum(counts, quota).sum())
+        select = ', '.join(self.quote(col) for col in columns)
+        ranked = (f"SELECT {select}, hash(sales, {SEED}) AS h, "
+                  f"row_number() OVER (PARTITION BY {key} ORDER BY hash(sales, {SEED})) AS rank "
+                  f"FROM sales{where}")
+        # The even quota per cell, plus one more row from some of the fuller cells for what it leaves over
+        sample = self.query(f"WITH ranked AS ({ranked}) "
+                            f"SELECT {select} FROM (SELECT {select}, h FROM ranked WHERE rank <= {quota} UNION ALL "
+                            f"(SELECT {select}, h FROM ranked WHERE rank = {quota + 1} ORDER BY h LIMIT {spare})) "
+                            f"ORDER BY h", params)
+        return sample, total
+
+    def raster(self, x, y, shape=RASTER_SHAPE, window=None, means=()):
+        """Bin x/y into a pixel grid with counts and the mean of each ``means`` column
+
+        The binning runs in DuckDB; only the non-empty pixels come back.
+        """
+        window = dict(window or {})
+        qx, qy = self.quote(x), self.quote(y)
+        if x not in window or y not in window:
+            where, params = self.where(window)
+            extent = self.query(f"SELECT min({qx}) AS x0, max({qx}) AS x1, min({qy}) AS y0, "
+                                f"max({qy}) AS y1 FROM sales{where}", params).iloc[0]
+            window.setdefault(x, (extent['x0'], extent['x1']) if extent.notna().all() else (0, 1))
+            window.setdefault(y, (extent['y0'], extent['y1']) if extent.notna().all() else (0, 1))
+        bounds = [axis_bounds(*window[x]), axis_bounds(*window[y])]
+        window[x], window[y] = bounds
+        means = unique_columns(means)
+        select = [f"{grid_code(qx, bounds[0], shape[0])} AS ix", f"{grid_code(qy, bounds[1], shape[1])} AS iy",
+                  "count(*) AS n"] + [f"avg({self.quote(col)}) AS {self.quote(col)}" for col in means]
+        where, params = self.where(window)
+        cells = self.query(f"SELECT {', '.join(select)} FROM sales{where} GROUP BY 1, 2", params)
+        return Raster.from_cells(bounds, shape, cells['ix'].to_numpy(), cells['iy'].to_numpy(),
+                                 cells['n'].to_numpy(), {col: cells[col].to_numpy() for col in means})
+
+    def voxels(self, x, y, z, grid=VOXEL_GRID, means=(), by=None):
+        """Bin x/y/z into occupied voxels with counts and the mean of each ``means`` column
+
+        The binning runs in DuckDB; only the occupied voxels come back.
+        """
+        quoted = [self.quote(col) for col in [x, y, z]]
+        extent = self.query("SELECT " + ', '.join(f"min({q}) AS low{i}, max({q}) AS high{i}"
+                                                  for i, q in enumerate(quoted)) + " FROM sales").iloc[0]
+        bounds = [axis_bounds(extent[f'low{i}'], extent[f'high{i}'])
+                  if pd.notna(extent[f'low{i}']) else (0.0, 1.0) for i in range(3)]
+        means = unique_columns(means)
+        select = [f"{grid_code(q, bound, grid)} AS {axis}"
+                  for q, bound, axis in zip(quoted, bounds, ['ix', 'iy', 'iz'])]
+        if by is not None:
+            select.append(f"{self.quote(by)} AS \"group\"")
+        keys = ', '.join(str(i + 1) for i in range(len(select)))
+        select += ["count(*) AS count"] + [f"avg({self.quote(col)}) AS {self.quote(col)}" for col in means]
+        conditions = ' AND '.join(f"{q} BETWEEN {low!r} AND {high!r}" for q, (low, high) in zip(quoted, bounds))
+        cells = self.query(f"SELECT {', '.join(select)} FROM sales WHERE {conditions} GROUP BY {keys}")
+        return voxels_from_cells(bounds, grid, cells, means, by is not None)
+
+    def bars(self, x, y, by=None, shade=None, agg='mean', bins=BAR_BINS):
+        """Return (bars, width): ``agg`` of y per x bin and ``by`` group, grouped in DuckDB"""
+        qx, qy = self.quote(x), self.quote(y)
+        extent = self.query(f"SELECT min({qx}) AS low, max({qx}) AS high, "
+                            f"count(DISTINCT {qx}) AS distinct FROM sales").iloc[0]
+        width = None
+        if extent['distinct']:
+            width = bar_width(extent['low'], extent['high'], extent['distinct'], bins)
+        key = qx
+        if width is not None:
+            low = float(extent['low'])
+            key = (f"{low!r} + {width!r} * (least(floor(({qx} - {low!r}) / {width!r}), {bins - 1}) + 0.5)")
+        select = [f"{key} AS {qx}"] + ([self.quote(by)] if by else [])
+        select.append(f"{AGGREGATES[agg]}({qy}) AS {quote_identifier(bar_value(x, y, agg))}")
+        if shade is not None and shade not in (x, y):
+            select.append(f"avg({self.quote(shade)}) AS {self.quote(shade)}")
+        keys = ', '.join(str(i + 1) for i in range(2 if by else 1))
+        bars = self.query(f"SELECT {', '.join(select)} FROM sales WHERE {qx} IS NOT NULL "
+                          f"GROUP BY {keys} ORDER BY {keys}")
+        return bars, width
+
+    @per_version
+    def histogram(self, x, by=None, bins=HIST_BINS):
+        """Return (counts, width): the non-empty bins of x per ``by`` group, counted in DuckDB"""
+        qx = self.quote(x)
+        extent = self.query(f"SELECT min({qx}) AS low, max({qx}) AS high FROM sales").iloc[0]
+        if extent.isna().any():
+            return pd.DataFrame(columns=([by] if by else []) + [x, 'count']), 1.0
+        edges = histogram_edges(extent['low'], extent['high'], bins)
+        low, width = float(edges[0]), float(edges[1] - edges[0])
+        centre = f"{low!r} + {width!r} * (least(floor(({qx} - {low!r}) / {width!r}), {bins - 1}) + 0.5)"
+        keys = ([self.quote(by)] if by else []) + [f"{centre} AS {qx}"]
+        order = ', '.join(str(i + 1) for i in range(len(keys)))
+        table = self.query(f"SELECT {', '.join(keys)}, count(*) AS count FROM sales "
+                           f"WHERE {qx} IS NOT NULL GROUP BY {order} ORDER BY {order}")
+        return table, width
+
+    @per_version
+    def box(self, x, y, by=None, bins=BOX_BINS, max_outliers=MAX_OUTLIERS):
+        """Return (stats, outliers): box statistics of y per x bin and ``by`` group, in DuckDB"""
+        qx, qy = self.quote(x), self.quote(y)
+        extent = self.query(f"SELECT min({qx}) AS low, max({qx}) AS high, "
+                            f"count(DISTINCT {qx}) AS distinct FROM sales").iloc[0]
+        key = qx
+        if extent['distinct']:
+            width = bar_width(extent['low'], extent['high'], extent['distinct'], bins)
+            if width is not None:
+                low = float(extent['low'])
+                key = f"{low!r} + {width!r} * (least(floor(({qx} - {low!r}) / {width!r}), {bins - 1}) + 0.5)"
+        keys = [qx] + ([self.quote(by)] if by else [])
+        group = ', '.join(keys)
+        half = max_outliers // 2
+        # Rows keyed by box (y as "value", in case it is also x or by), then
+        # each row with its box's 1.5 IQR limits
+        keyed = (f"WITH keyed AS (SELECT {', '.join([f'{key} AS {qx}'] + keys[1:])}, {qy} AS value "
+                 f"FROM sales WHERE {qx} IS NOT NULL AND {qy} IS NOT NULL), "
+                 f"boxes AS (SELECT {group}, quantile_cont(value, 0.25) AS q1, "
+                 f"quantile_cont(value, 0.5) AS median, quantile_cont(value, 0.75) AS q3, "
+                 f"avg(value) AS mean, count(*) AS count FROM keyed GROUP BY {group}), "
+                 f"limited AS (SELECT keyed.*, median, q1 - 1.5 * (q3 - q1) AS low, "
+                 f"q3 + 1.5 * (q3 - q1) AS high FROM keyed JOIN boxes USING ({group})) ")
+        stats = self.query(
+            keyed + f"SELECT {group}, q1, median, q3, mean, lowerfence, upperfence, count "
+            f"FROM boxes JOIN (SELECT {group}, min(value) FILTER (WHERE value >= low) AS lowerfence, "
+            f"max(value) FILTER (WHERE value <= high) AS upperfence FROM limited GROUP BY {group}) "
+            f"USING ({group}) ORDER BY {group}")
+        # The most extreme outliers of each box, split between its low and high end
+        outliers = self.query(
+            keyed + f"SELECT {group}, value AS {qy} FROM (SELECT *, row_number() OVER ("
+            f"PARTITION BY {group}, value < low ORDER BY abs(value - median) DESC) AS rank "
+            f"FROM limited WHERE value < low OR value > high) "
+            f"WHERE rank <= CASE WHEN value < low THEN {half} ELSE {max_outliers - half} END")
+        return stats, outliers
+
+    def head(self, n):
+        """Return the first n rows"""
+        self.future.result()
+        select = ', '.join(self.quote(col) for col in self.names)
+        return self.query(f"SELECT {select} FROM sales LIMIT {int(n)}")
+
+    def info(self):
+        """Return (row count, {column: dtype name}), named as the pandas backend names them
+
+        DuckDB returns dictionary-encoded columns such as District as strings
+        and hive partition keys as int32 (and last), so the types are recast
+        with the loader's schema and listed in its column order; Store is only
+        widened when its numbers need it.
+        """
+        bounds = ', min("Store") AS low, max("Store") AS high' if 'Store' in self.names else ''
+        extent = self.query(f"SELECT count(*) AS n{bounds} FROM sales").iloc[0]
+        dtypes = {col: str(dtype) for col, dtype in apply_schema(self.head(0), self.float32).dtypes.items()}
+        if bounds:
+            dtypes['Store'] = fit_integer(pd.Series([extent['low'], extent['high']]), SCHEMA['Store'])
+        order = [col for col in COLUMNS if col in dtypes] + [col for col in dtypes if col not in COLUMNS]
+        return int(extent['n']), {col: dtypes[col] for col in order}
+
+    def mean_by_date(self, columns, by=None):
+        """Return the mean of each column per date (and per ``by`` group)"""
+        self.future.result()
+        columns = unique_columns(columns)
+        if self.cube.covers(columns, [by] if by else [], self.version):
+            return self.cube.query(columns, 'mean', by)
+        keys = ['CAST("Date" AS DATE) AS "Date"'] + ([self.quote(by)] if by else [])
+        means = [f"avg({self.quote(col)}) AS {self.quote(col)}" for col in columns]
+        order = ', '.join(str(i + 1) for i in range(len(keys)))
+        return self.query(f"SELECT {', '.join(keys + means)} FROM sales "
+                          f"GROUP BY {order} ORDER BY {order}")
+
+    def describe(self, column):
+        """Return count/mean/std/min/max/missing and the quartiles of one column"""
+        c = self.quote(column)
+        if self.stats.covers([column]):
+            return self.stats.describe(column)
+        stats = self.query(
+            f"SELECT count({c}) AS count, avg({c}) AS mean, stddev_samp({c}) AS std, "
+            f"min({c}) AS min, max({c}) AS max, count(*) - count({c}) AS missing, "
+            f"quantile_cont({c}, [0.25, 0.5, 0.75]) AS quartiles FROM sales"
+        ).iloc[0]
+        quartiles = stats['quartiles'] if stats['quartiles'] is not None else [np.nan] * 3
+        return {key: stats[key] for key in ['count', 'mean', 'std', 'min', 'max']} | \
+            {'missing': int(stats['missing'])} | dict(zip(['25%', '50%', '75%'], quartiles))
+
+    def correlation(self, x, y):
+        """Return the Pearson correlation of two columns"""
+        self.future.result()
+        if self.stats.covers([x, y]):
+            return self.stats.correlation(x, y)
+        if x == y:
+            return 1.0
+        return self.query(f"SELECT corr({self.quote(x)}, {self.quote(y)}) AS r FROM sales")['r'].iloc[0]
+
+    @per_version
+    def corr(self, columns):
+        """Return the pairwise correlation matrix of the given columns, in one scan"""
+        self.future.result()
+        columns = unique_columns(columns)
+        if self.stats.covers(columns):
+            return self.stats.corr(columns)
+        pairs = [(i, j) for i in range(len(columns)) for j in range(i + 1, len(columns))]
+        matrix = np.eye(len(columns))
+        if pairs:
+            select = ', '.join(f"corr({self.quote(columns[i])}, {self.quote(columns[j])}) AS r{k}"
+                               for k, (i, j) in enumerate(pairs))
+            values = self.query(f"SELECT {select} FROM sales").iloc[0]
+            for k, (i, j) in enumerate(pairs):
+                matrix[i, j] = matrix[j, i] = values[f"r{k}"]
+        return pd.DataFrame(matrix, index=columns, columns=columns)
+
+    @per_version
+    def regressions(self, by, xs, ys):
+        """Return the correlation and OLS fit of each y on each x per ``by`` group, in one grouped scan"""
+        pairs = regression_pairs(xs, ys)
+        key = self.quote(by)
+        if not pairs:
+            return pd.DataFrame(columns=[by] + REGRESSION_COLUMNS)
+        select = [f"{key} AS key"]
+        for k, (x, y) in enumerate(pairs):
+            x, y = self.quote(x), self.quote(y)
+            select += [f"regr_count({y}, {x}) AS count{k}", f"corr({y}, {x}) AS corr{k}",
+                       f"regr_slope({y}, {x}) AS slope{k}", f"regr_intercept({y}, {x}) AS intercept{k}"]
+        result = self.query(f"SELECT {', '.join(select)} FROM sales WHERE {key} IS NOT NULL "
+                            f"GROUP BY {key} ORDER BY {key}")
+        stats = {name: result[[f"{name}{k}" for k in range(len(pairs))]].to_numpy(dtype=float)
+                 for name in REGRESSION_COLUMNS[2:]}
+        return regression_table(result['key'].to_numpy(), pairs, stats, by)
+
+
+BACKENDS = {'pandas': PandasBackend, 'duckdb': DuckDBBackend}
+
+
+def make_backend(dataset, name=BACKEND):
+    """Create the configured backend for a (not yet started) Dataset"""
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown backend {name!r}; choose from {', '.join(BACKENDS)}")
+    return BACKENDS[name](dataset)
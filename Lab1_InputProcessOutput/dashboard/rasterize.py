@@ -0,0 +1,271 @@
+"""
+Server-side density rendering for large scatter views
+Past a few hundred thousand points, markers only hide each other. Instead the
+x/y selection is binned into a fixed grid of pixels on the server (in the
+style of datashader) and sent as one heatmap, or as a surface for 3D views.
+Each pixel holds the number of points that fall in it, or the mean of the
+colour column over them, so the response size depends on the grid, not on
+the number of rows.
+
+3D scatters can also be aggregated into a voxel grid: each occupied voxel
+becomes one marker sized by its point count and coloured by the mean of the
+colour column. The grid gets finer as the camera moves closer.
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+import plotly.express as px
+import plotly.graph_objects as go
+
+# Pixels (width, height) of the 2D density grid
+RASTER_SHAPE = (int(os.environ.get('WALMART_RASTER_WIDTH', 400)),
+                int(os.environ.get('WALMART_RASTER_HEIGHT', 300)))
+
+# Cells per side of the 3D surface grid
+SURFACE_SHAPE = (100, 100)
+
+# Above this many points in view, 'auto' rendering switches to density
+DENSITY_ROWS = int(os.environ.get('WALMART_DENSITY_ROWS', 200_000))
+
+# Above this many points, 'auto' rendering aggregates 3D views into voxels
+VOXEL_ROWS = int(os.environ.get('WALMART_VOXEL_ROWS', 20_000))
+
+# Voxels per axis at the default camera distance; each zoom level doubles it
+VOXEL_GRID = int(os.environ.get('WALMART_VOXEL_GRID', 16))
+VOXEL_LEVELS = 3
+
+# Distance of plotly's default 3D camera eye (1.25, 1.25, 1.25) from the centre
+DEFAULT_EYE_DISTANCE = float(np.sqrt(3 * 1.25 ** 2))
+
+# Marker diameters (px) of the emptiest and the fullest voxel on the default grid
+VOXEL_SIZES = (3, 18)
+
+
+def density_mode(render, rows, numeric_color=False):
+    """Return None to draw markers, or the aggregation ('count' or 'mean') to rasterize"""
+    if render == 'auto':
+        render = 'density' if rows > DENSITY_ROWS else 'points'
+    if render == 'points':
+        return None
+    # Colouring by a measure shows its mean per pixel; otherwise the point count
+    return 'mean' if numeric_color else 'count'
+
+
+def voxel_mode(render, rows):
+    """Return True to aggregate a 3D view into voxels"""
+    return render == 'voxels' or (render == 'auto' and rows > VOXEL_ROWS)
+
+
+def voxel_grid(camera, base=VOXEL_GRID, levels=VOXEL_LEVELS):
+    """Return the voxels per axis for a 3D camera
+
+    The grid doubles each time the camera halves its distance to the scene
+    centre. It is snapped to a few levels so that small camera moves reuse
+    the same (cached) figure.
+    """
+    if not camera or 'eye' not in camera:
+        return base
+    eye, centre = camera['eye'], camera.get('center') or {}
+    distance = np.sqrt(sum((eye.get(axis, 0) - centre.get(axis, 0)) ** 2 for axis in 'xyz'))
+    if not distance > 0:
+        return base
+    level = int(np.clip(np.round(np.log2(DEFAULT_EYE_DISTANCE / distance)), 0, levels - 1))
+    return base * 2 ** level
+
+
+def axis_bounds(low, high):
+    """Return a non-empty (low, high) interval, whichever order the ends come in"""
+    low, high = sorted([float(low), float(high)])
+    return (low - 0.5, high + 0.5) if high == low else (low, high)
+
+
+def raster_bounds(df, x, y, window=None, z=None):
+    """Return the x/y (and z) extents to rasterize: the zoom window, else the data range"""
+    window = window or {}
+    bounds = []
+    for col in [x, y] + ([z] if z else []):
+        if col in window:
+            bounds.append(axis_bounds(*window[col]))
+        else:
+            values = df[col].to_numpy(dtype=float)
+            values = values[np.isfinite(values)]
+            bounds.append(axis_bounds(values.min(), values.max()) if len(values) else (0.0, 1.0))
+    return bounds
+
+
+def bin_codes(values, low, high, bins):
+    """Return the bin of each value over [low, high], or -1 outside the range or missing"""
+    values = np.asarray(values, dtype=float)
+    inside = (values >= low) & (values <= high)
+    codes = np.zeros(len(values), dtype=np.int64)
+    codes[inside] = np.minimum(((values[inside] - low) * (bins / (high - low))).astype(np.int64),
+                               bins - 1)
+    codes[~inside] = -1
+    return codes
+
+
+class Raster:
+    """Point counts, and optionally column means, over an x/y pixel grid"""
+
+    def __init__(self, bounds, shape, counts, means=None):
+        self.bounds = bounds
+        self.shape = shape
+        self.counts = counts
+        self.means = means or {}
+        self.total = int(counts.sum())
+
+    @classmethod
+    def from_cells(cls, bounds, shape, ix, iy, counts, means=None):
+        """Build a raster from sparse (ix, iy) cells, e.g. a SQL GROUP BY result"""
+        width, height = shape
+        grid = np.zeros((height, width), dtype=np.int64)
+        grid[iy, ix] = counts
+        dense = {}
+        for col, values in (means or {}).items():
+            dense[col] = np.full((height, width), np.nan)
+            dense[col][iy, ix] = values
+        return cls(bounds, shape, grid, dense)
+
+    def centers(self, axis):
+        """Return the pixel centres along axis 0 (x) or 1 (y)"""
+        low, high = self.bounds[axis]
+        bins = self.shape[axis]
+        return low + (high - low) / bins * (np.arange(bins) + 0.5)
+
+    def density(self):
+        """Return the counts with empty pixels as NaN, so they stay transparent"""
+        return np.where(self.counts > 0, self.counts, np.nan)
+
+
+def rasterize(df, x, y, bounds, shape=RASTER_SHAPE, means=()):
+    """Bin the rows of a frame into a Raster, with the mean of each ``means`` column"""
+    width, height = shape
+    ix = bin_codes(df[x], *bounds[0], width)
+    iy = bin_codes(df[y], *bounds[1], height)
+    inside = (ix >= 0) & (iy >= 0)
+    pixels = iy[inside] * width + ix[inside]
+    counts = np.bincount(pixels, minlength=width * height).reshape(height, width)
+    grids = {}
+    for col in means:
+        values = df[col].to_numpy(dtype=float)[inside]
+        finite = np.isfinite(values)
+        sums = np.bincount(pixels[finite], weights=values[finite], minlength=width * height)
+        numbers = np.bincount(pixels[finite], minlength=width * height)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            grids[col] = (sums / numbers).reshape(height, width)
+    return Raster(bounds, shape, counts, grids)
+
+
+def density_heatmap(raster, x, y, color=None, title=None):
+    """Draw a raster as a heatmap of counts, or of the mean of ``color``"""
+    z = raster.means[color] if color else raster.density()
+    label = f'Mean {color}' if color else 'Points'
+    fig = go.Figure(go.Heatmap(
+        x=raster.centers(0), y=raster.centers(1), z=z, colorscale='Viridis',
+        colorbar=dict(title=label),
+        hovertemplate=f'{x}: %{{x:.4g}}<br>{y}: %{{y:.4g}}<br>{label}: %{{z:.4g}}<extra></extra>'
+    ))
+    fig.update_layout(title=title, xaxis_title=x, yaxis_title=y)
+    return fig
+
+
+def density_surface(raster, x, y, z, color=None, title=None):
+    """Draw a raster as a surface of the mean ``z`` per cell, coloured by count or mean ``color``"""
+    surface_color = raster.means[color] if color else raster.density()
+    fig = go.Figure(go.Surface(
+        x=raster.centers(0), y=raster.centers(1), z=raster.means[z],
+        surfacecolor=surface_color, colorscale='Viridis',
+        colorbar=dict(title=f'Mean {color}' if color else 'Points')
+    ))
+    fig.update_layout(title=title, scene=dict(xaxis_title=x, yaxis_title=y, zaxis_title=f'Mean {z}'))
+    return fig
+
+
+class Voxels:
+    """Point counts, column means and optional groups of the occupied cells of an x/y/z grid"""
+
+    def __init__(self, bounds, grid, cells, counts, means=None, groups=None):
+        self.bounds = bounds
+        self.grid = grid
+        self.cells = cells
+        self.counts = counts
+        self.means = means or {}
+        self.groups = groups
+        self.total = int(counts.sum())
+
+    def centers(self, axis):
+        """Return the centres of the occupied voxels along axis 0 (x), 1 (y) or 2 (z)"""
+        low, high = self.bounds[axis]
+        return low + (high - low) / self.grid * (self.cells[:, axis] + 0.5)
+
+
+def voxelize(df, x, y, z, bounds, grid=VOXEL_GRID, means=(), by=None):
+    """Bin the rows of a frame into occupied voxels, per ``by`` group if given"""
+    codes = [bin_codes(df[col], *bound, grid) for col, bound in zip([x, y, z], bounds)]
+    inside = (codes[0] >= 0) & (codes[1] >= 0) & (codes[2] >= 0)
+    keys = {'voxel': ((codes[0] * grid + codes[1]) * grid + codes[2])[inside]}
+    if by is not None:
+        keys['group'] = df[by].to_numpy()[inside]
+    frame = pd.DataFrame(keys)
+    aggregations = {'count': ('voxel', 'size')}
+    for i, col in enumerate(means):
+        frame[f'mean{i}'] = df[col].to_numpy(dtype=float)[inside]
+        aggregations[col] = (f'mean{i}', 'mean')
+    cells = frame.groupby(list(keys), observed=True).agg(**aggregations).reset_index()
+    voxel = cells['voxel'].to_numpy()
+    cells = cells.assign(ix=voxel // (grid * grid), iy=voxel // grid % grid, iz=voxel % grid)
+    return voxels_from_cells(bounds, grid, cells, means, by is not None)
+
+
+def voxels_from_cells(bounds, grid, cells, means=(), grouped=False):
+    """Build Voxels from a frame of ix/iy/iz/count/mean columns (and 'group'), e.g. a SQL result"""
+    return Voxels(bounds, grid, cells[['ix', 'iy', 'iz']].to_numpy(dtype=np.int64),
+                  cells['count'].to_numpy(), {col: cells[col].to_numpy(dtype=float) for col in means},
+                  cells['group'].to_numpy() if grouped else None)
+
+
+def voxel_sizes(counts, grid):
+    """Return marker diameters growing with the square root of the voxel counts
+
+    Finer grids draw smaller markers, so that zooming in reveals structure
+    instead of piling up overlapping markers.
+    """
+    small, large = VOXEL_SIZES
+    scale = VOXEL_GRID / grid
+    if not len(counts):
+        return np.array([])
+    return (small + (large - small) * np.sqrt(counts / counts.max())) * scale
+
+
+def voxel_figure(voxels, x, y, z, color=None, by=None, title=None):
+    """Draw occupied voxels as 3D markers sized by count, coloured by group, mean ``color`` or count"""
+    sizes = voxel_sizes(voxels.counts, voxels.grid)
+    xs, ys, zs = voxels.centers(0), voxels.centers(1), voxels.centers(2)
+    hover = (f'{x}: %{{x:.4g}}<br>{y}: %{{y:.4g}}<br>{z}: %{{z:.4g}}'
+             f'<br>Points: %{{customdata[0]:,}}')
+    fig = go.Figure()
+    if by is not None:
+        colors = px.colors.qualitative.Plotly
+        for i, group in enumerate(pd.unique(voxels.groups)):
+            part = voxels.groups == group
+            fig.add_trace(go.Scatter3d(
+                x=xs[part], y=ys[part], z=zs[part], mode='markers', name=str(group),
+                marker=dict(size=sizes[part], color=colors[i % len(colors)], opacity=0.7,
+                            line=dict(width=0)),
+                customdata=voxels.counts[part, None], hovertemplate=hover
+            ))
+        fig.update_layout(legend_title_text=by)
+    else:
+        values = voxels.means[color] if color else voxels.counts
+        label = f'Mean {color}' if color else 'Points'
+        fig.add_trace(go.Scatter3d(
+            x=xs, y=ys, z=zs, mode='markers',
+            marker=dict(size=sizes, color=values, colorscale='Viridis', opacity=0.7,
+                        line=dict(width=0), colorbar=dict(title=label)),
+            customdata=np.column_stack([voxels.counts, values]),
+            hovertemplate=hover + f'<br>{label}: %{{customdata[1]:.4g}}<extra></extra>'
+        ))
+    fig.update_layout(title=title, scene=dict(xaxis_title=x, yaxis_title=y, zaxis_title=z))
+    return fig
@@ -0,0 +1,76 @@
+"""
+Rolling statistics over the dashboards' weekly series
+The time-series tab shows moving statistics of a variable's per-date mean,
+overall or for one store, over windows the user picks. Instead of running
+``rolling(window)`` again for every window and every change, the series are
+aligned on one date index and their prefix sums (of counts, values and
+squares) are computed once; any window's count, sum, mean or standard
+deviation at every date is then a difference of two prefix rows, O(n) for all
+series together whatever the window length. The exponentially weighted
+average has no prefix-sum form and runs pandas' ewm on the aligned series.
+"""
+
+import numpy as np
+import pandas as pd
+
+# Statistics a rolling window can show, with their display names
+ROLLING_STATS = {'mean': 'Moving Average', 'sum': 'Moving Sum', 'std': 'Moving Std Dev',
+                 'ewma': 'Exponentially Weighted Average'}
+
+
+def prefix_sums(values):
+    """Return running totals down the rows, with a leading row of zeros"""
+    totals = np.zeros((len(values) + 1,) + values.shape[1:])
+    np.cumsum(values, axis=0, out=totals[1:])
+    return totals
+
+
+class RollingFrame:
+    """Aligned series (one column each) with the prefix sums that answer any rolling window
+
+    Windows count rows ending at each date, like ``DataFrame.rolling``: a
+    result needs ``min_periods`` (by default all ``window``) values present.
+    """
+
+    def __init__(self, wide):
+        self.index = wide.index
+        self.columns = wide.columns
+        self.values = wide.to_numpy(dtype=float)
+        present = ~np.isnan(self.values)
+        # Sums of squares are kept about each series' mean so large values do not cancel
+        with np.errstate(invalid='ignore', divide='ignore'):
+            self.centre = np.nan_to_num(np.where(present, self.values, 0).sum(axis=0) / present.sum(axis=0))
+        centred = np.where(present, self.values - self.centre, 0)
+        self.counts = prefix_sums(present.astype(float))
+        self.sums = prefix_sums(centred)
+        self.squares = prefix_sums(centred ** 2)
+
+    def frame(self, values):
+        """Wrap an array of results in the series' index and columns"""
+        return pd.DataFrame(values, index=self.index, columns=self.columns)
+
+    def windows(self, table, window):
+        """Return each row's total of a prefix table over the ``window`` rows ending there"""
+        end = np.arange(1, len(self.index) + 1)
+        return table[end] - table[np.maximum(end - window, 0)]
+
+    def stat(self, stat, window, min_periods=None):
+        """Return a rolling statistic (a key of ROLLING_STATS) of every series"""
+        if stat == 'ewma':
+            # A recursive average has no prefix-sum form; pandas runs it in one O(n) pass
+            return self.frame(self.values).ewm(span=window).mean()
+        count = self.windows(self.counts, window)
+        total = self.windows(self.sums, window)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            if stat == 'mean':
+                result = total / count + self.centre
+            elif stat == 'sum':
+                result = total + self.centre * count
+            elif stat == 'std':
+                spread = self.windows(self.squares, window) - total ** 2 / count
+                # A single value has no sample deviation (pandas gives NaN, not inf)
+                result = np.where(count > 1, np.sqrt(np.maximum(spread, 0) / (count - 1)), np.nan)
+            else:
+                raise ValueError(f"Unknown rolling statistic: {stat}")
+        enough = count >= (window if min_periods is None else max(min_periods, 1))
+        return self.frame(np.where(enough, result, np.nan))
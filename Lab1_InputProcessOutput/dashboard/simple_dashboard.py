@@ -3,33 +3,34 @@ Simple Dashboard for Walmart Sales Data Analysis
 Using Flask and Plotly for a lightweight solution.
 """
 
-import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
 from flask import Flask, render_template, request, jsonify
-import json
-import plotly
 import numpy as np
 from datetime import datetime
 
-# Load and prepare data
-def load_data():
-    """Load and prepare the Walmart dataset"""
-    df = pd.read_csv('/Users/simonwang/Documents/Usage/MathAI/MscMinicourse/Data/Walmart2.csv')
-    # Convert date column to datetime (day-first format)
-    df['Date'] = pd.to_datetime(df['Date'], dayfirst=True)
-    return df
+from chart_stats import bar_figure, box_figure, histogram_figure
+from data_loader import Dataset
+from downsample import sample_note, sample_scatter
+from figure_cache import FigureCache, render_mode
+from query_backend import make_backend, probe_code
 
 # Initialize Flask app
 app = Flask(__name__)
 
-# Load data
-df = load_data()
-
 # Get column names for dropdown options
 numerical_columns = ['Weekly_Sales', 'Temperature', 'Fuel_Price', 'CPI', 'Unemployment']
 categorical_columns = ['Store', 'Holiday_Flag', 'District']
 
+# Load data in the background, pruned to the columns the views use
+# (WALMART_SHARED=1 maps one read-only copy shared by all WSGI workers), and
+# answer the routes' queries through the configured backend
+dataset = Dataset(columns=['Date', 'Week'] + numerical_columns + categorical_columns)
+backend = make_backend(dataset)
+
+# Serialized figures of recent control combinations, shared by all users
+figures = FigureCache()
+
 @app.route('/')
 def index():
     """Main dashboard page"""
@@ -37,6 +38,18 @@ def index():
                          numerical_columns=numerical_columns,
                          categorical_columns=categorical_columns)
 
+@app.route('/health')
+def health():
+    """Report server liveness and data readiness (503 once the data failed to load)"""
+    status = backend.health()
+    return jsonify(dict(status, figures=figures.stats())), probe_code(status)
+
+@app.route('/ready')
+def ready():
+    """Readiness probe: 503 until the data is loaded"""
+    status = backend.health()
+    return jsonify(status), probe_code(status, ready=True)
+
 @app.route('/get_chart', methods=['POST'])
 def get_chart():
     """Generate chart based on user selections"""
@@ -47,51 +60,75 @@ def get_chart():
     chart_type = data.get('chart_type', 'scatter')
     color_by = data.get('color_by', 'None')
     size_by = data.get('size_by', 'None')
+    # Visible scatter window, sent by the page after a zoom or pan
+    zoom = data.get('zoom')
     
+    # Repeat views are served from the figure cache as ready-made JSON
+    return build_chart(x_axis, y_axis, chart_type, color_by, size_by, zoom)
+
+@figures.cached(version=lambda: backend.version)
+def build_chart(x_axis, y_axis, chart_type, color_by, size_by, zoom=None):
+    """Build the chart figure for a control combination"""
     # Handle the case where color_by or size_by is 'None'
     color_col = None if color_by == 'None' else color_by
     size_col = None if size_by == 'None' else size_by
     
+    # Fetch only the columns the chart draws; the line, bar, histogram and box charts query
+    # their own aggregates and the scatter a capped sample of the zoomed window
+    if chart_type == 'scatter':
+        df, total = sample_scatter(backend, [x_axis, y_axis, color_col, size_col],
+                                   x_axis, y_axis, zoom,
+                                   strata=color_col if color_col in categorical_columns else None)
+    elif chart_type not in ['line', 'bar', 'histogram', 'box']:
+        df = backend.rows([x_axis, y_axis, color_col, size_col])
+    
     # Create different chart types based on selection
     if chart_type == 'scatter':
+        title = f'{y_axis} vs {x_axis}' + sample_note(len(df), total)
         if size_col and size_col != 'None':
             fig = px.scatter(df, x=x_axis, y=y_axis, color=color_col, size=size_col,
-                           title=f'{y_axis} vs {x_axis}')
+                           title=title, render_mode=render_mode(len(df)))
         else:
             fig = px.scatter(df, x=x_axis, y=y_axis, color=color_col,
-                           title=f'{y_axis} vs {x_axis}')
+                           title=title, render_mode=render_mode(len(df)))
+        # Keep the user's zoom while the sample for it is swapped in
+        fig.update_layout(uirevision=f'{x_axis}|{y_axis}')
     
     elif chart_type == 'line':
         # For line chart, we'll aggregate data by date
         if color_col and color_col != 'None':
-            agg_data = df.groupby([df['Date'].dt.date, color_col]).agg({x_axis: 'mean', y_axis: 'mean'}).reset_index()
+            agg_data = backend.mean_by_date([x_axis, y_axis], by=color_col)
             fig = px.line(agg_data, x=x_axis, y=y_axis, color=color_col,
-                         title=f'{y_axis} vs {x_axis} (Time Series)')
+                         title=f'{y_axis} vs {x_axis} (Time Series)',
+                         render_mode=render_mode(len(agg_data)))
         else:
-            agg_data = df.groupby(df['Date'].dt.date).agg({x_axis: 'mean', y_axis: 'mean'}).reset_index()
+            agg_data = backend.mean_by_date([x_axis, y_axis])
             fig = px.line(agg_data, x=x_axis, y=y_axis,
-                         title=f'{y_axis} vs {x_axis} (Time Series)')
+                         title=f'{y_axis} vs {x_axis} (Time Series)',
+                         render_mode=render_mode(len(agg_data)))
     
     elif chart_type == 'bar':
-        # For bar chart, we'll group by the x-axis variable if it's categorical or discretized
-        if color_col and color_col != 'None':
-            fig = px.bar(df, x=x_axis, y=y_axis, color=color_col,
-                        title=f'Average {y_axis} by {x_axis}')
-        else:
-            fig = px.bar(df, x=x_axis, y=y_axis,
-                        title=f'Average {y_axis} by {x_axis}')
+        # One bar per x bin (or x value) and colour group, averaged on the server;
+        # a numeric colour shades each bar by its mean instead of splitting it
+        by = color_col if color_col in categorical_columns else None
+        shade = color_col if color_col in numerical_columns else None
+        bars, width = backend.bars(x_axis, y_axis, by=by, shade=shade)
+        fig = bar_figure(bars, width, x_axis, y_axis, by, shade)
     
     elif chart_type == 'histogram':
-        fig = px.histogram(df, x=x_axis, color=color_col,
-                          title=f'Distribution of {x_axis}')
+        # Bin counts per colour group, counted on the server
+        by = color_col if color_col in categorical_columns else None
+        counts, width = backend.histogram(x_axis, by)
+        fig = histogram_figure(counts, width, x_axis, by)
     
     elif chart_type == 'box':
-        fig = px.box(df, x=x_axis, y=y_axis, color=color_col,
-                    title=f'Distribution of {y_axis} by {x_axis}')
+        # Quartiles, whiskers and a capped set of outliers per box, computed on the server
+        by = color_col if color_col in categorical_columns else None
+        stats, outliers = backend.box(x_axis, y_axis, by)
+        fig = box_figure(stats, outliers, x_axis, y_axis, by)
     
-    # Convert the plotly figure to JSON
-    graphJSON = json.dumps(fig, cls=plotly.utils.PlotlyJSONEncoder)
-    return graphJSON
+    # The cache converts the plotly figure to JSON
+    return fig
 
 @app.route('/get_summary', methods=['POST'])
 def get_summary():
@@ -101,11 +138,11 @@ def get_summary():
     y_axis = data.get('y_axis', 'Weekly_Sales')
     
     # Get basic statistics for both selected columns
-    x_stats = df[x_axis].describe()
-    y_stats = df[y_axis].describe()
+    x_stats = backend.describe(x_axis)
+    y_stats = backend.describe(y_axis)
     
     # Get correlation between the two variables
-    correlation = df[x_axis].corr(df[y_axis])
+    correlation = backend.correlation(x_axis, y_axis)
     
     # Format the summary as HTML
     summary_html = f"""
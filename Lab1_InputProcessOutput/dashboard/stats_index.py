@@ -0,0 +1,222 @@
+"""
+Precomputed summary statistics for the Walmart dashboards
+The summary panels show the count, mean, standard deviation, range and
+correlations of the numeric columns. Instead of scanning the full columns on
+every dropdown change, the index computes all of them in one vectorized pass
+when the data loads: per-column moments, min/max and missing counts, a
+quantile sketch, and the pairwise correlation matrix (over the rows where
+both columns are present, as pandas does). Lookups are then O(1).
+
+The moments are mergeable (Welford/Chan-style): a build computes them per
+partition in parallel and merges the results, and rows appended by an ingest
+are folded in at a cost proportional to the new rows only. The quantile
+sketches merge approximately, by mixing their distribution functions.
+
+Each build is stamped with the dataset version it was computed from, so a
+backend can tell when the index is behind an ingest or reload.
+"""
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import reduce
+
+import numpy as np
+import pandas as pd
+
+from aggregate_cube import MEASURES
+
+# Evenly spaced probabilities at which each column's quantiles are kept
+SKETCH_PROBS = np.linspace(0, 1, 257)
+
+# Rows per partition when a build computes moments in parallel
+PARTITION_ROWS = int(os.environ.get('WALMART_STATS_PARTITION_ROWS', 1_000_000))
+
+
+def partial_moments(values):
+    """Return the mergeable moments of a block of rows (NaN marks a missing value)
+
+    Entry [i, j] of the pair arrays is taken over the rows where columns i
+    and j are both present: their count, the mean and squared deviations of
+    column i, and the co-moment of i and j. Empty entries hold zeros.
+    """
+    present = ~np.isnan(values)
+    count = present.sum(axis=0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = np.nan_to_num(np.where(present, values, 0).sum(axis=0) / count)
+    # Deviations from each column's own mean keep the sums of squares well conditioned
+    deviations = np.where(present, values - mean, 0)
+    both = present.astype(float)
+    pair_count = both.T @ both
+    with np.errstate(invalid='ignore', divide='ignore'):
+        pair_shift = np.nan_to_num((deviations.T @ both) / pair_count)
+    return {'rows': len(values), 'pair_count': pair_count, 'pair_mean': mean[:, None] + pair_shift,
+            'pair_m2': (deviations ** 2).T @ both - pair_count * pair_shift ** 2,
+            'comoment': deviations.T @ deviations - pair_count * pair_shift * pair_shift.T,
+            'low': np.min(values, axis=0, initial=np.inf, where=present),
+            'high': np.max(values, axis=0, initial=-np.inf, where=present)}
+
+
+def merge_moments(first, second):
+    """Combine the moments of two disjoint blocks of rows (Chan et al.'s pairwise update)"""
+    count = first['pair_count'] + second['pair_count']
+    with np.errstate(invalid='ignore', divide='ignore'):
+        weight = np.where(count > 0, second['pair_count'] / count, 0)
+    delta = second['pair_mean'] - first['pair_mean']
+    scale = first['pair_count'] * weight
+    return {'rows': first['rows'] + second['rows'], 'pair_count': count,
+            'pair_mean': first['pair_mean'] + delta * weight,
+            'pair_m2': first['pair_m2'] + second['pair_m2'] + delta ** 2 * scale,
+            'comoment': first['comoment'] + second['comoment'] + delta * delta.T * scale,
+            'low': np.fmin(first['low'], second['low']),
+            'high': np.fmax(first['high'], second['high'])}
+
+
+def moments_corr(moments):
+    """Return the pairwise-complete Pearson correlation matrix of a set of moments"""
+    pair_m2 = moments['pair_m2']
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return moments['comoment'] / np.sqrt(pair_m2 * pair_m2.T)
+
+
+def correlation_matrix(df):
+    """Return the pairwise-complete correlation matrix of a frame's columns, like ``df.corr()``
+
+    The co-moments come from a few matrix products, so wide frames (such as
+    a pivot with one column per store) cost far less than pandas' per-pair loop.
+    """
+    corr = moments_corr(partial_moments(df.to_numpy(dtype=float)))
+    return pd.DataFrame(corr, index=df.columns, columns=df.columns)
+
+
+def top_pairs(corr, k=5):
+    """Return the ``k`` most strongly correlated column pairs of a correlation frame, strongest first
+
+    Pairs are read from the upper triangle as arrays and ranked with one
+    partial sort; pairs with an undefined correlation are left out.
+    """
+    matrix = corr.to_numpy(dtype=float)
+    rows, cols = np.triu_indices(len(matrix), k=1)
+    values = matrix[rows, cols]
+    strength = np.nan_to_num(np.abs(values), nan=-1.0)
+    keep = np.argpartition(-strength, k)[:k] if k < len(values) else np.arange(len(values))
+    keep = keep[np.argsort(-strength[keep], kind='stable')]
+    keep = keep[strength[keep] >= 0]
+    names = corr.columns.to_numpy()
+    return pd.DataFrame({'var1': names[rows[keep]], 'var2': names[cols[keep]], 'corr': values[keep]})
+
+
+def column_sketch(values, probs=SKETCH_PROBS):
+    """Return the quantiles of each column at ``probs`` (NaN for an empty column)"""
+    present = ~np.isnan(values)
+    sketch = np.full((len(probs), values.shape[1]), np.nan)
+    for i in np.flatnonzero(present.any(axis=0)):
+        sketch[:, i] = np.quantile(values[present[:, i], i], probs)
+    return sketch
+
+
+def merge_sketches(first, first_count, second, second_count, probs=SKETCH_PROBS):
+    """Merge two quantile sketches by mixing their interpolated distribution functions
+
+    The extremes stay exact; inner quantiles are within the sketches'
+    resolution of the true ones.
+    """
+    merged = np.where(first_count > 0, first, second)
+    for i in np.flatnonzero((first_count > 0) & (second_count > 0)):
+        grid = np.union1d(first[:, i], second[:, i])
+        cdf = (first_count[i] * np.interp(grid, first[:, i], probs)
+               + second_count[i] * np.interp(grid, second[:, i], probs)) / (first_count[i] + second_count[i])
+        merged[:, i] = np.interp(probs, cdf, grid)
+    return merged
+
+
+class StatsIndex:
+    """Moments, ranges, quantile sketches and pairwise correlations of numeric columns
+
+    ``build`` and ``update`` have the warmer and subscriber signatures of
+    data_loader.Dataset. ``version`` is called after each (re)build or merge
+    to stamp the index with the data version it describes.
+    """
+
+    def __init__(self, columns=MEASURES, version=lambda: 0, partition_rows=PARTITION_ROWS):
+        self.all_columns = columns
+        self.get_version = version
+        self.partition_rows = partition_rows
+        self.state = None
+
+    @property
+    def version(self):
+        """Data version of the published statistics, or None before the first build"""
+        state = self.state
+        return None if state is None else state['version']
+
+    def build(self, df):
+        """Compute every statistic over a whole frame, merging partitions computed in parallel"""
+        columns = [col for col in self.all_columns if col in df.columns]
+        values = df[columns].to_numpy(dtype=float)
+        blocks = [values[start:start + self.partition_rows]
+                  for start in range(0, len(values), self.partition_rows)] or [values]
+        if len(blocks) > 1:
+            with ThreadPoolExecutor(min(len(blocks), os.cpu_count() or 1)) as pool:
+                moments = reduce(merge_moments, pool.map(partial_moments, blocks))
+        else:
+            moments = partial_moments(blocks[0])
+        self.install(columns, moments, column_sketch(values))
+
+    def update(self, df, new_rows):
+        """Fold appended rows into the statistics; rebuild after a full reload
+
+        Moments merge exactly, at a cost proportional to the new rows only.
+        """
+        state = self.state
+        if new_rows is None or state is None or not all(col in new_rows.columns for col in state['columns']):
+            return self.build(df)
+        values = new_rows[state['columns']].to_numpy(dtype=float)
+        moments = partial_moments(values)
+        sketch = merge_sketches(state['sketch'], state['count'], column_sketch(values),
+                                moments['pair_count'].diagonal())
+        self.install(state['columns'], merge_moments(state['moments'], moments), sketch)
+
+    def install(self, columns, moments, sketch):
+        """Publish moments (as from partial_moments) and sketches, stamped with the current data version"""
+        count = moments['pair_count'].diagonal().astype(float)
+        # Readers take the whole state at once, so a rebuild never shows them a mix
+        self.state = {'columns': list(columns), 'positions': {col: i for i, col in enumerate(columns)},
+                      'rows': int(moments['rows']), 'count': count,
+                      'mean': np.where(count > 0, moments['pair_mean'].diagonal(), np.nan),
+                      'm2': moments['pair_m2'].diagonal().copy(),
+                      'low': np.asarray(moments['low'], dtype=float),
+                      'high': np.asarray(moments['high'], dtype=float),
+                      'moments': moments, 'corr': moments_corr(moments), 'sketch': sketch,
+                      'version': self.get_version()}
+
+    def covers(self, columns, version=None):
+        """Return True if the index holds these columns (and, if given, is at this version)"""
+        state = self.state
+        if state is None or (version is not None and state['version'] != version):
+            return False
+        return all(col in state['positions'] for col in columns)
+
+    def describe(self, column):
+        """Return count/mean/std/min/max/missing and the quartiles of one column"""
+        state = self.state
+        i = state['positions'][column]
+        count = state['count'][i]
+        std = np.sqrt(state['m2'][i] / (count - 1)) if count > 1 else np.nan
+        empty = count == 0
+        quartiles = np.interp([0.25, 0.5, 0.75], SKETCH_PROBS, state['sketch'][:, i])
+        return {'count': count, 'mean': state['mean'][i], 'std': std,
+                'min': np.nan if empty else state['low'][i],
+                'max': np.nan if empty else state['high'][i],
+                'missing': state['rows'] - int(count),
+                '25%': quartiles[0], '50%': quartiles[1], '75%': quartiles[2]}
+
+    def correlation(self, x, y):
+        """Return the Pearson correlation of two columns"""
+        state = self.state
+        return float(state['corr'][state['positions'][x], state['positions'][y]])
+
+    def corr(self, columns):
+        """Return the correlation matrix of the given columns as a frame"""
+        state = self.state
+        index = [state['positions'][col] for col in columns]
+        return pd.DataFrame(state['corr'][np.ix_(index, index)], index=columns, columns=columns)
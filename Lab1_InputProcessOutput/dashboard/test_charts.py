@@ -0,0 +1,104 @@
+"""
+Tests for the server-side chart summaries
+Checks the bar, histogram and box aggregates in chart_stats against the
+pandas and numpy computations they replace.
+
+Usage:
+    python -m pytest test_charts.py
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from chart_stats import (BAR_BINS, HIST_BINS, bar_aggregate, bar_figure, bar_value, box_kernel,
+                         histogram_table)
+
+
+def sales(rows, seed=0):
+    """Return a few Walmart-like columns, with some values missing"""
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        'CPI': rng.normal(170, 40, rows),
+        'Weekly_Sales': rng.lognormal(13.8, 0.4, rows),
+        'Holiday_Flag': rng.integers(0, 2, rows),
+        'District': pd.Categorical(rng.choice(list('ABC'), rows)),
+    })
+    df.loc[rng.random(rows) < 0.05, 'CPI'] = np.nan
+    return df
+
+
+def test_bar_aggregate_matches_groupby():
+    df = sales(3000)
+    bars, width = bar_aggregate(df, 'CPI', 'Weekly_Sales', by='District')
+    finite = df['CPI'].dropna()
+    assert width == pytest.approx((finite.max() - finite.min()) / BAR_BINS)
+    codes = np.minimum(np.floor((df['CPI'] - finite.min()) / width), BAR_BINS - 1)
+    expected = df.groupby([finite.min() + width * (codes + 0.5), 'District'], observed=True)['Weekly_Sales'].mean()
+    np.testing.assert_allclose(bars['Weekly_Sales'], expected.to_numpy())
+    np.testing.assert_allclose(bars['CPI'], expected.index.get_level_values(0))
+
+
+def test_bar_aggregate_keeps_few_distinct_values():
+    df = sales(500, seed=1)
+    bars, width = bar_aggregate(df, 'Holiday_Flag', 'Weekly_Sales', agg='sum')
+    assert width is None
+    expected = df.groupby('Holiday_Flag')['Weekly_Sales'].sum()
+    np.testing.assert_allclose(bars['Weekly_Sales'], expected.to_numpy())
+
+
+@pytest.mark.parametrize('agg', ['mean', 'count'])
+def test_bar_aggregate_with_y_equal_to_x(agg):
+    df = sales(2000, seed=2)
+    bars, width = bar_aggregate(df, 'CPI', 'CPI', agg=agg)
+    value = bar_value('CPI', 'CPI', agg)
+    assert list(bars.columns) == ['CPI', value]
+    # Each bar aggregates the raw x values of its bin, not the bin centres
+    low = df['CPI'].min()
+    codes = np.minimum(np.floor((df['CPI'] - low) / width), BAR_BINS - 1)
+    expected = df.groupby(low + width * (codes + 0.5))['CPI'].agg(agg)
+    np.testing.assert_allclose(bars[value], expected.to_numpy())
+    fig = bar_figure(bars, width, 'CPI', 'CPI', agg=agg)
+    assert fig.layout.yaxis.title.text == 'CPI'
+
+
+def test_histogram_table_matches_numpy():
+    df = sales(3000, seed=3)
+    counts, width = histogram_table(df, 'CPI', by='District')
+    finite = df['CPI'].dropna()
+    edges = np.linspace(finite.min(), finite.max(), HIST_BINS + 1)
+    assert width == pytest.approx(edges[1] - edges[0])
+    for district, group in counts.groupby('District', observed=True):
+        expected, _ = np.histogram(df.loc[df['District'] == district, 'CPI'].dropna(), edges)
+        np.testing.assert_allclose(group['CPI'], ((edges[:-1] + edges[1:]) / 2)[expected > 0])
+        assert group['count'].tolist() == expected[expected > 0].tolist()
+
+
+def test_box_kernel_matches_numpy():
+    rng = np.random.default_rng(10)
+    values = np.concatenate([rng.normal(0, 1, 3000), [25.0, -30.0, np.nan, np.inf]])
+    groups = rng.integers(-1, 5, len(values))
+    # Group 5 is empty; group 4 holds a single value
+    groups[groups == 4] = 0
+    groups[7] = 4
+    stats, (outlier_groups, outlier_values) = box_kernel(values, groups, 6, max_outliers=10 ** 6)
+    for group in range(6):
+        members = values[(groups == group) & np.isfinite(values)]
+        if not len(members):
+            assert stats['count'][group] == 0 and np.isnan(stats['median'][group])
+            continue
+        q1, median, q3 = np.quantile(members, [0.25, 0.5, 0.75])
+        assert stats['count'][group] == len(members)
+        assert (stats['q1'][group], stats['median'][group], stats['q3'][group]) == pytest.approx((q1, median, q3))
+        assert stats['mean'][group] == pytest.approx(members.mean())
+        inside = members[(members >= q1 - 1.5 * (q3 - q1)) & (members <= q3 + 1.5 * (q3 - q1))]
+        assert stats['lowerfence'][group] == inside.min() and stats['upperfence'][group] == inside.max()
+        outside = np.sort(np.setdiff1d(members, inside))
+        assert np.array_equal(np.sort(outlier_values[outlier_groups == group]), outside)
+
+
+def test_box_kernel_caps_outliers():
+    values = np.concatenate([np.zeros(100), np.arange(1, 21) * 100.0, -np.arange(1, 21) * 100.0])
+    _, (_, kept) = box_kernel(values, np.zeros(len(values), dtype=np.int64), 1, max_outliers=6)
+    # The most extreme outliers on each side are the ones kept
+    assert sorted(kept) == [-2000.0, -1900.0, -1800.0, 1800.0, 1900.0, 2000.0]
@@ -0,0 +1,124 @@
+"""
+Tests for the pre-aggregated sales cube
+Checks the cube's per-date statistics, at every roll-up and after appended
+rows are merged in, and the bincount fallback date_aggregate, against the
+pandas group-by they replace.
+
+Usage:
+    python -m pytest test_cube.py
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from aggregate_cube import Cube, date_aggregate
+from data_loader import week_index
+
+MEASURES = ['Weekly_Sales', 'Temperature', 'CPI']
+
+
+def sales(stores, weeks, seed=0, first_week=0, missing=0.1):
+    """Return Walmart-like rows, one per store and week, with a share of each measure missing"""
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range('2010-02-05', periods=first_week + weeks, freq='7D')[first_week:]
+    df = pd.DataFrame({
+        'Store': np.tile(np.arange(1, stores + 1, dtype='int16'), weeks),
+        'Date': np.repeat(dates, stores),
+    })
+    rows = len(df)
+    df['Week'] = week_index(df['Date'])
+    df['Weekly_Sales'] = rng.lognormal(13.8, 0.4, rows)
+    df['Holiday_Flag'] = rng.random(rows) < 0.1
+    df['Temperature'] = rng.normal(60, 18, rows)
+    df['CPI'] = rng.normal(170, 40, rows)
+    df['District'] = pd.Categorical(np.array(list('ABCD'))[df['Store'] % 4])
+    df[MEASURES] = df[MEASURES].mask(rng.random((rows, len(MEASURES))) < missing)
+    return df
+
+
+def expected(df, stat, by):
+    """Return the per-date statistic of each measure, as pandas groups it"""
+    return (df.groupby(['Date'] + list(by), observed=True)[MEASURES].agg(stat)
+            .sort_index().reset_index())
+
+
+def assert_frames_close(got, want):
+    """Compare two result frames column by column, treating missing values as equal"""
+    assert list(got.columns) == list(want.columns)
+    assert len(got) == len(want)
+    for col in got.columns:
+        if col in MEASURES:
+            np.testing.assert_allclose(got[col].to_numpy(float), want[col].to_numpy(float), rtol=1e-9)
+        else:
+            assert got[col].tolist() == want[col].tolist(), col
+
+
+@pytest.mark.parametrize('stat', ['mean', 'sum', 'count', 'min', 'max'])
+@pytest.mark.parametrize('by', [(), ('Store',), ('District',), ('District', 'Holiday_Flag')])
+def test_cube_matches_groupby(stat, by):
+    df = sales(20, 30)
+    cube = Cube()
+    cube.build(df)
+    assert cube.covers(MEASURES, by)
+    assert_frames_close(cube.query(MEASURES, stat, by), expected(df, stat, by))
+
+
+def test_cube_update_matches_rebuild():
+    old = sales(20, 30, seed=1)
+    # The appended rows repeat the last five weeks and add ten new ones and a new district
+    new = pd.concat([sales(20, 5, seed=2, first_week=25), sales(20, 10, seed=3, first_week=30)],
+                    ignore_index=True)
+    new['District'] = new['District'].cat.add_categories('E')
+    new.loc[new['Store'] == 1, 'District'] = 'E'
+    df = pd.concat([old.astype({'District': object}), new.astype({'District': object})],
+                   ignore_index=True).astype({'District': 'category'})
+    versions = iter([1, 2])
+    cube = Cube(version=lambda: next(versions))
+    cube.build(old)
+    # A view cached before the update must not be served after it
+    cube.query(MEASURES, 'mean', ('District',))
+    cube.update(df, new)
+    assert cube.version == 2 and not cube.covers(MEASURES, version=1)
+    for by in [(), ('Store',), ('District',), ('Holiday_Flag', 'Store')]:
+        for stat in ['mean', 'min', 'max']:
+            assert_frames_close(cube.query(MEASURES, stat, by), expected(df, stat, by))
+
+
+def test_cube_does_not_cover_unknown_columns():
+    cube = Cube()
+    assert not cube.covers(MEASURES)
+    cube.build(sales(4, 3))
+    assert not cube.covers(['Fuel_Price'])
+    assert not cube.covers(MEASURES, ('Week',))
+
+
+@pytest.mark.parametrize('stat', ['mean', 'sum'])
+@pytest.mark.parametrize('by', [None, 'Store', 'District', 'Holiday_Flag'])
+def test_date_aggregate_matches_groupby(stat, by):
+    df = sales(20, 30, seed=4)
+    keys = ['Date'] + ([by] if by else [])
+    want = df.groupby(keys, observed=True)[MEASURES].agg(stat).reset_index()
+    assert_frames_close(date_aggregate(df, MEASURES, by, stat), want)
+    # Without a Week column the codes come from the dates
+    assert_frames_close(date_aggregate(df.drop(columns='Week'), MEASURES, by, stat), want)
+
+
+@pytest.mark.parametrize('by', ['Store', 'Label'])
+def test_date_aggregate_with_sparse_groups(by):
+    # A tenth of the store weeks: most week x group cells are empty and get renumbered
+    df = sales(20, 400, seed=5).sample(frac=0.1, random_state=5).sort_index()
+    # Store numbers far apart and float labels with gaps are factorized rather than spanned
+    df['Store'] = (df['Store'].astype(np.int64) - 10) * 100_000
+    df['Label'] = df['Store'].where(df['Store'] % 3 != 0) / 7
+    df.loc[df.index[::97], 'Date'] = pd.NaT
+    df['Week'] = week_index(df['Date'])
+    want = df.groupby(['Date', by], observed=True)[MEASURES].mean().reset_index()
+    assert_frames_close(date_aggregate(df, MEASURES, by), want)
+
+
+def test_date_aggregate_with_nothing_to_group():
+    df = sales(4, 3)
+    df['District'] = pd.Categorical([None] * len(df), categories=['A'])
+    got = date_aggregate(df, MEASURES, 'District')
+    assert got.empty and list(got.columns) == ['Date', 'District'] + MEASURES
@@ -0,0 +1,126 @@
+"""
+Tests for the data loader
+Checks the Arrow cache files it writes next to the CSV, and that frames grown
+by appends (FrameBuffer, Dataset.ingest) equal a fresh parse of the whole CSV.
+
+Usage:
+    python -m pytest test_data_loader.py
+"""
+
+import os
+import stat
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import data_loader
+from data_loader import (Dataset, FrameBuffer, append_rows, apply_schema, cache_paths, parse_bytes,
+                         parse_csv, write_atomic, write_feather)
+
+DISTRICTS = ['North', 'South', 'East', 'West']
+
+
+@pytest.fixture
+def cache_dir(tmp_path, monkeypatch):
+    """Point the loader's cache at a temporary directory"""
+    monkeypatch.setattr(data_loader, 'CACHE_DIR', tmp_path / '.cache')
+    data_loader.CACHE_DIR.mkdir()
+    return data_loader.CACHE_DIR
+
+
+def sales(rows, seed=0, first_store=1, districts=DISTRICTS[:3]):
+    """Return rows in the Walmart2.csv layout, one store per 20 rows, with some values missing"""
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range('2010-02-05', periods=20, freq='7D')
+    df = pd.DataFrame({
+        'Store': first_store + np.arange(rows) // 20,
+        'Date': dates[np.arange(rows) % 20].strftime('%d/%m/%Y'),
+        'Weekly_Sales': rng.lognormal(13.8, 0.4, rows).round(2),
+        'Holiday_Flag': rng.integers(0, 2, rows),
+        'Temperature': rng.normal(60, 18, rows).round(2),
+        'Fuel_Price': rng.normal(3.35, 0.4, rows).round(3),
+        'CPI': rng.normal(170, 40, rows).round(4),
+        'Unemployment': rng.normal(8, 1.8, rows).round(3),
+        'District': rng.choice(districts, rows),
+    })
+    df.loc[rng.random(rows) < 0.05, 'CPI'] = np.nan
+    df.loc[rng.random(rows) < 0.05, 'District'] = None
+    return df
+
+
+def write_csv(path, df):
+    """Write or append rows to a CSV source"""
+    df.to_csv(path, mode='a' if path.exists() else 'w', header=not path.exists(), index=False)
+
+
+def assert_same_frame(got, expected):
+    """Compare frames by value, with categoricals compared by their labels"""
+    assert list(got.columns) == list(expected.columns)
+    for col in got.columns:
+        assert got[col].dtype == expected[col].dtype, col
+        if isinstance(got[col].dtype, pd.CategoricalDtype):
+            assert list(got[col].cat.categories) == list(expected[col].cat.categories), col
+    pd.testing.assert_frame_equal(got.reset_index(drop=True), expected.reset_index(drop=True))
+
+
+def test_cache_paths_separate_same_named_sources(tmp_path, cache_dir):
+    first, second = tmp_path / 'a' / 'sales.csv', tmp_path / 'b' / 'sales.csv'
+    assert cache_paths(first) != cache_paths(second)
+    assert cache_paths(first) == cache_paths(tmp_path / 'b' / '..' / 'a' / 'sales.csv')
+    assert cache_paths(first) != cache_paths(first, float32=True)
+    for cache_file, meta_file in [cache_paths(first), cache_paths(first, float32=True)]:
+        assert cache_file.parent == cache_dir and cache_file.name.startswith('sales-')
+        assert cache_file.suffix == '.arrow' and meta_file.name.endswith('.meta.json')
+
+
+def test_cache_files_get_default_permissions(cache_dir):
+    pytest.importorskip('pyarrow')
+    meta_file, cache_file = cache_dir / 'sales.meta.json', cache_dir / 'sales.arrow'
+    write_atomic(meta_file, b'{}')
+    write_feather(cache_file, pd.DataFrame({'x': [1.0, 2.0]}))
+    for target in [meta_file, cache_file]:
+        assert stat.S_IMODE(os.stat(target).st_mode) == 0o666 & ~data_loader.UMASK
+    # No temporary files are left behind
+    assert sorted(os.listdir(cache_dir)) == ['sales.arrow', 'sales.meta.json']
+
+
+def typed(rows):
+    """Parse rows through a CSV and cast them to the dashboard schema, as a load does"""
+    return apply_schema(parse_bytes(rows.to_csv(index=False).encode()))
+
+
+def test_frame_buffer_matches_concat():
+    first = typed(sales(200))
+    buffer = FrameBuffer(first)
+    frames, expected = [buffer.frame()], first
+    # A new district sorts between the existing ones; store numbers past int16 widen the column
+    chunks = [sales(100, seed=1), sales(60, seed=2, districts=['Central', 'North']),
+              sales(2000, seed=3, first_store=40000, districts=DISTRICTS)]
+    for chunk in map(typed, chunks):
+        frames.append(buffer.append(chunk))
+        expected = append_rows(expected, chunk)
+        assert_same_frame(frames[-1], expected)
+    assert frames[-1]['Store'].dtype == 'int32'
+    assert list(frames[-1]['District'].cat.categories) == ['Central', 'East', 'North', 'South', 'West']
+    # Frames handed out earlier keep their rows, categories and dtypes
+    assert_same_frame(frames[0], first)
+    assert frames[1]['Store'].dtype == 'int16' and 'Central' not in frames[1]['District'].cat.categories
+
+
+def test_ingest_matches_full_parse(tmp_path, cache_dir):
+    path = tmp_path / 'sales.csv'
+    write_csv(path, sales(400))
+    dataset = Dataset(path, watch=None, float32=False)
+    received = []
+    dataset.subscribe(lambda df, new_rows: received.append((len(df), len(new_rows))))
+    dataset.frame()
+    for chunk in [sales(100, seed=4, first_store=30, districts=['West']),
+                  sales(100, seed=5, first_store=50000, districts=['Central', 'North'])]:
+        write_csv(path, chunk)
+        dataset.ingest()
+    assert received == [(500, 100), (600, 100)] and dataset.version == 2
+    raw, _ = parse_csv(path)
+    assert_same_frame(dataset.frame(), apply_schema(raw))
+    # A restart reads the cache written by the first load, plus the bytes appended since
+    assert_same_frame(Dataset(path, watch=None, float32=False).frame(), apply_schema(raw))
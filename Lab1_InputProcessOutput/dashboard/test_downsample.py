@@ -0,0 +1,87 @@
+"""
+Tests for the zoom-aware scatter downsampling
+Checks the per-cell quota and the stratified sample against brute-force
+counts, the SQL cell codes against grid_cells, and the zoom bookkeeping.
+
+Usage:
+    python -m pytest test_downsample.py
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from downsample import cell_quota, grid_cells, stratified_sample, zoom_state, zoom_window
+
+
+def points(rows, seed=0):
+    """Return a dense cloud with a sparse tail and a few missing values"""
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        'CPI': np.concatenate([rng.normal(170, 5, rows - 50), rng.uniform(100, 300, 50)]),
+        'Weekly_Sales': np.concatenate([rng.lognormal(13.8, 0.1, rows - 50), rng.uniform(1e5, 4e6, 50)]),
+        'District': pd.Categorical(rng.choice(list('ABCD'), rows, p=[0.85, 0.1, 0.04, 0.01])),
+    })
+    df.loc[rng.random(rows) < 0.01, 'CPI'] = np.nan
+    return df
+
+
+def test_cell_quota_matches_brute_force():
+    rng = np.random.default_rng(1)
+    for _ in range(200):
+        counts = rng.integers(1, 50, rng.integers(1, 30))
+        budget = int(rng.integers(0, counts.sum() + 10))
+        quota = cell_quota(counts, budget)
+        assert np.minimum(counts, quota).sum() <= budget
+        if quota < counts.max():
+            assert np.minimum(counts, quota + 1).sum() > budget
+
+
+@pytest.mark.parametrize('strata', [None, 'District'])
+def test_stratified_sample_fills_cells_evenly(strata):
+    df = points(20000)
+    sample = stratified_sample(df, 'CPI', 'Weekly_Sales', 2000, strata, grid=16)
+    assert len(sample) == 2000
+    assert sample.index.is_unique and sample.index.isin(df.index).all()
+    keys = [grid_cells(df['CPI'].to_numpy(), 16), grid_cells(df['Weekly_Sales'].to_numpy(), 16)]
+    if strata:
+        keys.append(df[strata].cat.codes.to_numpy())
+    cells = pd.Series(list(zip(*keys)), index=df.index)
+    counts = cells.value_counts()
+    kept = cells[sample.index].value_counts().reindex(counts.index, fill_value=0)
+    quota = cell_quota(counts.to_numpy(), 2000)
+    # Every cell keeps its even quota (or all its rows), and at most one row more
+    assert (kept >= np.minimum(counts, quota)).all() and (kept <= np.minimum(counts, quota + 1)).all()
+    assert set(sample['District']) == set(df['District'])
+    # The same view always shows the same sample
+    assert sample.index.equals(stratified_sample(df, 'CPI', 'Weekly_Sales', 2000, strata, grid=16).index)
+
+
+def test_stratified_sample_keeps_small_frames_whole():
+    df = points(500, seed=2)
+    assert stratified_sample(df, 'CPI', 'Weekly_Sales', 500) is df
+
+
+def test_cell_code_matches_grid_cells():
+    duckdb = pytest.importorskip('duckdb')
+    from query_backend import cell_code
+
+    df = points(5000, seed=3)
+    values = df['CPI'].to_numpy()
+    low, high = np.nanmin(values), np.nanmax(values)
+    got = duckdb.connect().execute(f"SELECT {cell_code('CPI', low, high, 64)} AS cell FROM df").df()['cell']
+    assert np.array_equal(got.to_numpy(), grid_cells(values, 64))
+    constant = duckdb.connect().execute(f"SELECT {cell_code('CPI', 1.0, 1.0, 64)} AS cell FROM df").df()['cell']
+    assert np.array_equal(constant.to_numpy(), grid_cells(np.where(np.isnan(values), np.nan, 1.0), 64))
+
+
+def test_zoom_state_follows_relayout_events():
+    zoom = zoom_state({'xaxis.range[0]': 5, 'xaxis.range[1]': 1}, 'CPI', 'Weekly_Sales')
+    assert zoom_window(zoom, 'CPI', 'Weekly_Sales') == {'CPI': (1.0, 5.0)}
+    zoom = zoom_state({'yaxis.range': [2, 3]}, 'CPI', 'Weekly_Sales', zoom)
+    assert zoom_window(zoom, 'CPI', 'Weekly_Sales') == {'CPI': (1.0, 5.0), 'Weekly_Sales': (2.0, 3.0)}
+    # A zoom belongs to its pair of columns
+    assert zoom_window(zoom, 'CPI', 'Temperature') == {}
+    zoom = zoom_state({'xaxis.autorange': True}, 'CPI', 'Weekly_Sales', zoom)
+    assert zoom_window(zoom, 'CPI', 'Weekly_Sales') == {'Weekly_Sales': (2.0, 3.0)}
+    assert zoom_state({'autosize': True}, 'CPI', 'Weekly_Sales', zoom) is None
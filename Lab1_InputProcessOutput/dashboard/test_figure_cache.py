@@ -0,0 +1,150 @@
+"""
+Tests for the shared figure cache
+Checks the LRU's eviction order, byte budget and counters, the keys the
+caching decorator builds, that the base64 typed arrays decode back to the
+values they encode, and that serialized figures match plotly's own JSON.
+
+Usage:
+    python -m pytest test_figure_cache.py
+"""
+
+import base64
+
+import numpy as np
+import pandas as pd
+import json
+
+import plotly.express as px
+import plotly.graph_objects as go
+import pytest
+
+import figure_cache
+from figure_cache import FigureCache, cache_key, encode_arrays, loads, serialize
+
+
+def decode_arrays(value):
+    """Turn typed-array specs back into arrays, as plotly.js reads them"""
+    if isinstance(value, dict) and set(value) >= {'dtype', 'bdata'}:
+        values = np.frombuffer(base64.b64decode(value['bdata']), dtype='<' + value['dtype'])
+        if 'shape' in value:
+            values = values.reshape([int(n) for n in value['shape'].split(',')])
+        return values
+    if isinstance(value, dict):
+        return {key: decode_arrays(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [decode_arrays(item) for item in value]
+    return value
+
+
+def plain(value):
+    """Return a decoded figure dict with arrays as lists, for comparison"""
+    value = decode_arrays(value)
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, dict):
+        return {key: plain(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [plain(item) for item in value]
+    return value
+
+
+def test_cache_evicts_least_recently_used():
+    cache = FigureCache(max_bytes=10)
+    cache.put('a', 'aaaa')
+    cache.put('b', 'bbbb')
+    assert cache.get('a') == 'aaaa'
+    # 'b' is now the least recently used, so it makes room for 'c'
+    cache.put('c', 'cccc')
+    assert cache.get('b') is None
+    assert list(cache.entries) == ['a', 'c'] and cache.size == 8
+    # Replacing an entry frees its old size first
+    cache.put('a', 'aa')
+    assert cache.size == 6
+    # An entry larger than the whole budget is not stored
+    cache.put('d', 'd' * 11)
+    assert cache.get('d') is None and cache.size == 6
+    assert cache.stats() == {'entries': 2, 'bytes': 6, 'max_bytes': 10, 'hits': 1, 'misses': 2,
+                             'evictions': 1, 'hit_rate': 0.333}
+    cache.clear()
+    assert cache.stats()['entries'] == 0 and cache.size == 0
+
+
+def test_cached_builds_once_per_version_and_arguments():
+    cache = FigureCache()
+    version = [1]
+    calls = []
+
+    @cache.cached(lambda: version[0], decode=True)
+    def chart(x, zoom=None):
+        calls.append((x, zoom))
+        return go.Figure(go.Scatter(x=[1, 2], y=[3, 4], name=x))
+
+    first = chart('CPI', zoom={'x_range': [1, 2], 'x': 'CPI'})
+    assert first['data'][0]['name'] == 'CPI'
+    # Dict arguments are keyed by value, whatever their key order
+    assert chart('CPI', zoom={'x': 'CPI', 'x_range': [1, 2]}) == first
+    chart('Temperature')
+    version[0] = 2
+    chart('CPI', zoom={'x_range': [1, 2], 'x': 'CPI'})
+    assert len(calls) == 3 and cache.hits == 1
+    assert cache_key('chart', 2, ('CPI',), {}) != cache_key('chart', 1, ('CPI',), {})
+
+
+def test_encode_arrays_round_trips_numbers():
+    rng = np.random.default_rng(0)
+    arrays = {
+        'float64': rng.normal(size=100),
+        'float32': rng.normal(size=100).astype(np.float32),
+        'int16': rng.integers(-500, 500, 100).astype(np.int16),
+        'uint8': rng.integers(0, 255, 100).astype(np.uint8),
+        'matrix': rng.normal(size=(7, 3)),
+        'missing': np.array([1.0, np.nan, np.inf]),
+    }
+    encoded = encode_arrays({'data': [{'x': value} for value in arrays.values()]})
+    for (name, value), trace in zip(arrays.items(), encoded['data']):
+        assert set(trace['x']) >= {'dtype', 'bdata'}, name
+        decoded = decode_arrays(trace['x'])
+        assert decoded.dtype == value.dtype and decoded.shape == value.shape, name
+        np.testing.assert_array_equal(decoded, value)
+
+
+def test_encode_arrays_narrows_types_plotly_js_lacks():
+    small = np.arange(-5, 5, dtype=np.int64)
+    large = np.array([0, 2 ** 40], dtype=np.int64)
+    flags = np.array([True, False, True])
+    got = decode_arrays(encode_arrays({'small': small, 'large': large, 'flags': flags, 'empty': small[:0]}))
+    assert got['small'].dtype == np.int32 and (got['small'] == small).all()
+    assert got['large'].dtype == np.float64 and (got['large'] == large).all()
+    assert got['flags'].dtype == np.uint8 and (got['flags'] == flags).all()
+    assert len(got['empty']) == 0
+
+
+def test_encode_arrays_writes_dates_and_text_as_lists():
+    # Hover data such as Date reaches the encoder as Timestamps in object arrays
+    dates = np.array([pd.Timestamp('2010-02-05'), None, pd.Timestamp('2012-10-26 12:30')], dtype=object)
+    hover = np.column_stack([dates, np.array(['A', 'B', 'C'], dtype=object)])
+    got = encode_arrays({'x': dates, 'customdata': hover, 'text': np.array(['a', 'b'], dtype=object),
+                         'labels': ('CPI', 'Weekly_Sales')})
+    assert got['x'] == ['2010-02-05T00:00:00', None, '2012-10-26T12:30:00']
+    assert got['customdata'] == [[date, district] for date, district in zip(got['x'], 'ABC')]
+    assert got['text'] == ['a', 'b'] and got['labels'] == ['CPI', 'Weekly_Sales']
+
+
+@pytest.mark.parametrize('encoder', ['orjson', 'json'])
+def test_serialize_matches_plotly_json(encoder, monkeypatch):
+    if encoder == 'json':
+        monkeypatch.setattr(figure_cache, 'orjson', None)
+    elif figure_cache.orjson is None:
+        pytest.skip('orjson is not installed')
+    rng = np.random.default_rng(1)
+    df = pd.DataFrame({
+        'CPI': rng.normal(170, 40, 200),
+        'Weekly_Sales': rng.lognormal(13.8, 0.4, 200),
+        'Store': rng.integers(1, 46, 200),
+        'Date': pd.date_range('2010-02-05', periods=200, freq='7D'),
+        'District': rng.choice(list('ABC'), 200),
+    })
+    scatter = px.scatter(df, x='CPI', y='Weekly_Sales', color='District', hover_data=['Date', 'Store'])
+    heatmap = go.Figure(go.Heatmap(z=rng.normal(size=(12, 8)), x=list('abcdefgh')))
+    for fig in [scatter, heatmap]:
+        assert plain(loads(serialize(fig))) == plain(json.loads(fig.to_json()))
@@ -0,0 +1,112 @@
+"""
+Tests for the incremental figure updates
+Applies the patches update_figure sends to the figure on screen, as the
+browser does, and checks the result against a rebuild of the new figure.
+
+Usage:
+    python -m pytest test_figure_patch.py
+"""
+
+import base64
+import copy
+
+import numpy as np
+import pandas as pd
+import plotly.express as px
+from dash import Patch
+
+from figure_cache import encode_arrays, loads, serialize
+from figure_patch import STYLE_ARGS, hover_template, marker_patch, numeric_restyle, update_figure
+
+NUMERIC = ['CPI', 'Temperature', 'Fuel_Price', 'Unemployment']
+
+
+def sales(rows=300, seed=0):
+    """Return a few Walmart-like columns for the scatter"""
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'Weekly_Sales': rng.lognormal(13.8, 0.4, rows),
+        'Temperature': rng.normal(60, 18, rows),
+        'Fuel_Price': rng.normal(3.35, 0.4, rows),
+        'CPI': rng.normal(170, 40, rows),
+        'Unemployment': rng.normal(8, 1.8, rows),
+        'District': rng.choice(list('ABC'), rows),
+    })
+
+
+DATA = sales()
+
+
+def build(x_axis, y_axis, color_by, size_by):
+    """Build a scatter as the chart callbacks do, as a serialized figure dict"""
+    color_col = None if color_by == 'None' else color_by
+    size_col = None if size_by == 'None' else size_by
+    fig = px.scatter(DATA, x=x_axis, y=y_axis, color=color_col, size=size_col)
+    return loads(serialize(fig))
+
+
+def restyle(args, shown):
+    """Patch a numeric colour or size change from the new column alone, as the apps do"""
+    changed = numeric_restyle(args, shown, NUMERIC)
+    if changed is None:
+        return None
+    color_col, size_col = (None if args[key] == 'None' else args[key] for key in STYLE_ARGS)
+    values = {key: column and (column, DATA[column].to_numpy()) for key, column in changed.items()}
+    return marker_patch(values, hover_template(args['x_axis'], args['y_axis'], size_col, (), color_col))
+
+
+def apply_patch(fig, patch):
+    """Apply a Dash Patch's operations to a figure dict, as dash-renderer does"""
+    fig = copy.deepcopy(fig)
+    for operation in patch.to_plotly_json()['operations']:
+        *path, last = operation['location']
+        target = fig
+        for key in path:
+            target = target.setdefault(key, {}) if isinstance(target, dict) else target[key]
+        if operation['operation'] == 'Delete':
+            del target[last]
+        else:
+            assert operation['operation'] == 'Assign', operation
+            target[last] = encode_arrays(operation['params']['value'])
+    return fig
+
+
+def plain(value):
+    """Return a figure dict with typed arrays decoded and floats rounded, for comparison"""
+    if isinstance(value, dict) and set(value) >= {'dtype', 'bdata'}:
+        value = np.frombuffer(base64.b64decode(value['bdata']), dtype='<' + value['dtype'])
+    if isinstance(value, np.ndarray):
+        return np.round(value.astype(float), 6).tolist()
+    if isinstance(value, dict):
+        return {key: plain(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [plain(item) for item in value]
+    return round(value, 9) if isinstance(value, float) else value
+
+
+def test_patches_match_rebuilt_figures():
+    steps = [('CPI', 'None'), ('Fuel_Price', 'None'), ('Fuel_Price', 'CPI'), ('Fuel_Price', 'Unemployment'),
+             ('None', 'Unemployment'), ('CPI', 'None'), ('None', 'None'), ('District', 'CPI'),
+             ('District', 'Fuel_Price'), ('Temperature', 'Fuel_Price')]
+    shown = {'x_axis': 'Temperature', 'y_axis': 'Weekly_Sales', 'color_by': 'None', 'size_by': 'None'}
+    screen = build(**shown)
+    kinds = []
+    for color_by, size_by in steps:
+        args = dict(shown, color_by=color_by, size_by=size_by)
+        out = update_figure(build, args, dict(shown, version=1), version=1, restyle=restyle)
+        kinds.append('marker' if restyle(args, shown) is not None else 'diff')
+        assert isinstance(out, Patch)
+        screen = apply_patch(screen, out)
+        assert plain(screen) == plain(build(**args)), (color_by, size_by)
+        shown = args
+    # Both kinds of patch were exercised
+    assert set(kinds) == {'marker', 'diff'}
+
+
+def test_view_changes_and_stale_versions_rebuild():
+    shown = {'x_axis': 'Temperature', 'y_axis': 'Weekly_Sales', 'color_by': 'None', 'size_by': 'None'}
+    args = dict(shown, color_by='CPI')
+    assert isinstance(update_figure(build, args, None, version=1, restyle=restyle), dict)
+    assert isinstance(update_figure(build, args, dict(shown, version=0), version=1, restyle=restyle), dict)
+    moved = dict(args, x_axis='Fuel_Price')
+    assert isinstance(update_figure(build, moved, dict(shown, version=1), version=1, restyle=restyle), dict)
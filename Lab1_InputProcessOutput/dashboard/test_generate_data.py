@@ -0,0 +1,62 @@
+"""
+Tests for the synthetic data generator
+Checks the store chunking, the holiday calendar against the real dataset,
+and that the CSV and Parquet outputs hold the same rows as the loader reads
+them.
+
+Usage:
+    python -m pytest test_generate_data.py
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import generate_data
+from data_loader import DATA_PATH, apply_schema, parse_csv
+from generate_data import Generator, generate, holiday_weeks, store_chunks
+
+
+def test_store_chunks_stay_within_districts():
+    store_district = np.sort(np.random.default_rng(0).integers(0, 7, 300))
+    chunks = list(store_chunks(store_district, 16))
+    # Every store once, in order, in chunks of at most 16 stores of one district
+    assert np.array_equal(np.concatenate([np.arange(first, last) for first, last in chunks]), np.arange(300))
+    for first, last in chunks:
+        assert 0 < last - first <= 16 and len(set(store_district[first:last])) == 1
+    assert len(chunks) == sum(-(-count // 16) for count in np.bincount(store_district) if count)
+
+
+def test_holiday_weeks_match_the_walmart_data():
+    if not DATA_PATH.exists():
+        pytest.skip(f"{DATA_PATH} is not available")
+    raw = pd.read_csv(DATA_PATH, usecols=['Date', 'Holiday_Flag']).drop_duplicates('Date')
+    dates = pd.DatetimeIndex(pd.to_datetime(raw['Date'], format='%d/%m/%Y'))
+    assert np.array_equal(holiday_weeks(dates), raw['Holiday_Flag'].to_numpy(dtype=bool))
+
+
+def test_outputs_hold_the_same_rows(tmp_path, monkeypatch):
+    pytest.importorskip('pyarrow')
+    from partitioned_store import read_partitioned
+
+    # Small chunks, so the outputs are written in several appends
+    monkeypatch.setattr(generate_data, 'CHUNK_ROWS', 500)
+    csv_path, store_dir = generate(5000, weeks=60, out_dir=tmp_path, seed=3)
+    # 5000 rows round up to 84 whole stores of 60 weeks
+    raw, _ = parse_csv(csv_path)
+    from_csv = apply_schema(raw)
+    assert len(from_csv) == 84 * 60
+    assert from_csv['Store'].tolist() == list(np.repeat(np.arange(1, 85), 60))
+    assert from_csv.groupby('Store')['Week'].apply(lambda weeks: weeks.is_monotonic_increasing).all()
+    # Each district owns one contiguous range of store numbers
+    districts = from_csv.drop_duplicates('Store')['District'].astype(str)
+    assert (districts != districts.shift()).sum() == districts.nunique()
+
+    from_parquet = read_partitioned(store_dir).sort_values(['Store', 'Date'], ignore_index=True)
+    from_parquet['District'] = from_parquet['District'].cat.set_categories(from_csv['District'].cat.categories)
+    pd.testing.assert_frame_equal(from_parquet, from_csv, check_exact=False, rtol=1e-9)
+    # The typed chunks the Parquet writer receives are what the loader makes of the CSV
+    generator = Generator(84, 60, seed=3)
+    typed = generator.typed(generator.chunk(0, 84))
+    assert list(typed.columns) == list(from_csv.columns)
+    assert (typed.dtypes.astype(str) == from_csv.dtypes.astype(str)).all()
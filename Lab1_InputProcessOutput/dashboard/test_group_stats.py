@@ -0,0 +1,73 @@
+"""
+Tests for the per-group correlations and regressions
+Checks group_regressions against a pandas corr() and np.polyfit per group
+and pair, with missing values, tiny groups and constant columns.
+
+Usage:
+    python -m pytest test_group_stats.py
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from group_stats import REGRESSION_COLUMNS, group_regressions, regression_pairs
+
+
+def sales(rows, seed=0):
+    """Return Walmart-like columns for 40 stores, with some values and store numbers missing"""
+    rng = np.random.default_rng(seed)
+    fuel = rng.normal(3.35, 0.4, rows)
+    df = pd.DataFrame({
+        'Store': rng.integers(1, 41, rows).astype(float),
+        'Weekly_Sales': rng.lognormal(13.8, 0.4, rows) - 2e5 * fuel,
+        'Fuel_Price': fuel,
+        'CPI': rng.normal(170, 40, rows),
+    })
+    df = df.mask(rng.random(df.shape) < 0.05)
+    # Store 41 has a single row, store 42 a constant Fuel_Price
+    extra = pd.DataFrame({'Store': [41.0, 42, 42, 42], 'Weekly_Sales': [1.5e6, 1e6, 1.2e6, 1.1e6],
+                          'Fuel_Price': [3.0, 3.1, 3.1, 3.1], 'CPI': [200.0, 201, 202, 203]})
+    return pd.concat([df, extra], ignore_index=True)
+
+
+def expected_regressions(df, by, pairs):
+    """Return the per-group statistics the slow way, one group and pair at a time"""
+    rows = []
+    for x, y in pairs:
+        for group, members in df.groupby(by, sort=True):
+            both = members[[x, y]].dropna()
+            corr = slope = intercept = np.nan
+            if len(both) > 1 and both[x].nunique() > 1:
+                slope, intercept = np.polyfit(both[x], both[y], 1)
+                corr = both[x].corr(both[y])
+            rows.append([group, x, y, len(both), corr, slope, intercept])
+    return pd.DataFrame(rows, columns=[by] + REGRESSION_COLUMNS)
+
+
+@pytest.mark.parametrize('by', ['Store', 'District'])
+def test_group_regressions_match_pandas(by):
+    df = sales(4000)
+    df['District'] = pd.Categorical(np.array(list('ABCD'))[df['Store'].fillna(0).astype(int) % 4],
+                                    categories=list('ABCDE'))
+    pairs = regression_pairs(['Fuel_Price', 'CPI'], ['Weekly_Sales', 'CPI'])
+    got = group_regressions(df, by, pairs)
+    expected = expected_regressions(df, by, pairs)
+    assert list(got.columns) == list(expected.columns)
+    assert got[by].tolist() == expected[by].tolist()
+    assert got[['x', 'y']].equals(expected[['x', 'y']]) and got['count'].tolist() == expected['count'].tolist()
+    for col in ['corr', 'slope', 'intercept']:
+        np.testing.assert_allclose(got[col], expected[col], rtol=1e-8, atol=1e-8, err_msg=col)
+
+
+def test_group_regressions_degenerate_groups():
+    got = group_regressions(sales(500, seed=1), 'Store', [('Fuel_Price', 'Weekly_Sales')]).set_index('Store')
+    assert got.loc[41, 'count'] == 1 and got.loc[41, ['corr', 'slope', 'intercept']].isna().all()
+    assert got.loc[42, 'count'] == 3 and got.loc[42, ['corr', 'slope']].isna().all()
+
+
+def test_group_regressions_without_groups_or_pairs():
+    df = sales(100, seed=2)
+    assert group_regressions(df, 'Store', []).columns.tolist() == ['Store'] + REGRESSION_COLUMNS
+    empty = group_regressions(df.assign(Store=np.nan), 'Store', [('CPI', 'Weekly_Sales')])
+    assert empty.empty and empty.columns.tolist() == ['Store'] + REGRESSION_COLUMNS
@@ -0,0 +1,82 @@
+"""
+Tests for the server-side density rendering
+Checks the pixel counts and per-pixel means of rasterize against
+np.histogram2d and a pandas group-by, and the DuckDB pixel codes against
+bin_codes.
+
+Usage:
+    python -m pytest test_rasterize.py
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from rasterize import Raster, axis_bounds, bin_codes, density_mode, raster_bounds, rasterize
+
+
+def points(rows, seed=0):
+    """Return a correlated x/y cloud with a colour measure, some values missing"""
+    rng = np.random.default_rng(seed)
+    temperature = rng.normal(60, 18, rows)
+    df = pd.DataFrame({
+        'Temperature': temperature,
+        'Weekly_Sales': rng.lognormal(13.8, 0.4, rows) + 5000 * temperature,
+        'CPI': rng.normal(170, 40, rows),
+    })
+    return df.mask(rng.random(df.shape) < 0.05)
+
+
+@pytest.mark.parametrize('window', [None, {'Temperature': (40, 80), 'Weekly_Sales': (5e5, 1.5e6)}])
+def test_rasterize_matches_histogram2d(window):
+    df = points(50000)
+    bounds = raster_bounds(df, 'Temperature', 'Weekly_Sales', window)
+    raster = rasterize(df, 'Temperature', 'Weekly_Sales', bounds, (40, 30), means=['CPI'])
+    counts, x_edges, y_edges = np.histogram2d(df['Temperature'], df['Weekly_Sales'], bins=(40, 30),
+                                              range=bounds)
+    # The raster is indexed [y, x], as a heatmap's z
+    assert np.array_equal(raster.counts, counts.T.astype(np.int64))
+    assert raster.total == counts.sum()
+    np.testing.assert_allclose(raster.centers(0), (x_edges[:-1] + x_edges[1:]) / 2)
+    np.testing.assert_allclose(raster.centers(1), (y_edges[:-1] + y_edges[1:]) / 2)
+
+    ix = np.digitize(df['Temperature'], x_edges[1:-1])
+    iy = np.digitize(df['Weekly_Sales'], y_edges[1:-1])
+    inside = (df['Temperature'].between(*bounds[0]) & df['Weekly_Sales'].between(*bounds[1])).to_numpy()
+    means = df['CPI'][inside].groupby([iy[inside], ix[inside]]).mean()
+    expected = np.full((30, 40), np.nan)
+    expected[means.index.get_level_values(0), means.index.get_level_values(1)] = means.to_numpy()
+    np.testing.assert_allclose(raster.means['CPI'], expected, rtol=1e-12)
+
+
+def test_from_cells_matches_rasterize():
+    df = points(5000, seed=1)
+    bounds = raster_bounds(df, 'Temperature', 'Weekly_Sales')
+    raster = rasterize(df, 'Temperature', 'Weekly_Sales', bounds, (20, 10), means=['CPI'])
+    iy, ix = np.nonzero(raster.counts)
+    cells = Raster.from_cells(bounds, (20, 10), ix, iy, raster.counts[iy, ix],
+                              {'CPI': raster.means['CPI'][iy, ix]})
+    assert np.array_equal(cells.counts, raster.counts)
+    np.testing.assert_array_equal(cells.means['CPI'], np.where(raster.counts > 0, raster.means['CPI'], np.nan))
+
+
+def test_grid_code_matches_bin_codes():
+    duckdb = pytest.importorskip('duckdb')
+    from query_backend import grid_code
+
+    df = points(5000, seed=2)
+    bounds = axis_bounds(df['CPI'].min(), df['CPI'].max())
+    # The backend filters rows to the window before binning, as bin_codes marks the rest -1
+    got = duckdb.connect().execute(f"SELECT {grid_code('CPI', bounds, 64)} AS code FROM df "
+                                   f"WHERE CPI BETWEEN {bounds[0]!r} AND {bounds[1]!r}").df()['code']
+    expected = bin_codes(df['CPI'], *bounds, 64)
+    assert np.array_equal(got.to_numpy(), expected[expected >= 0])
+
+
+def test_bounds_and_modes():
+    df = pd.DataFrame({'x': [1.0, 1.0, np.nan], 'y': [np.nan] * 3})
+    # A constant column gets a unit-wide range, an empty one the unit interval
+    assert raster_bounds(df, 'x', 'y') == [(0.5, 1.5), (0.0, 1.0)]
+    assert raster_bounds(df, 'x', 'y', {'x': (3, 2)}) == [(2.0, 3.0), (0.0, 1.0)]
+    assert density_mode('auto', 10) is None and density_mode('density', 10) == 'count'
+    assert density_mode('auto', 10 ** 9, numeric_color=True) == 'mean'
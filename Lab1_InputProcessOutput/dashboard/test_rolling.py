@@ -0,0 +1,48 @@
+"""
+Tests for the rolling-window engine of the time series tab
+Checks RollingFrame's prefix-sum windows against pandas' rolling() and ewm()
+on aligned weekly series with gaps.
+
+Usage:
+    python -m pytest test_rolling.py
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from rolling import RollingFrame
+
+
+def wide_series(seed=11):
+    """Return aligned weekly series with gaps, as the time series tab pivots them"""
+    rng = np.random.default_rng(seed)
+    wide = pd.DataFrame(rng.lognormal(13.8, 0.4, size=(300, 12)),
+                        index=pd.date_range('2010-02-05', periods=300, freq='7D'))
+    return wide.mask(wide < 7e5)
+
+
+@pytest.mark.parametrize('window', [1, 4, 13, 52])
+def test_rolling_frame_matches_pandas(window):
+    wide = wide_series()
+    frame = RollingFrame(wide)
+    rolling = wide.rolling(window)
+    for stat, expected in [('mean', rolling.mean()), ('sum', rolling.sum()), ('std', rolling.std())]:
+        got = frame.stat(stat, window)
+        assert got.isna().equals(expected.isna()), stat
+        np.testing.assert_allclose(got.to_numpy(), expected.to_numpy(), rtol=1e-7, atol=1e-6)
+    np.testing.assert_allclose(frame.stat('ewma', window).to_numpy(), wide.ewm(span=window).mean().to_numpy())
+
+
+@pytest.mark.parametrize('stat', ['mean', 'std'])
+def test_rolling_frame_min_periods(stat):
+    wide = wide_series(seed=12)
+    got = RollingFrame(wide).stat(stat, 8, min_periods=1)
+    expected = getattr(wide.rolling(8, min_periods=1), stat)()
+    assert got.isna().equals(expected.isna())
+    np.testing.assert_allclose(got.to_numpy(), expected.to_numpy(), rtol=1e-7)
+
+
+def test_rolling_frame_rejects_unknown_stat():
+    with pytest.raises(ValueError):
+        RollingFrame(wide_series()).stat('median', 4)
@@ -0,0 +1,162 @@
+"""
+Tests for the dashboards' precomputed statistics
+Checks the statistics index (full builds, incremental updates and the
+DuckDB build) against the pandas computations it replaces, with missing
+values throughout.
+
+Usage:
+    python -m pytest test_stats.py
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import data_loader
+from data_loader import Dataset
+from stats_index import StatsIndex, correlation_matrix, merge_moments, partial_moments
+
+COLUMNS = ['Weekly_Sales', 'Temperature', 'Fuel_Price', 'CPI', 'Unemployment']
+
+
+def measures(rows, seed=0, missing=0.1):
+    """Return Walmart-like numeric columns, some correlated, with a share of each missing"""
+    rng = np.random.default_rng(seed)
+    temperature = rng.normal(60, 18, rows)
+    df = pd.DataFrame({
+        'Weekly_Sales': rng.lognormal(13.8, 0.4, rows) + 2000 * temperature,
+        'Temperature': temperature,
+        'Fuel_Price': rng.normal(3.35, 0.4, rows),
+        'CPI': rng.normal(170, 40, rows),
+        'Unemployment': rng.normal(8, 1.8, rows),
+    })
+    return df.mask(rng.random(df.shape) < missing)
+
+
+def write_csv(path, df, first_store=1):
+    """Write measures in the Walmart2.csv layout, one store per 100 rows"""
+    raw = df.round(4).assign(
+        Store=first_store + np.arange(len(df)) // 100,
+        Date=[f"{day}/{month}/2011" for day, month in zip(np.arange(len(df)) % 28 + 1, np.arange(len(df)) % 12 + 1)],
+        Holiday_Flag=np.arange(len(df)) % 2,
+        District='A')
+    raw = raw[['Store', 'Date', 'Weekly_Sales', 'Holiday_Flag', 'Temperature', 'Fuel_Price', 'CPI',
+               'Unemployment', 'District']]
+    raw.to_csv(path, mode='a' if path.exists() else 'w', header=not path.exists(), index=False)
+
+
+def assert_describes(index, df, quantile_tol=0.0):
+    """Check every column's summary from ``index`` against ``df.describe()``"""
+    expected = df.describe()
+    for col in df.columns:
+        summary = index.describe(col)
+        assert summary['count'] == expected.loc['count', col]
+        assert summary['missing'] == df[col].isna().sum()
+        for stat in ['mean', 'std', 'min', 'max']:
+            assert summary[stat] == pytest.approx(expected.loc[stat, col], rel=1e-9)
+        tol = quantile_tol * expected.loc['std', col]
+        for stat in ['25%', '50%', '75%']:
+            assert summary[stat] == pytest.approx(expected.loc[stat, col], rel=1e-9, abs=tol)
+
+
+def assert_corr(index, df):
+    """Check the index's correlation matrix against ``df.corr()``"""
+    got = index.corr(list(df.columns)).to_numpy()
+    np.testing.assert_allclose(got, df.corr().to_numpy(), rtol=1e-9, atol=1e-12)
+
+
+def test_build_matches_pandas():
+    df = measures(5000)
+    index = StatsIndex()
+    index.build(df)
+    assert_describes(index, df)
+    assert_corr(index, df)
+    assert index.correlation('Weekly_Sales', 'Temperature') == pytest.approx(
+        df['Weekly_Sales'].corr(df['Temperature']), rel=1e-9)
+
+
+def test_partitioned_build_matches_single_pass():
+    df = measures(5000, seed=1)
+    whole, parts = StatsIndex(), StatsIndex(partition_rows=700)
+    whole.build(df)
+    parts.build(df)
+    for key in ['pair_count', 'pair_mean', 'pair_m2', 'comoment', 'low', 'high']:
+        np.testing.assert_allclose(parts.state['moments'][key], whole.state['moments'][key], rtol=1e-9, atol=1e-6)
+
+
+def test_update_matches_full_build():
+    df = measures(6000, seed=2)
+    index = StatsIndex()
+    index.build(df.iloc[:4000])
+    index.update(df, df.iloc[4000:])
+    # Moments merge exactly; the merged quantile sketch is approximate
+    assert_describes(index, df, quantile_tol=0.02)
+    assert_corr(index, df)
+    assert index.state['rows'] == len(df)
+
+
+def test_update_after_reload_rebuilds():
+    df = measures(1000, seed=3)
+    index = StatsIndex()
+    index.build(measures(500, seed=4))
+    index.update(df, None)
+    assert_describes(index, df)
+
+
+def test_merge_moments_matches_one_block():
+    values = measures(3000, seed=5).to_numpy()
+    merged = merge_moments(partial_moments(values[:1000]), partial_moments(values[1000:]))
+    single = partial_moments(values)
+    for key in ['pair_count', 'pair_mean', 'pair_m2', 'comoment', 'low', 'high']:
+        np.testing.assert_allclose(merged[key], single[key], rtol=1e-9, atol=1e-6)
+    assert merged['rows'] == len(values)
+
+
+def test_merge_moments_with_empty_block():
+    values = measures(500, seed=6).to_numpy()
+    single = partial_moments(values)
+    merged = merge_moments(partial_moments(values[:0]), single)
+    for key in ['pair_count', 'pair_mean', 'pair_m2', 'comoment', 'low', 'high']:
+        np.testing.assert_allclose(merged[key], single[key])
+
+
+def test_correlation_matrix_is_pairwise_complete():
+    df = measures(2000, seed=7, missing=0.3)
+    # Missing values concentrated in one column make the pair counts differ a lot
+    df.loc[df.index[:1500], 'CPI'] = np.nan
+    df['Empty'] = np.nan
+    df['Constant'] = 1.0
+    got = correlation_matrix(df)
+    expected = df.corr()
+    np.testing.assert_allclose(got.to_numpy(), expected.to_numpy(), rtol=1e-9, atol=1e-12)
+    assert np.isnan(got.loc['Empty', 'CPI']) and np.isnan(got.loc['Constant', 'Temperature'])
+
+
+def test_backends_agree_after_ingest(tmp_path, monkeypatch):
+    pytest.importorskip('duckdb')
+    from query_backend import DuckDBBackend, PandasBackend
+
+    # Keep the Arrow cache of the test's CSV out of the repository's Data/.cache
+    monkeypatch.setattr(data_loader, 'CACHE_DIR', tmp_path / '.cache')
+    path = tmp_path / 'sales.csv'
+    write_csv(path, measures(3000, seed=8))
+    dataset = Dataset(path, watch=None, float32=False)
+    pandas_backend = PandasBackend(dataset)
+    duckdb_backend = DuckDBBackend(dataset)
+    dataset.future.result()
+    duckdb_backend.future.result()
+    df = dataset.frame()[COLUMNS]
+    assert duckdb_backend.info() == pandas_backend.info()
+    for backend in [pandas_backend, duckdb_backend]:
+        assert backend.stats.covers(COLUMNS)
+        assert_describes(backend.stats, df, quantile_tol=1e-9)
+        assert_corr(backend.stats, df)
+
+    # Appended rows are folded into the pandas backend's index incrementally
+    write_csv(path, measures(1000, seed=9), first_store=31)
+    dataset.ingest()
+    df = dataset.frame()[COLUMNS]
+    assert len(df) == 4000
+    assert pandas_backend.stats.covers(COLUMNS, pandas_backend.version)
+    assert_describes(pandas_backend.stats, df, quantile_tol=0.02)
+    assert_corr(pandas_backend.stats, df)